@@ -0,0 +1,43 @@
+"""全スクリプト共通のビットセット演算モジュール
+
+動画集合を Python int のビット列で表す（bit i = レコード i）。
+AND/OR と popcount が C 実装で走るため、条件×動画の集計を
+リスト内包より大幅に高速に行える。
+"""
+
+
+def to_bitset(flags):
+    """真偽値の並びをビットセット(int)に変換する"""
+    bits = 0
+    for i, f in enumerate(flags):
+        if f:
+            bits |= 1 << i
+    return bits
+
+
+def from_indices(indices):
+    """インデックスの並びをビットセットに変換する"""
+    bits = 0
+    for i in indices:
+        bits |= 1 << i
+    return bits
+
+
+def popcount(bits):
+    """立っているビット数"""
+    return bits.bit_count()
+
+
+def full_mask(n):
+    """下位 n ビットがすべて立ったマスク"""
+    return (1 << n) - 1
+
+
+def iter_indices(bits):
+    """立っているビットのインデックスを昇順に返す"""
+    i = 0
+    while bits:
+        if bits & 1:
+            yield i
+        bits >>= 1
+        i += 1
@@ -1,11 +1,12 @@
 """全スクリプト共通のデータ読み込みモジュール"""
 
+import hashlib
 import json
 import os
 
 from config import (
     VIDEOS_DIR, SCRIPTS_DIR, DATA_DIR, INPUT_DIR, OUTPUT_DIR, HUMAN_SCORES_FILE,
-    HISTORY_DIR, INSIGHTS_FILE,
+    HISTORY_DIR, INSIGHTS_FILE, CACHE_DIR,
     HIT_THRESHOLD, PRIMARY_ANALYSIS_WINDOW, SECONDARY_ANALYSIS_WINDOW, DATA_CATEGORIES,
 )
 
@@ -122,6 +123,66 @@ def save_insights(frontmatter, body):
         f.write("\n".join(lines))
 
 
+def load_data_pack(name):
+    """Step 3 が出力した機械可読データパック data/output/{name}.jsonl を読み込む。
+    name は "data_summary" / "retention_data_pack" / "ctr_data_pack"。無い場合は None。
+    """
+    path = os.path.join(OUTPUT_DIR, f"{name}.jsonl")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_data_pack_schema():
+    """data/output/data_pack_schema.json を読み込む。無い場合は None"""
+    path = os.path.join(OUTPUT_DIR, "data_pack_schema.json")
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_cache(name):
+    """data/cache/{name}.json を読み込む。無い・壊れている場合は空辞書"""
+    path = os.path.join(CACHE_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+
+
+def save_cache(name, data):
+    """data/cache/{name}.json を書き込む（一時ファイル経由で置き換え）"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{name}.json")
+    tmp = f"{path}.{os.getpid()}.tmp"   # 書き手ごとに別の一時ファイル
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def stable_hash(*objs):
+    """JSON化可能なオブジェクト群の内容ハッシュ（キー順に依存しない）"""
+    h = hashlib.sha256()
+    for obj in objs:
+        h.update(json.dumps(obj, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def source_version(*paths):
+    """ソースファイル群の内容ハッシュ。コード変更時にキャッシュを自動で無効化するために使う"""
+    h = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()[:16]
+
+
 def load_fundamentals():
     """analysis_fundamentals.json を読み込み、返す。存在しない場合はエラー終了。"""
     path = os.path.join(INPUT_DIR, "analysis_fundamentals.json")
@@ -0,0 +1,142 @@
+"""全スクリプト共通の視聴者層テンソルモジュール
+
+demographics.breakdown（年齢層 → 性別 → 視聴者割合%）を
+(動画, 年齢層, 性別) の3軸の密な配列（array('d')、行優先）に詰め、
+視聴者プロファイルの類似度・クラスタリング・公開日に沿った推移を計算する。
+
+プロファイルは 年齢層×性別 のセルを合計1に正規化したベクトルとして扱う。
+"""
+
+import math
+from array import array
+
+
+AGE_GROUPS = ("age13-17", "age18-24", "age25-34", "age35-44", "age45-54", "age55-64", "age65-")
+AGE_MIDPOINTS = (15, 21, 29.5, 39.5, 49.5, 59.5, 70)   # 平均年齢の推定に使う各層の代表値
+GENDERS = ("male", "female", "genderUserSpecified")
+KMEANS_MAX_ITER = 50
+
+
+# ===========================================================================
+#  テンソル
+# ===========================================================================
+
+def build_demographics_tensor(videos):
+    """動画リストから (動画, 年齢層, 性別) テンソルを作る。breakdown が空の動画は present=0"""
+    ids = [v.get("_video_id") or v["metadata"]["video_id"] for v in videos]
+    n_age, n_gender = len(AGE_GROUPS), len(GENDERS)
+    age_index = {a: i for i, a in enumerate(AGE_GROUPS)}
+    gender_index = {g: i for i, g in enumerate(GENDERS)}
+    data = array("d", bytes(8 * len(ids) * n_age * n_gender))
+    present = array("b", bytes(len(ids)))
+
+    for vi, v in enumerate(videos):
+        breakdown = (v.get("demographics") or {}).get("breakdown") or {}
+        for age, genders in breakdown.items():
+            if age not in age_index:
+                continue
+            for gender, pct in (genders or {}).items():
+                if gender not in gender_index or not pct:
+                    continue
+                data[(vi * n_age + age_index[age]) * n_gender + gender_index[gender]] += pct
+                present[vi] = 1
+
+    return {
+        "videos": ids,
+        "index": {vid: i for i, vid in enumerate(ids)},
+        "ages": AGE_GROUPS,
+        "genders": GENDERS,
+        "data": data,
+        "present": present,
+    }
+
+
+def profile(tensor, video_id):
+    """年齢層×性別 を合計1に正規化したベクトル（長さ 年齢層数×性別数）。データなしは None"""
+    vi = tensor["index"].get(video_id)
+    if vi is None or not tensor["present"][vi]:
+        return None
+    width = len(tensor["ages"]) * len(tensor["genders"])
+    cells = tensor["data"][vi * width:(vi + 1) * width]
+    total = sum(cells)
+    return [x / total for x in cells] if total > 0 else None
+
+
+def age_marginal(vec, n_gender=len(GENDERS)):
+    """プロファイルベクトルの年齢層ごとの合計"""
+    return [sum(vec[i:i + n_gender]) for i in range(0, len(vec), n_gender)]
+
+
+def gender_marginal(vec, n_gender=len(GENDERS)):
+    """プロファイルベクトルの性別ごとの合計"""
+    return [sum(vec[g::n_gender]) for g in range(n_gender)]
+
+
+def mean_age(vec):
+    return sum(p * mid for p, mid in zip(age_marginal(vec), AGE_MIDPOINTS))
+
+
+# ===========================================================================
+#  類似度・クラスタリング
+# ===========================================================================
+
+def cosine(a, b):
+    dot = sum(x * y for x, y in zip(a, b))
+    na = math.sqrt(sum(x * x for x in a))
+    nb = math.sqrt(sum(y * y for y in b))
+    return dot / (na * nb) if na and nb else 0.0
+
+
+def similarity_matrix(profiles):
+    """{キー: ベクトル} の全ペアのコサイン類似度 {(a, b): 類似度}（a < b）。ノルムは1回だけ計算する"""
+    keys = sorted(profiles)
+    norms = {k: math.sqrt(sum(x * x for x in profiles[k])) for k in keys}
+    sims = {}
+    for i, a in enumerate(keys):
+        va, na = profiles[a], norms[a]
+        for b in keys[i + 1:]:
+            denom = na * norms[b]
+            sims[(a, b)] = sum(x * y for x, y in zip(va, profiles[b])) / denom if denom else 0.0
+    return sims
+
+
+def mean_vector(vectors):
+    vectors = list(vectors)
+    return [sum(col) / len(vectors) for col in zip(*vectors)] if vectors else None
+
+
+def _sq_dist(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b))
+
+
+def kmeans(profiles, k):
+    """{キー: ベクトル} を k-means（ユークリッド距離）で k 群に分ける。
+
+    初期値は決定的: 平均に最も近い点 → 既存の中心から最も遠い点を順に追加
+    戻り値: {"assignments": {キー: 群番号}, "centroids": [ベクトル], "inertia": 距離二乗和}
+    """
+    keys = sorted(profiles)
+    if not keys:
+        return {"assignments": {}, "centroids": [], "inertia": 0.0}
+    k = max(1, min(k, len(keys)))
+    center = mean_vector(profiles[key] for key in keys)
+    centroids = [list(profiles[min(keys, key=lambda key: (_sq_dist(profiles[key], center), key))])]
+    while len(centroids) < k:
+        far = max(keys, key=lambda key: (min(_sq_dist(profiles[key], c) for c in centroids), key))
+        centroids.append(list(profiles[far]))
+
+    assignments = {}
+    for _ in range(KMEANS_MAX_ITER):
+        new = {
+            key: min(range(k), key=lambda c: _sq_dist(profiles[key], centroids[c]))
+            for key in keys
+        }
+        if new == assignments:
+            break
+        assignments = new
+        for c in range(k):
+            members = [profiles[key] for key in keys if assignments[key] == c]
+            if members:
+                centroids[c] = mean_vector(members)
+    inertia = sum(_sq_dist(profiles[key], centroids[c]) for key, c in assignments.items())
+    return {"assignments": assignments, "centroids": centroids, "inertia": round(inertia, 6)}
@@ -0,0 +1,206 @@
+"""全スクリプト共通の成長カーブ分析モジュール
+
+Day1〜N の再生数カーブを log1p → z正規化して形状だけを比較できる行列にし、
+Sakoe-Chiba 窓付き DTW 距離で k-medoids クラスタリングする。
+
+高速化:
+  - 各カーブの上下包絡線（LB_Keogh 用）を索引として1回だけ作る
+  - 最近傍探索・メドイド割り当ては下界の小さい順に DTW を計算し、
+    下界が暫定最良値を超えた候補は DTW を計算せずに枝刈りする
+  - DTW 自体も累積コストが打ち切り値を超えた時点で早期終了する
+"""
+
+import math
+
+
+DTW_WINDOW = 1          # Sakoe-Chiba 窓幅（日）
+MIN_CURVE_DAYS = 3      # これ未満の有効日数のカーブは扱わない
+MAX_ITER = 20           # k-medoids の反復上限
+
+
+# ===========================================================================
+#  正規化・距離
+# ===========================================================================
+
+def normalize_curve(views):
+    """欠損(None)を除いた再生数列を log1p → z正規化する。有効日数不足なら None"""
+    vals = [math.log1p(max(v, 0)) for v in views if v is not None]
+    if len(vals) < MIN_CURVE_DAYS:
+        return None
+    mean = sum(vals) / len(vals)
+    sd = math.sqrt(sum((x - mean) ** 2 for x in vals) / len(vals))
+    if sd == 0:
+        return [0.0] * len(vals)
+    return [(x - mean) / sd for x in vals]
+
+
+def dtw(a, b, window=DTW_WINDOW, cutoff=math.inf):
+    """窓付き DTW 距離（二乗誤差累積の平方根）。cutoff を確実に超える場合は inf"""
+    n, m = len(a), len(b)
+    w = max(window, abs(n - m))
+    limit = cutoff * cutoff
+    prev = [math.inf] * (m + 1)
+    prev[0] = 0.0
+    for i in range(1, n + 1):
+        cur = [math.inf] * (m + 1)
+        lo, hi = max(1, i - w), min(m, i + w)
+        ai = a[i - 1]
+        row_min = math.inf
+        for j in range(lo, hi + 1):
+            d = (ai - b[j - 1]) ** 2
+            best = min(prev[j], prev[j - 1], cur[j - 1])
+            cur[j] = d + best
+            if cur[j] < row_min:
+                row_min = cur[j]
+        if row_min > limit:
+            return math.inf
+        prev = cur
+    return math.sqrt(prev[m])
+
+
+def envelope(curve, window=DTW_WINDOW):
+    """LB_Keogh 用の上下包絡線"""
+    n = len(curve)
+    upper = [max(curve[max(0, i - window):min(n, i + window + 1)]) for i in range(n)]
+    lower = [min(curve[max(0, i - window):min(n, i + window + 1)]) for i in range(n)]
+    return upper, lower
+
+
+def lb_keogh(query, env):
+    """DTW 距離の下界。長さが異なる場合は 0（枝刈り不可）"""
+    upper, lower = env
+    if len(query) != len(upper):
+        return 0.0
+    total = 0.0
+    for q, u, l in zip(query, upper, lower):
+        if q > u:
+            total += (q - u) ** 2
+        elif q < l:
+            total += (q - l) ** 2
+    return math.sqrt(total)
+
+
+# ===========================================================================
+#  索引・最近傍
+# ===========================================================================
+
+def build_curve_index(curves):
+    """{キー: 正規化済みカーブ} から包絡線付きの索引を作る。距離はメモ化して共有する"""
+    return {
+        "curves": curves,
+        "envelopes": {key: envelope(c) for key, c in curves.items()},
+        "memo": {},
+        "stats": {"dtw": 0, "pruned": 0},
+    }
+
+
+def _distance(index, a, b, cutoff=math.inf):
+    """メモ化付き DTW。早期終了した結果（inf）はメモしない"""
+    pair = (a, b) if a <= b else (b, a)
+    memo = index["memo"]
+    if pair in memo:
+        return memo[pair]
+    index["stats"]["dtw"] += 1
+    d = dtw(index["curves"][a], index["curves"][b], cutoff=cutoff)
+    if d != math.inf:
+        memo[pair] = d
+    return d
+
+
+def _lower_bound(index, a, b):
+    curves, envs = index["curves"], index["envelopes"]
+    return max(lb_keogh(curves[a], envs[b]), lb_keogh(curves[b], envs[a]))
+
+
+def nearest(index, key, candidates, k=1):
+    """candidates のうち key に DTW 距離が近い順に最大 k 件 [(キー, 距離)] を返す"""
+    if key not in index["curves"]:
+        return []
+    cands = [c for c in candidates if c != key and c in index["curves"]]
+    ordered = sorted(cands, key=lambda c: _lower_bound(index, key, c))
+    best = []  # (距離, キー) を昇順で k 件
+    for c in ordered:
+        cutoff = best[-1][0] if len(best) == k else math.inf
+        if _lower_bound(index, key, c) >= cutoff:
+            # 以降の候補は下界がさらに大きいのでまとめて枝刈り
+            index["stats"]["pruned"] += len(ordered) - ordered.index(c)
+            break
+        d = _distance(index, key, c, cutoff)
+        if d < cutoff:
+            best.append((d, c))
+            best.sort()
+            del best[k:]
+    return [(c, d) for d, c in best]
+
+
+# ===========================================================================
+#  クラスタリング
+# ===========================================================================
+
+def _init_medoids(index, keys, k):
+    """決定的な初期化: 平均カーブに最も近いカーブ → 既存メドイドから最も遠いカーブを順に追加"""
+    curves = index["curves"]
+    length = max(len(curves[key]) for key in keys)
+    full = [curves[key] for key in keys if len(curves[key]) == length]
+    mean = [sum(col) / len(full) for col in zip(*full)]
+    medoids = [min(keys, key=lambda key: (dtw(curves[key], mean), key))]
+    nearest_d = {key: _distance(index, key, medoids[0]) for key in keys}
+    while len(medoids) < k:
+        far = max((key for key in keys if key not in medoids), key=lambda key: (nearest_d[key], key))
+        medoids.append(far)
+        for key in keys:
+            nearest_d[key] = min(nearest_d[key], _distance(index, key, far))
+    return medoids
+
+
+def _assign(index, keys, medoids):
+    assignments = {}
+    for key in keys:
+        if key in medoids:
+            assignments[key] = medoids.index(key)
+            continue
+        (m, _), = nearest(index, key, medoids, k=1)
+        assignments[key] = medoids.index(m)
+    return assignments
+
+
+def _update_medoid(index, members):
+    """クラスタ内距離和が最小のメンバー。和が暫定最良を超えた時点で打ち切る"""
+    best, best_cost = None, math.inf
+    for cand in members:
+        cost = 0.0
+        for other in members:
+            if other != cand:
+                cost += _distance(index, cand, other)
+                if cost >= best_cost:
+                    break
+        if cost < best_cost:
+            best, best_cost = cand, cost
+    return best
+
+
+def cluster_curves(index, k):
+    """索引内のカーブを k-medoids（DTW距離）で k 群に分ける。
+
+    戻り値: {"assignments": {キー: 群番号}, "medoids": [キー], "cost": 距離和}
+    群番号はメドイドの順（0始まり）。カーブ数が k 以下なら各カーブが1群。
+    """
+    keys = sorted(index["curves"])
+    if not keys:
+        return {"assignments": {}, "medoids": [], "cost": 0.0}
+    k = max(1, min(k, len(keys)))
+    medoids = _init_medoids(index, keys, k)
+    assignments = _assign(index, keys, medoids)
+    for _ in range(MAX_ITER):
+        new_medoids = []
+        for c in range(len(medoids)):
+            members = [key for key in keys if assignments[key] == c]
+            new_medoids.append(_update_medoid(index, members) if members else medoids[c])
+        if new_medoids == medoids:
+            break
+        medoids = new_medoids
+        assignments = _assign(index, keys, medoids)
+    cost = sum(
+        _distance(index, key, medoids[c]) for key, c in assignments.items() if key != medoids[c]
+    )
+    return {"assignments": assignments, "medoids": medoids, "cost": round(cost, 4)}
@@ -0,0 +1,72 @@
+"""全スクリプト共通の小規模線形代数モジュール（NumPy非依存）
+
+特徴量は高々数十列なので、正規方程式をガウス・ジョルダン法で解けば十分。
+"""
+
+
+def _gauss_jordan(a, rhs):
+    """a·X = rhs を部分ピボット付きガウス・ジョルダン法で解く。
+    a: n×n 行列, rhs: n×k 行列（どちらもリストのリスト）。戻り値は n×k の X。特異なら None
+    """
+    n = len(a)
+    m = [list(row) + list(r) for row, r in zip(a, rhs)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[pivot][col]) < 1e-12:
+            return None
+        m[col], m[pivot] = m[pivot], m[col]
+        pv = m[col][col]
+        m[col] = [v / pv for v in m[col]]
+        for r in range(n):
+            if r != col and m[r][col] != 0:
+                f = m[r][col]
+                m[r] = [v - f * c for v, c in zip(m[r], m[col])]
+    return [row[n:] for row in m]
+
+
+def solve(a, b):
+    """連立一次方程式 a·x = b を解く。
+    a: n×n 行列（リストのリスト）, b: 長さ n のベクトル。特異なら None
+    """
+    x = _gauss_jordan(a, [[bv] for bv in b])
+    return [row[0] for row in x] if x is not None else None
+
+
+def gram(x_rows):
+    """X^T X（x_rows: 行=サンプルのリスト）"""
+    p = len(x_rows[0])
+    g = [[0.0] * p for _ in range(p)]
+    for row in x_rows:
+        for i in range(p):
+            ri = row[i]
+            if ri == 0:
+                continue
+            gi = g[i]
+            for j in range(p):
+                gi[j] += ri * row[j]
+    return g
+
+
+def xty(x_rows, y):
+    """X^T y"""
+    p = len(x_rows[0])
+    out = [0.0] * p
+    for row, yv in zip(x_rows, y):
+        for i in range(p):
+            out[i] += row[i] * yv
+    return out
+
+
+def ols_residuals(y, controls):
+    """y を切片 + controls（列のリスト）で最小二乗回帰した残差を返す。解けなければ None"""
+    x_rows = [[1.0] + [c[i] for c in controls] for i in range(len(y))]
+    beta = solve(gram(x_rows), xty(x_rows, y))
+    if beta is None:
+        return None
+    return [yv - sum(b * v for b, v in zip(beta, row)) for row, yv in zip(x_rows, y)]
+
+
+def inverse(a):
+    """n×n 行列の逆行列（単位行列を右辺にして解く）。特異なら None"""
+    n = len(a)
+    return _gauss_jordan(a, [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)])
@@ -76,3 +76,97 @@ def fmt_int(val):
     if val is None:
         return "-"
     return f"{val:,}"
+
+
+def bh_fdr(pvals):
+    """Benjamini-Hochberg法のq値。Noneはそのまま返す"""
+    idx = [i for i, p in enumerate(pvals) if p is not None]
+    q = list(pvals)
+    m = len(idx)
+    prev = 1.0
+    for rank, i in reversed(list(enumerate(sorted(idx, key=lambda i: pvals[i]), 1))):
+        prev = min(prev, pvals[i] * m / rank)
+        q[i] = prev
+    return q
+
+
+def rankdata(vals):
+    """平均順位（同順位は順位の平均）。1始まり"""
+    order = sorted(range(len(vals)), key=lambda i: vals[i])
+    ranks = [0.0] * len(vals)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and vals[order[j + 1]] == vals[order[i]]:
+            j += 1
+        avg_rank = (i + j) / 2 + 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = avg_rank
+        i = j + 1
+    return ranks
+
+
+def spearman(x, y):
+    """スピアマン順位相関係数（順位に変換してピアソン）"""
+    if len(x) < 3:
+        return 0
+    return pearson(rankdata(x), rankdata(y))
+
+
+def _tie_pairs(sorted_vals):
+    """ソート済み列の同値ペア数 Σ t(t-1)/2"""
+    total = 0
+    run = 1
+    for a, b in zip(sorted_vals, sorted_vals[1:]):
+        if a == b:
+            run += 1
+        else:
+            total += run * (run - 1) // 2
+            run = 1
+    return total + run * (run - 1) // 2
+
+
+def _count_swaps(vals):
+    """マージソートで昇順に並べ替え、必要な交換（逆転ペア）数を返す。vals は破壊的に整列される"""
+    n = len(vals)
+    swaps = 0
+    buf = [None] * n
+    width = 1
+    while width < n:
+        for lo in range(0, n, 2 * width):
+            mid = min(lo + width, n)
+            hi = min(lo + 2 * width, n)
+            i, j, k = lo, mid, lo
+            while i < mid and j < hi:
+                if vals[i] <= vals[j]:
+                    buf[k] = vals[i]
+                    i += 1
+                else:
+                    buf[k] = vals[j]
+                    swaps += mid - i
+                    j += 1
+                k += 1
+            buf[k:k + mid - i] = vals[i:mid]
+            k += mid - i
+            buf[k:k + hi - j] = vals[j:hi]
+            vals[lo:hi] = buf[lo:hi]
+        width *= 2
+    return swaps
+
+
+def kendall_tau(x, y):
+    """ケンドールの順位相関 tau-b。Knight のマージソート法で O(n log n)"""
+    n = len(x)
+    if n < 3:
+        return 0
+    pairs = sorted(zip(x, y))
+    n0 = n * (n - 1) // 2
+    n1 = _tie_pairs([p[0] for p in pairs])
+    n3 = _tie_pairs(pairs)
+    ys = [p[1] for p in pairs]
+    swaps = _count_swaps(ys)
+    n2 = _tie_pairs(ys)
+    denom = math.sqrt((n0 - n1) * (n0 - n2))
+    if denom == 0:
+        return 0
+    return (n0 - n1 - n2 + n3 - 2 * swaps) / denom
@@ -0,0 +1,131 @@
+"""全スクリプト共通の並列実行モジュール"""
+
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+
+# run_stages() のワーカープロセス内の状態（共有メモリから読んだデータ・親で実行する書き込み）
+_WORKER = {"active": False, "shared": None, "deferred": []}
+
+
+def default_workers():
+    """利用可能なCPUコア数（取得できなければ1）"""
+    return os.cpu_count() or 1
+
+
+def split_count(total, parts):
+    """total 件を parts 個のチャンクにほぼ均等に分割した件数リストを返す"""
+    parts = max(1, min(parts, total))
+    base, extra = divmod(total, parts)
+    return [base + (1 if i < extra else 0) for i in range(parts)]
+
+
+def run_parallel(func, tasks, workers=None):
+    """tasks の各要素を func(task) でプロセスプール実行し、結果を入力順で返す。
+    workers<=1 / タスク1件 / プール生成不可の環境では逐次実行にフォールバックする。
+    func はモジュールトップレベルの関数であること（pickle可能な必要がある）。
+    """
+    tasks = list(tasks)
+    workers = workers or default_workers()
+    if _WORKER["active"]:
+        # run_stages() のワーカー内では入れ子のプールを作らない（コア数の取り合いを避ける）
+        workers = 1
+    if workers <= 1 or len(tasks) <= 1:
+        return [func(t) for t in tasks]
+    try:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as ex:
+            return list(ex.map(func, tasks))
+    except (OSError, PermissionError, NotImplementedError):
+        # サンドボックス等でプロセス生成が禁止されている場合
+        return [func(t) for t in tasks]
+
+
+# ===========================================================================
+#  独立ステージの並列実行（共有メモリ経由でデータを1回だけ渡す）
+# ===========================================================================
+
+def _init_stage_worker(name, size):
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        _WORKER["shared"] = json.loads(bytes(shm.buf[:size]).decode("utf-8"))
+    finally:
+        shm.close()
+    _WORKER["active"] = True
+
+
+def defer_to_parent(func, *args):
+    """run_stages() のワーカー内なら func(*args) を親プロセスでの実行に回して True を返す。
+    ワーカー外なら何もせず False（呼び出し側がその場で実行する）。
+    キャッシュ保存など、並列ステージが同時に行うと競合する書き込みに使う。
+    func はモジュールトップレベルの関数であること（pickle可能な必要がある）。
+    """
+    if not _WORKER["active"]:
+        return False
+    _WORKER["deferred"].append((func, args))
+    return True
+
+
+def _run_stage(func):
+    _WORKER["deferred"] = []
+    start = time.perf_counter()
+    result = func(_WORKER["shared"])
+    return result, time.perf_counter() - start, _WORKER["deferred"]
+
+
+def _run_stages_serial(stages, shared):
+    results, timings = {}, {}
+    for name, func in stages.items():
+        start = time.perf_counter()
+        results[name] = func(shared)
+        timings[name] = time.perf_counter() - start
+    return results, timings
+
+
+def run_stages(stages, shared, workers=None):
+    """{名前: func} の各ステージを func(shared) として並列実行する。
+
+    shared（JSON化可能なデータ）は共有メモリに1回だけ書き込み、各ワーカーは起動時に
+    読み込んで全ステージで使い回す。ステージは互いに独立（shared を書き換えない）であること。
+    workers<=1 / ステージ1件 / プール・共有メモリが使えない環境では逐次実行する。
+    戻り値: ({名前: 結果}, {名前: 所要秒数})
+    """
+    workers = min(workers or default_workers(), len(stages))
+    if workers <= 1 or _WORKER["active"]:
+        return _run_stages_serial(stages, shared)
+    payload = json.dumps(shared, ensure_ascii=False).encode("utf-8")
+    try:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(payload)))
+    except (OSError, PermissionError):
+        return _run_stages_serial(stages, shared)
+    try:
+        shm.buf[:len(payload)] = payload
+        try:
+            ex = ProcessPoolExecutor(
+                max_workers=workers, initializer=_init_stage_worker,
+                initargs=(shm.name, len(payload)),
+            )
+        except (OSError, PermissionError, NotImplementedError):
+            return _run_stages_serial(stages, shared)
+        with ex:
+            try:
+                futures = {name: ex.submit(_run_stage, func) for name, func in stages.items()}
+            except (OSError, PermissionError):
+                # ワーカープロセスを起動できない環境
+                ex.shutdown(cancel_futures=True)
+                return _run_stages_serial(stages, shared)
+            # ステージ内の例外はそのまま呼び出し元へ送る
+            done = {name: f.result() for name, f in futures.items()}
+    finally:
+        shm.close()
+        shm.unlink()
+    # ワーカーが後回しにした書き込みを、ステージ順に親で1回ずつ実行する
+    for name in stages:
+        for func, args in done[name][2]:
+            func(*args)
+    return (
+        {name: r for name, (r, _, _) in done.items()},
+        {name: t for name, (_, t, _) in done.items()},
+    )
@@ -0,0 +1,43 @@
+"""全スクリプト共通のパーセンタイル索引モジュール
+
+指標ごと・コホートごとの値をソート済みリストで保持し、
+「動画Xの指標MはコホートC内で何パーセンタイルか」を bisect で O(log n) で返す。
+"""
+
+from bisect import bisect_left, bisect_right
+
+
+DEFAULT_COHORTS = {
+    "all": lambda row: True,
+    "HIT": lambda row: bool(row.get("hit")),
+    "MISS": lambda row: not row.get("hit"),
+}
+
+
+def build_percentile_index(rows, metrics, cohorts=None):
+    """rows（指標辞書のリスト）から {コホート: {指標: ソート済み値リスト}} を作る"""
+    cohorts = cohorts or DEFAULT_COHORTS
+    index = {}
+    for cohort, member in cohorts.items():
+        members = [row for row in rows if member(row)]
+        index[cohort] = {
+            m: sorted(row[m] for row in members if row.get(m) is not None)
+            for m in metrics
+        }
+    return index
+
+
+def percentile_of(index, metric, value, cohort="all"):
+    """value がコホート内で何パーセンタイル（自身より小さい値の割合）かを返す"""
+    vals = index.get(cohort, {}).get(metric)
+    if not vals or value is None:
+        return None
+    return round(bisect_left(vals, value) / len(vals) * 100, 1)
+
+
+def rank_of(index, metric, value, cohort="all"):
+    """value がコホート内で降順何位か（同値は同順位）と母数を返す"""
+    vals = index.get(cohort, {}).get(metric)
+    if not vals or value is None:
+        return None, 0
+    return len(vals) - bisect_right(vals, value) + 1, len(vals)
@@ -0,0 +1,183 @@
+"""全スクリプト共通の再生数予測モジュール（減衰カーブ当てはめ）
+
+日別再生数のピーク日以降を べき乗減衰 v(t) = A·t^(-b) とみなし、
+log v = log A − b·log t を全動画まとめて最小二乗で当てはめる
+（全動画の (log t, log v) を1回走査して動画ごとの和を集計し、閉形式で解く）。
+
+  - ピーク後の点が MIN_FIT_POINTS 未満、または減衰していない (b <= 0) 動画は、
+    当てはめられた動画の b の中央値（プール値）を使い、最終観測日を通る A を採る
+  - Day8 以降の実績（現在の再生数 − Day1-7 合計）があれば、モデルの同期間の値との比で
+    尾部を補正してから 30/90/365 日時点の累計を予測する
+  - 不確実性は b ± 1.96·SE（プール時は b の四分位範囲から求めたばらつき）で幅を出す
+"""
+
+import math
+
+from config import HIT_THRESHOLD
+from common.metrics import median
+
+
+PROJECTION_HORIZONS = (30, 90, 365)   # 予測する経過日数
+LABEL_HORIZON = 365                   # 代替ラベル（予測HIT）に使う経過日数
+MIN_FIT_POINTS = 3                    # 個別に当てはめるのに必要なピーク後の点数
+Z_95 = 1.96
+
+
+# ===========================================================================
+#  当てはめ
+# ===========================================================================
+
+def _post_peak_points(daily_views):
+    """(日, 再生数) のうちピーク日以降で再生数 > 0 の点"""
+    pts = [(t, v) for t, v in enumerate(daily_views, 1) if v is not None]
+    if not pts:
+        return []
+    peak = max(pts, key=lambda p: p[1])[0]
+    return [(t, v) for t, v in pts if t >= peak and v > 0]
+
+
+def fit_decay_batch(series):
+    """series: {キー: [Day1, Day2, ... の再生数（欠損は None）]} をまとめて当てはめる。
+
+    戻り値: {キー: {"a", "b", "b_se", "r2", "n", "peak_day", "last_day", "last_views",
+                   "observed_total"}}。"a"/"b" はピーク後の点が足りなければ None。
+    """
+    # 1回の走査で (キー → n, Σx, Σy, Σxx, Σxy, Σyy) を集計する
+    sums = {}
+    meta = {}
+    for key, views in series.items():
+        valid = [(t, v) for t, v in enumerate(views, 1) if v is not None]
+        pts = _post_peak_points(views)
+        meta[key] = {
+            "peak_day": pts[0][0] if pts else None,
+            "last_day": valid[-1][0] if valid else None,
+            "last_views": valid[-1][1] if valid else None,
+            "observed_total": sum(v for _, v in valid),
+        }
+        acc = sums.setdefault(key, [0, 0.0, 0.0, 0.0, 0.0, 0.0])
+        for t, v in pts:
+            x, y = math.log(t), math.log(v)
+            acc[0] += 1
+            acc[1] += x
+            acc[2] += y
+            acc[3] += x * x
+            acc[4] += x * y
+            acc[5] += y * y
+
+    fits = {}
+    for key, (n, sx, sy, sxx, sxy, syy) in sums.items():
+        fit = dict(meta[key], a=None, b=None, b_se=None, r2=None, n=n)
+        sxx_c = sxx - sx * sx / n if n else 0.0
+        if n >= MIN_FIT_POINTS and sxx_c > 1e-12:
+            slope = (sxy - sx * sy / n) / sxx_c
+            intercept = (sy - slope * sx) / n
+            syy_c = syy - sy * sy / n
+            sse = max(0.0, syy_c - slope * (sxy - sx * sy / n))
+            if slope < 0:
+                fit["a"] = math.exp(intercept)
+                fit["b"] = -slope
+                fit["b_se"] = math.sqrt(sse / (n - 2) / sxx_c) if n > 2 else None
+                fit["r2"] = round(1 - sse / syy_c, 3) if syy_c > 1e-12 else None
+        fits[key] = fit
+    return fits
+
+
+def pooled_exponent(fits):
+    """個別に当てはめられた b の中央値と、四分位範囲から求めたばらつき（正規近似のSE相当）"""
+    bs = sorted(f["b"] for f in fits.values() if f.get("b") is not None)
+    if not bs:
+        return None
+    q1 = bs[(len(bs) - 1) // 4]
+    q3 = bs[(3 * (len(bs) - 1)) // 4]
+    return {"b": round(median(bs), 4), "b_se": round((q3 - q1) / 1.349, 4), "n": len(bs)}
+
+
+# ===========================================================================
+#  予測
+# ===========================================================================
+
+def _tail(a, b, start, end):
+    """Σ_{t=start}^{end} A·t^(-b)"""
+    return sum(a * t ** -b for t in range(start, end + 1)) if end >= start else 0.0
+
+
+def _cumulative(a, b, fit, views_now, age_days, horizon):
+    """経過日数 horizon 時点の累計再生数の予測値"""
+    last = fit["last_day"]
+    observed = fit["observed_total"]
+    if horizon <= last:
+        return observed  # 観測範囲内（日別合計をそのまま使う）
+    if not age_days or age_days <= last or views_now is None:
+        return observed + _tail(a, b, last + 1, horizon)
+    # 観測範囲外の実績（Day(last+1)〜現在）でモデルの尾部を補正する
+    model_mid = _tail(a, b, last + 1, age_days)
+    actual_mid = max(0, views_now - observed)
+    scale = actual_mid / model_mid if model_mid > 0 else 1.0
+    if horizon <= age_days:
+        return observed + scale * _tail(a, b, last + 1, horizon)
+    return views_now + scale * _tail(a, b, age_days + 1, horizon)
+
+
+def project_views(fit, views_now, age_days, pooled=None, horizons=PROJECTION_HORIZONS):
+    """1動画の当てはめ結果から各経過日数時点の累計再生数（95%幅付き）を予測する。
+    予測できない（日別データなし・プール値なし）場合は None。
+    """
+    if fit is None or not fit.get("last_day"):
+        return None
+    if fit.get("b") is not None and fit.get("b_se") is not None:
+        method, a, b, se = "fit", fit["a"], fit["b"], fit["b_se"]
+    elif pooled:
+        # 最終観測日を通るように A を決める
+        method, b, se = "pooled", pooled["b"], pooled["b_se"]
+        a = fit["last_views"] * fit["last_day"] ** b
+    else:
+        return None
+
+    b_fast = b + Z_95 * se           # 減衰が速い側 → 下限
+    b_slow = max(0.0, b - Z_95 * se)  # 減衰が遅い側 → 上限
+    a_fast = a if method == "fit" else fit["last_views"] * fit["last_day"] ** b_fast
+    a_slow = a if method == "fit" else fit["last_views"] * fit["last_day"] ** b_slow
+
+    projections = {}
+    for h in horizons:
+        mid = _cumulative(a, b, fit, views_now, age_days, h)
+        lo = _cumulative(a_fast, b_fast, fit, views_now, age_days, h)
+        hi = _cumulative(a_slow, b_slow, fit, views_now, age_days, h)
+        projections[str(h)] = {
+            "views": int(round(mid)),
+            "low": int(round(min(lo, mid))),
+            "high": int(round(max(hi, mid))),
+        }
+    # 代替ラベル: LABEL_HORIZON 時点の予測（既にそれより古い動画は現在値を下回らない）
+    label = projections.get(str(LABEL_HORIZON))
+    floor = views_now or 0
+    eventual = max(label["views"], floor) if label else None
+    eventual_range = [max(label["low"], floor), max(label["high"], floor)] if label else None
+    return {
+        "method": method,
+        "b": round(b, 4),
+        "b_se": round(se, 4),
+        "r2": fit.get("r2") if method == "fit" else None,
+        "peak_day": fit.get("peak_day"),
+        "projections": projections,
+        "eventual_views": eventual,
+        "eventual_range": eventual_range,
+        "projected_hit": eventual >= HIT_THRESHOLD if eventual is not None else None,
+    }
+
+
+def project_batch(series, current, pooled=None):
+    """全動画を一括で当てはめて予測する。
+
+    series:  {キー: 日別再生数リスト}
+    current: {キー: (現在の再生数, 経過日数)}
+    pooled:  プール値を外部から与える場合（単一動画の評価時など）。None なら series から算出
+    戻り値: ({キー: project_views() の結果 or None}, プール値)
+    """
+    fits = fit_decay_batch(series)
+    pooled = pooled or pooled_exponent(fits)
+    out = {}
+    for key, fit in fits.items():
+        views_now, age_days = current.get(key, (None, None))
+        out[key] = project_views(fit, views_now, age_days, pooled)
+    return out, pooled
@@ -0,0 +1,92 @@
+"""全スクリプト共通の分位点スケッチ（KLL）モジュール
+
+値を1つずつ追加でき、別のスケッチとマージできる近似分位点の要約。
+スケッチは JSON 化できる辞書 {"k", "n", "levels", "coin"} で表す。
+
+  - levels[h] の各要素は重み 2^h の値を表す。レベル h の容量は k·(2/3)^(H-1-h)（最小2）
+  - 容量を超えたレベルはソートして1つおきに上のレベルへ昇格させる（コンパクション）
+  - 1つおきの開始位置は乱数でなく coin の交互切り替えにして、結果を再現可能にする
+  - 追加は償却 O(1)（コンパクションは容量に達したときだけ）。
+    n が k 以下の間はコンパクションが起きないので分位点は厳密
+"""
+
+
+DEFAULT_K = 200
+
+
+def new_sketch(k=DEFAULT_K):
+    return {"k": k, "n": 0, "levels": [[]], "coin": 0}
+
+
+def _capacity(sketch, h):
+    depth = len(sketch["levels"]) - 1 - h
+    return max(2, int(sketch["k"] * (2 / 3) ** depth))
+
+
+def _compress(sketch):
+    """容量を超えたレベルがなくなるまで下から昇格させる"""
+    levels = sketch["levels"]
+    h = 0
+    while h < len(levels):
+        if len(levels[h]) > _capacity(sketch, h):
+            if h + 1 == len(levels):
+                levels.append([])
+            items = sorted(levels[h])
+            # 奇数個なら最後の1つはこのレベルに残す
+            keep = [items.pop()] if len(items) % 2 else []
+            levels[h + 1].extend(items[sketch["coin"]::2])
+            sketch["coin"] ^= 1
+            levels[h] = keep
+        h += 1
+
+
+def sketch_update(sketch, value):
+    """値を1つ追加する（in-place）"""
+    sketch["levels"][0].append(value)
+    sketch["n"] += 1
+    if len(sketch["levels"][0]) > _capacity(sketch, 0):
+        _compress(sketch)
+
+
+def sketch_merge(a, b):
+    """2つのスケッチをマージした新しいスケッチを返す（k は大きい方）"""
+    out = new_sketch(max(a["k"], b["k"]))
+    height = max(len(a["levels"]), len(b["levels"]))
+    out["levels"] = [
+        (a["levels"][h] if h < len(a["levels"]) else [])
+        + (b["levels"][h] if h < len(b["levels"]) else [])
+        for h in range(height)
+    ]
+    out["n"] = a["n"] + b["n"]
+    _compress(out)
+    return out
+
+
+def _weighted(sketch):
+    return sorted(
+        (x, 1 << h) for h, level in enumerate(sketch["levels"]) for x in level
+    )
+
+
+def sketch_quantile(sketch, q):
+    """q 分位点（0〜1）の近似値。空なら None"""
+    items = _weighted(sketch)
+    if not items:
+        return None
+    total = sum(w for _, w in items)
+    target = q * total
+    acc = 0
+    for x, w in items:
+        acc += w
+        if acc > target:
+            return x
+    return items[-1][0]
+
+
+def sketch_rank(sketch, value):
+    """value より小さい値の割合（0〜1）の近似値。空なら None"""
+    items = _weighted(sketch)
+    if not items:
+        return None
+    total = sum(w for _, w in items)
+    return sum(w for x, w in items if x < value) / total
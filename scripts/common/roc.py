@@ -0,0 +1,67 @@
+"""全スクリプト共通の ROC 曲線モジュール
+
+スカラー予測値を1回だけソートし、閾値を上から下へ動かしながら TP/FP を累積して
+全カット点の 感度・偽陽性率・適合率、AUC（台形則、同値は1点として扱う）、
+Youden の J が最大になる閾値を O(n log n) で求める。
+判定は「値 >= 閾値 なら陽性」。
+"""
+
+
+MAX_CURVE_POINTS = 25   # 保存する曲線の点数の上限（端点と Youden 点は必ず残す）
+
+
+def roc_sweep(scores, labels):
+    """scores（数値）と labels（真偽）から ROC を計算する。
+
+    戻り値: {"n", "positives", "auc", "youden": {"threshold", "tpr", "fpr", "precision", "j"},
+            "points": [(閾値, tpr, fpr, precision)]}。陽性・陰性のどちらかが0件なら None
+    """
+    pairs = sorted(zip(scores, labels), key=lambda x: -x[0])
+    pos = sum(1 for _, y in pairs if y)
+    neg = len(pairs) - pos
+    if not pos or not neg:
+        return None
+
+    points = [(None, 0.0, 0.0, None)]
+    tp = fp = 0
+    auc = 0.0
+    i = 0
+    while i < len(pairs):
+        t = pairs[i][0]
+        prev_tpr, prev_fpr = tp / pos, fp / neg
+        while i < len(pairs) and pairs[i][0] == t:
+            if pairs[i][1]:
+                tp += 1
+            else:
+                fp += 1
+            i += 1
+        tpr, fpr = tp / pos, fp / neg
+        auc += (fpr - prev_fpr) * (tpr + prev_tpr) / 2
+        points.append((t, tpr, fpr, tp / (tp + fp)))
+
+    best = max(points[1:], key=lambda p: (p[1] - p[2], -p[2]))
+    return {
+        "n": len(pairs),
+        "positives": pos,
+        "auc": auc,
+        "youden": {
+            "threshold": best[0], "tpr": best[1], "fpr": best[2],
+            "precision": best[3], "j": best[1] - best[2],
+        },
+        "points": points,
+    }
+
+
+def compact_curve(points, keep=(), max_points=MAX_CURVE_POINTS):
+    """曲線の点を max_points 個以下に間引き、列ごとのリスト（丸め済み）にする"""
+    if len(points) > max_points:
+        step = (len(points) - 1) / (max_points - 1)
+        idx = {round(i * step) for i in range(max_points)}
+        idx |= {i for i, p in enumerate(points) if p[0] in keep}
+        points = [points[i] for i in sorted(idx)]
+    return {
+        "threshold": [p[0] for p in points],
+        "tpr": [round(p[1], 3) for p in points],
+        "fpr": [round(p[2], 3) for p in points],
+        "precision": [round(p[3], 3) if p[3] is not None else None for p in points],
+    }
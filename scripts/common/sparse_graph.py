@@ -0,0 +1,127 @@
+"""全スクリプト共通の疎グラフ演算モジュール
+
+重み付き有向グラフを CSR（indptr / indices / weights の3本の array）で持ち、
+PageRank とラベル伝播によるコミュニティ検出を辺数に比例する計算量で行う。
+ノードは 0..n-1 の整数。ノードIDとの対応は呼び出し側で管理する。
+"""
+
+from array import array
+
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_TOL = 1e-10      # 反復間の L1 差がこれ未満で収束
+PAGERANK_MAX_ITER = 100
+LABEL_MAX_ITER = 20
+
+
+# ===========================================================================
+#  CSR
+# ===========================================================================
+
+def build_csr(n, edges):
+    """edges: [(始点, 終点, 重み)] から CSR を作る。同じ (始点, 終点) の重みは合算する"""
+    merged = {}
+    for src, dst, w in edges:
+        merged[(src, dst)] = merged.get((src, dst), 0.0) + w
+    counts = [0] * n
+    for src, _ in merged:
+        counts[src] += 1
+    indptr = array("l", [0] * (n + 1))
+    for i, c in enumerate(counts):
+        indptr[i + 1] = indptr[i] + c
+    indices = array("l", [0] * len(merged))
+    weights = array("d", [0.0] * len(merged))
+    fill = list(indptr[:n])
+    for (src, dst), w in sorted(merged.items()):
+        k = fill[src]
+        indices[k] = dst
+        weights[k] = w
+        fill[src] += 1
+    return {"n": n, "indptr": indptr, "indices": indices, "weights": weights}
+
+
+def symmetrize(csr):
+    """向きを無視した（両向きの辺を持つ）CSR"""
+    edges = []
+    for src, dst, w in iter_edges(csr):
+        edges.append((src, dst, w))
+        edges.append((dst, src, w))
+    return build_csr(csr["n"], edges)
+
+
+def iter_edges(csr):
+    indptr, indices, weights = csr["indptr"], csr["indices"], csr["weights"]
+    for src in range(csr["n"]):
+        for k in range(indptr[src], indptr[src + 1]):
+            yield src, indices[k], weights[k]
+
+
+def out_weights(csr):
+    indptr, weights = csr["indptr"], csr["weights"]
+    return array("d", (sum(weights[indptr[i]:indptr[i + 1]]) for i in range(csr["n"])))
+
+
+# ===========================================================================
+#  中心性・コミュニティ
+# ===========================================================================
+
+def pagerank(csr, start=None, damping=PAGERANK_DAMPING, tol=PAGERANK_TOL, max_iter=PAGERANK_MAX_ITER):
+    """重み付き PageRank（冪乗法）。出辺のないノードの質量は全ノードに均等に配る。
+
+    start: 初期ベクトル（前回の結果など）。グラフの変化が小さければ少ない反復で収束する
+    戻り値: (スコアの array('d'), 反復回数)
+    """
+    n = csr["n"]
+    if n == 0:
+        return array("d"), 0
+    indptr, indices, weights = csr["indptr"], csr["indices"], csr["weights"]
+    w_out = out_weights(csr)
+    if start is not None and len(start) == n and sum(start) > 0:
+        total = sum(start)
+        pr = array("d", (x / total for x in start))
+    else:
+        pr = array("d", [1.0 / n] * n)
+
+    for it in range(1, max_iter + 1):
+        dangling = sum(pr[i] for i in range(n) if w_out[i] == 0)
+        base = (1 - damping) / n + damping * dangling / n
+        nxt = array("d", [base] * n)
+        for src in range(n):
+            if w_out[src] == 0:
+                continue
+            share = damping * pr[src] / w_out[src]
+            for k in range(indptr[src], indptr[src + 1]):
+                nxt[indices[k]] += share * weights[k]
+        delta = sum(abs(a - b) for a, b in zip(nxt, pr))
+        pr = nxt
+        if delta < tol:
+            return pr, it
+    return pr, max_iter
+
+
+def label_propagation(csr, max_iter=LABEL_MAX_ITER):
+    """非同期ラベル伝播によるコミュニティ検出（無向・重み付きの CSR を渡す）。
+
+    各ノードを番号順に、隣接ノードのラベルのうち重み和が最大のもの（同点は小さい番号）に
+    更新し、変化がなくなるまで繰り返す。戻り値: ノード → ラベルの list
+    """
+    n = csr["n"]
+    indptr, indices, weights = csr["indptr"], csr["indices"], csr["weights"]
+    labels = list(range(n))
+    for _ in range(max_iter):
+        changed = False
+        for i in range(n):
+            lo, hi = indptr[i], indptr[i + 1]
+            if lo == hi:
+                continue
+            score = {}
+            for k in range(lo, hi):
+                lab = labels[indices[k]]
+                score[lab] = score.get(lab, 0.0) + weights[k]
+            best = min(score, key=lambda lab: (-score[lab], lab))
+            if best != labels[i]:
+                labels[i] = best
+                changed = True
+        if not changed:
+            break
+    return labels
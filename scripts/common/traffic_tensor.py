@@ -0,0 +1,129 @@
+"""全スクリプト共通の 日別×流入元 テンソルモジュール
+
+daily_data.daily[*].traffic_breakdown を (動画, 日, 流入元) の3軸の密な配列に詰める。
+  - 値は指標ごとに array('d') 1本（行優先: 動画 → 日 → 流入元）
+  - 流入元が記録されていたかは array('b') のマスクで持ち、欠損と 0 を区別する
+  - 日別の総再生数（daily[*].views）は (動画, 日) の2軸で別に持つ
+
+流入元の軸は連続領域のストライドスライスで取り出せるため、
+「全動画の Day1-7 の RELATED 推移」のような問い合わせが入れ子ループなしで書ける。
+"""
+
+from array import array
+
+
+TRAFFIC_SOURCES = ("BROWSE", "RELATED", "SEARCH", "SUBSCRIBER", "OTHER")
+# 指標名 → traffic_breakdown 内のキー
+TRAFFIC_MEASURES = {"views": "views", "minutes": "minutes_watched"}
+TENSOR_DAYS = 7
+
+
+def build_traffic_tensor(videos, days=TENSOR_DAYS):
+    """動画リストから (動画, 日, 流入元) テンソルを作る。動画の軸順は videos の順"""
+    ids = [v.get("_video_id") or v["metadata"]["video_id"] for v in videos]
+    n_src = len(TRAFFIC_SOURCES)
+    size = len(ids) * days * n_src
+    src_index = {s: i for i, s in enumerate(TRAFFIC_SOURCES)}
+    other = src_index["OTHER"]
+
+    data = {m: array("d", bytes(8 * size)) for m in TRAFFIC_MEASURES}
+    mask = array("b", bytes(size))
+    day_views = array("d", bytes(8 * len(ids) * days))
+    day_mask = array("b", bytes(len(ids) * days))
+
+    for vi, v in enumerate(videos):
+        for entry in (v.get("daily_data") or {}).get("daily", []):
+            day = entry.get("day_number")
+            if not day or day > days:
+                continue
+            cell = vi * days + day - 1
+            if entry.get("views") is not None:
+                day_views[cell] = entry["views"]
+                day_mask[cell] = 1
+            base = cell * n_src
+            for source, vals in (entry.get("traffic_breakdown") or {}).items():
+                i = base + src_index.get(source, other)
+                mask[i] = 1
+                for measure, key in TRAFFIC_MEASURES.items():
+                    data[measure][i] += vals.get(key) or 0
+
+    return {
+        "videos": ids,
+        "index": {vid: i for i, vid in enumerate(ids)},
+        "days": days,
+        "sources": TRAFFIC_SOURCES,
+        "data": data,
+        "mask": mask,
+        "day_views": day_views,
+        "day_mask": day_mask,
+    }
+
+
+def _cast(measure, x):
+    return int(x) if measure == "views" else round(x, 1)
+
+
+def value(tensor, measure, video_id, day, source):
+    """1セルの値。動画・日・流入元のいずれかが記録されていなければ None"""
+    vi = tensor["index"].get(video_id)
+    if vi is None or not 1 <= day <= tensor["days"]:
+        return None
+    i = (vi * tensor["days"] + day - 1) * len(tensor["sources"]) + tensor["sources"].index(source)
+    return _cast(measure, tensor["data"][measure][i]) if tensor["mask"][i] else None
+
+
+def day_total(tensor, video_id, day):
+    """daily[*].views（その日の総再生数）。記録がなければ None"""
+    vi = tensor["index"].get(video_id)
+    if vi is None or not 1 <= day <= tensor["days"]:
+        return None
+    cell = vi * tensor["days"] + day - 1
+    return int(tensor["day_views"][cell]) if tensor["day_mask"][cell] else None
+
+
+def source_series(tensor, measure, source, video_ids=None):
+    """{動画ID: [Day1..DayN の値（欠損は None）]}。流入元軸のストライドスライスで取り出す"""
+    n_src = len(tensor["sources"])
+    s = tensor["sources"].index(source)
+    span = tensor["days"] * n_src
+    vals, mask = tensor["data"][measure], tensor["mask"]
+    out = {}
+    for vid in (video_ids if video_ids is not None else tensor["videos"]):
+        vi = tensor["index"].get(vid)
+        if vi is None:
+            continue
+        start = vi * span + s
+        out[vid] = [
+            _cast(measure, x) if present else None
+            for x, present in zip(vals[start:start + span:n_src], mask[start:start + span:n_src])
+        ]
+    return out
+
+
+def source_totals(tensor, measure, video_ids=None):
+    """{動画ID: [Day1..DayN の流入元合計（どの流入元も記録がない日は None）]}"""
+    n_src = len(tensor["sources"])
+    vals, mask = tensor["data"][measure], tensor["mask"]
+    out = {}
+    for vid in (video_ids if video_ids is not None else tensor["videos"]):
+        vi = tensor["index"].get(vid)
+        if vi is None:
+            continue
+        row = []
+        for day in range(tensor["days"]):
+            base = (vi * tensor["days"] + day) * n_src
+            row.append(sum(vals[base:base + n_src]) if any(mask[base:base + n_src]) else None)
+        out[vid] = row
+    return out
+
+
+def share_series(tensor, source, measure="views", video_ids=None):
+    """{動画ID: [Day1..DayN の source の構成比（0〜1、欠損は None）]}"""
+    totals = source_totals(tensor, measure, video_ids)
+    shares = {}
+    for vid, series in source_series(tensor, measure, source, list(totals)).items():
+        shares[vid] = [
+            (x or 0) / t if t else None
+            for x, t in zip(series, totals[vid])
+        ]
+    return shares
@@ -19,9 +19,14 @@ AGENTS_DIR = os.path.join(BASE_DIR, "agents")
 SKILLS_DIR = os.path.join(BASE_DIR, "skills")
 HISTORY_DIR = os.path.join(DATA_DIR, "history")
 HISTORY_INDEX = os.path.join(HISTORY_DIR, "index.md")
+HISTORY_MANIFEST = os.path.join(HISTORY_DIR, "manifest.json")  # スナップショット一覧（版・指標・blobハッシュ）
+HISTORY_BLOBS_DIR = os.path.join(HISTORY_DIR, "blobs")  # 内容アドレス方式の圧縮blob
+HISTORY_REGISTRY = os.path.join(HISTORY_DIR, "registry.jsonl")  # ビルドごとの構造化レコード（index.md の元）
 INSIGHTS_FILE = os.path.join(OUTPUT_DIR, "insights.md")
 PREDICTIONS_FILE = os.path.join(DATA_DIR, "predictions.jsonl")
 PREDICTIONS_DIR = os.path.join(OUTPUT_DIR, "predictions")
+DIFF_OUTPUT_DIR = os.path.join(OUTPUT_DIR, "diff")  # step3 --diff の複数動画レポート
+CACHE_DIR = os.path.join(DATA_DIR, "cache")  # 再計算省略用キャッシュ（削除しても再生成される）
 
 # youtube-long パイプライン接続 (W-22)
 YOUTUBE_LONG_DIR = os.path.join(os.path.dirname(BASE_DIR), "youtube-long")
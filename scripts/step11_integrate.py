@@ -22,8 +22,10 @@ from config import HISTORY_DIR, INSIGHTS_FILE, HISTORY_INDEX, DATA_DIR, OUTPUT_D
 from common.data_loader import (
     load_golden_theory, save_golden_theory,
     load_insights, save_insights,
+    load_data_pack,
     validate_fundamentals,
 )
+from step8_history import load_registry, render_registry_table
 
 
 METRIC_DESCRIPTIONS = {
@@ -578,6 +580,12 @@ def generate_conclusion_report():
     date = datetime.now().strftime("%Y-%m-%d")
     cycle = frontmatter.get("total_cycles", 0)
     n = model.get("dataset_size", 24)
+    # Step 3 の機械可読データパックがあれば、マークダウンを読まずに本数・内訳を取る
+    pack = load_data_pack("data_summary")
+    n_hit = None
+    if pack:
+        n = len(pack)
+        n_hit = sum(1 for row in pack if row.get("hit"))
 
     lines = []
     lines.append("# 伸びる動画の黄金理論 — 分析結論レポート")
@@ -587,6 +595,8 @@ def generate_conclusion_report():
     # このレポートの読み方
     lines.append("\n## このレポートの読み方")
     lines.append(f"この文書は、{n}本の動画データを分析した結果をまとめたものです。")
+    if n_hit is not None:
+        lines.append(f"（伸びた動画 {n_hit}本 / 伸びなかった動画 {n - n_hit}本）")
     lines.append("「伸びる動画（15万再生以上）」と「伸びない動画」に分けて共通点を調べ、")
     lines.append("制作前に確認できるチェックリストとして整理しました。")
     lines.append("\n---")
@@ -681,8 +691,11 @@ def generate_conclusion_report():
         lines.append("（モデルが未構築です）")
 
     lines.append("\n### モデルの精度推移")
-    # index.mdからバージョン履歴テーブルをそのまま抽出
-    if "| バージョン |" in index_content or "| v" in index_content:
+    # 版レジストリがあればそこから表を作る。無ければ index.md の表をそのまま抽出
+    registry = load_registry()
+    if registry:
+        lines.extend(render_registry_table(registry))
+    elif "| バージョン |" in index_content or "| v" in index_content:
         in_table = False
         for line in index_content.split("\n"):
             if line.strip().startswith("| バージョン") or line.strip().startswith("|---"):
@@ -882,7 +895,7 @@ def main():
         # ファイル状態表示
         print(f"\n{'='*60}")
         print("現在のファイル状態:")
-        for name in ["data_summary.md", "new_hypotheses.md", "verification_report.md"]:
+        for name in ["data_summary.md", "data_summary.jsonl", "new_hypotheses.md", "verification_report.md"]:
             path = os.path.join(OUTPUT_DIR, name)
             if os.path.exists(path):
                 mtime = datetime.fromtimestamp(os.path.getmtime(path)).strftime("%Y-%m-%d %H:%M")
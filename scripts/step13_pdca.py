@@ -21,14 +21,16 @@ import argparse
 import json
 import os
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import VIDEOS_DIR, DATA_DIR, MODEL_FILE, HIT_THRESHOLD, OUTPUT_DIR, PREDICTIONS_FILE
 from common.data_loader import validate_fundamentals
+from common.projection import project_batch, LABEL_HORIZON
 from step1_fetch import fetch_single_video
-from step8_build_model import build_and_save
+from step8_build_model import build_and_save, apply_age_metrics
+from step8_patterns import load_benchmark_sketches, tier_of
 
 
 def load_model():
@@ -39,21 +41,58 @@ def load_model():
         return json.load(f)
 
 
+def _age_days(meta):
+    try:
+        pub = datetime.fromisoformat(meta["published_at"].replace("Z", "+00:00"))
+        return (datetime.now(timezone.utc) - pub).days
+    except (KeyError, ValueError):
+        return None
+
+
+def _tiers(values):
+    """step8 が保存した分位点スケッチでティアを判定する（読み取りのみ。スケッチの更新は step8 が行う）。
+    スケッチがない（step8 未実行）場合は全て None
+    """
+    state = load_benchmark_sketches()
+    if state is None:
+        return {m: None for m in values}
+    return {m: tier_of(state["sketches"], m, v) for m, v in values.items()}
+
+
+def project_single(video_data, model):
+    """日別再生数の減衰カーブから将来再生数を予測する。
+    ピーク後のデータが足りない場合は model.json のプール値（全動画の減衰指数）を使う。
+    """
+    meta = video_data["metadata"]
+    daily = (video_data.get("daily_data") or {}).get("daily", [])
+    by_day = {d.get("day_number"): d.get("views") for d in daily}
+    last = max((k for k in by_day if k), default=0)
+    age_days = _age_days(meta)
+    vid = meta["video_id"]
+    pooled = (model.get("projection") or {}).get("pooled_exponent")
+    out, _ = project_batch(
+        {vid: [by_day.get(t) for t in range(1, last + 1)]},
+        {vid: (meta["current_stats"]["view_count"], age_days)},
+        pooled,
+    )
+    return out.get(vid)
+
+
 def evaluate(video_data, model):
     """予測 vs 実績を評価"""
     views = video_data["metadata"]["current_stats"]["view_count"]
     title = video_data["metadata"]["title"]
     artist = (video_data.get("manual_data") or {}).get("artist_name", title[:20])
 
-    # ティア判定
-    if views >= 500000:
-        tier = "S_500k+"
-    elif views >= 200000:
-        tier = "A_200k-500k"
-    elif views >= 100000:
-        tier = "B_100k-200k"
-    else:
-        tier = "C_under_100k"
+    # 減衰カーブによる将来再生数（公開直後の動画は現在値だと過小評価になるため）
+    projection = project_single(video_data, model)
+    # 日あたり再生数は step8 と同じ計算（公開当日は 0）でスケッチと揃える
+    age_metrics = apply_age_metrics({}, video_data)
+    tiers = _tiers({
+        "views": views,
+        "views_per_day": age_metrics["views_per_day"],
+        "eventual_views": projection["eventual_views"] if projection else None,
+    })
 
     # トラフィック分析
     traffic = video_data.get("traffic_sources", {})
@@ -69,12 +108,18 @@ def evaluate(video_data, model):
         "artist_name": artist,
         "title": title,
         "actual_views": views,
-        "actual_tier": tier,
+        "actual_tier": tiers["views"],
+        "vpd_tier": tiers["views_per_day"],
         "is_hit": views >= HIT_THRESHOLD,
         "browsing_percent": browse_pct,
         "related_percent": related_pct,
         "day2_change": day_change,
         "hook_fraud_detected": day_change is not None and day_change <= -50,
+        "projection_method": projection["method"] if projection else None,
+        "projected_views": projection["eventual_views"] if projection else None,
+        "projected_range": projection["eventual_range"] if projection else None,
+        "projected_tier": tiers["eventual_views"],
+        "projected_is_hit": projection["projected_hit"] if projection else None,
         "evaluation_date": datetime.now().isoformat(),
     }
 
@@ -90,7 +135,8 @@ def generate_pdca_report(ev, video_data, model):
         f"\n## 実績",
         f"\n| 項目 | 値 |", "|------|-----|",
         f"| 再生数 | {ev['actual_views']:,} |",
-        f"| ティア | {ev['actual_tier']} |",
+        f"| ティア | {ev['actual_tier'] or '-'} |",
+        f"| ティア（日あたり再生数） | {ev['vpd_tier'] or '-'} |",
         f"| 判定 | {'🔥 ヒット' if ev['is_hit'] else '📉 不振'} |",
         f"| ブラウジング | {ev['browsing_percent']}% |",
         f"| 関連動画 | {ev['related_percent']}% |",
@@ -99,6 +145,16 @@ def generate_pdca_report(ev, video_data, model):
     if ev.get("day2_change") is not None:
         flag = " ⚠️フック詐欺疑い" if ev["hook_fraud_detected"] else ""
         lines.append(f"| Day1→Day2 | {ev['day2_change']:+.1f}%{flag} |")
+    if ev.get("projected_views") is not None:
+        low, high = ev["projected_range"]
+        lines.append(
+            f"| {LABEL_HORIZON}日予測 | {ev['projected_views']:,} "
+            f"(95%幅 {low:,}–{high:,}, {ev['projection_method']}) |"
+        )
+        lines.append(
+            f"| 予測ティア / 判定 | {ev['projected_tier']} / "
+            f"{'🔥 ヒット' if ev['projected_is_hit'] else '📉 不振'} |"
+        )
 
     # モデル指標との比較
     if o:
@@ -185,6 +241,11 @@ def append_verification(prediction, ev):
             "prediction_correct": prediction["prediction"]["hit_or_miss"] == ("HIT" if ev["is_hit"] else "MISS"),
             "predicted_hit": prediction["prediction"]["hit_or_miss"] == "HIT",
             "actual_hit": ev["is_hit"],
+            "projected_hit": ev.get("projected_is_hit"),
+            "prediction_correct_projected": (
+                prediction["prediction"]["hit_or_miss"] == ("HIT" if ev["projected_is_hit"] else "MISS")
+                if ev.get("projected_is_hit") is not None else None
+            ),
         },
     }
     with open(PREDICTIONS_FILE, "a", encoding="utf-8") as f:
@@ -205,6 +266,14 @@ def generate_prediction_comparison(prediction, ev):
         "|------|------|------|------|",
         f"| HIT/MISS | {p['hit_or_miss']} | {actual_hm} | {match_str(p['hit_or_miss'], actual_hm)} |",
         f"| ランク | {p['rank']} | {ev['actual_tier']} | - |",
+    ]
+    if ev.get("projected_is_hit") is not None:
+        projected_hm = "HIT" if ev["projected_is_hit"] else "MISS"
+        lines.append(
+            f"| HIT/MISS（{LABEL_HORIZON}日予測） | {p['hit_or_miss']} | {projected_hm} "
+            f"| {match_str(p['hit_or_miss'], projected_hm)} |"
+        )
+    lines += [
         f"| 信頼度 | {conf_label} | - | - |",
         f"\n予測日: {prediction['prediction_date'][:10]}",
         f"根拠: {p['reasoning']}",
@@ -289,7 +358,10 @@ def main():
     # サマリー
     print(f"\n{'='*50}")
     print(f"完了: {ev['artist_name']}")
-    print(f"  {ev['actual_views']:,}回 → {ev['actual_tier']} {'🔥' if ev['is_hit'] else '📉'}")
+    print(f"  {ev['actual_views']:,}回 → {ev['actual_tier'] or '-'} {'🔥' if ev['is_hit'] else '📉'}")
+    if ev.get("projected_views") is not None:
+        print(f"  {LABEL_HORIZON}日予測 {ev['projected_views']:,}回 → {ev['projected_tier'] or '-'} "
+              f"{'🔥' if ev['projected_is_hit'] else '📉'}")
     if ev.get("hook_fraud_detected"):
         print(f"  ⚠️ フック詐欺疑い（Day2: {ev['day2_change']:+.1f}%）")
     print("=" * 50)
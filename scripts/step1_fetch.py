@@ -309,6 +309,7 @@ def _get_daily(analytics, video_id, publish_date, days=DAYS_AFTER_PUBLISH):
                 "SUBSCRIBER": "SUBSCRIBER", "RELATED_VIDEO": "RELATED",
                 "YT_SEARCH": "SEARCH", "YT_CHANNEL": "OTHER", "YT_OTHER_PAGE": "OTHER",
             }
+            daily_by_date = {d["date"]: d for d in daily}
             for row in (traffic_resp.get("rows") or []):
                 date_str, source_raw = row[0], row[1]
                 views, minutes = row[2], row[3]
@@ -317,15 +318,14 @@ def _get_daily(analytics, video_id, publish_date, days=DAYS_AFTER_PUBLISH):
                 # 明確な "BROWSE" ソースがある場合はそれを使う
                 if "BROWSE" in source_raw.upper():
                     source = "BROWSE"
-                # 対応する日を探す
-                for d in daily:
-                    if d["date"] == date_str:
-                        tb = d["traffic_breakdown"]
-                        if source not in tb:
-                            tb[source] = {"views": 0, "minutes_watched": 0.0}
-                        tb[source]["views"] += views
-                        tb[source]["minutes_watched"] += round(minutes, 1)
-                        break
+                # 対応する日を引く
+                d = daily_by_date.get(date_str)
+                if d is not None:
+                    tb = d["traffic_breakdown"]
+                    if source not in tb:
+                        tb[source] = {"views": 0, "minutes_watched": 0.0}
+                    tb[source]["views"] += views
+                    tb[source]["minutes_watched"] += round(minutes, 1)
         except Exception as e:
             print(f"    traffic×day クロス集計エラー（スキップ）: {e}")
 
@@ -8,19 +8,30 @@ Phase 1の最終ステップ。全動画データをマークダウン形式で
   - data_summary.md          — 全13セクション（スクリプト向け）
   - retention_data_pack.md   — 維持率分析用（Step 4専用）
   - ctr_data_pack.md         — CTR分析用（Step 5専用）
+  - 上記と同じ行の機械可読版: {stem}.jsonl / {stem}.columns.json
+    （pyarrow があれば {stem}.parquet も）と data_pack_schema.json
+  - retention/ctr のトークン予算付きコンパクト版: {stem}.compact.md
 
 実行方法:
     python scripts/step3_summarize.py              # 全動画の要約
     python scripts/step3_summarize.py --diff VID   # 指定動画の詳細 + 全体比較
+    python scripts/step3_summarize.py --diff VID1 VID2 ...        # 複数動画 → data/output/diff/
+    python scripts/step3_summarize.py --since 2026-02-01 [--until 2026-02-28]  # 公開日で指定
+    python scripts/step3_summarize.py --fetched-since 2026-03-01  # 取得日時で指定
+    python scripts/step3_summarize.py --token-budget 5000  # コンパクト版の予算を指定
 """
 
 import json, os, sys, argparse, math
 from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from config import VIDEOS_DIR, DATA_DIR, OUTPUT_DIR, HUMAN_SCORES_FILE, HIT_THRESHOLD
-from common.data_loader import load_all_videos, load_human_scores, validate_fundamentals
+from config import VIDEOS_DIR, DATA_DIR, OUTPUT_DIR, DIFF_OUTPUT_DIR, HUMAN_SCORES_FILE, HIT_THRESHOLD
+from common.data_loader import load_all_videos, load_human_scores, validate_fundamentals, load_cache, save_cache, stable_hash, source_version
 from common.metrics import avg_or_none as _avg, median_or_none as _median, deep as _deep, fmt as _fmt, fmt_int as _fmt_int
+from common.percentile_index import build_percentile_index, percentile_of
+from common.parallel import default_workers, run_parallel, split_count
+from common.growth_curves import normalize_curve, build_curve_index, cluster_curves, nearest
+from common.traffic_tensor import build_traffic_tensor, day_total, value as traffic_value
 
 
 # ---------------------------------------------------------------------------
@@ -30,10 +41,10 @@ from common.metrics import avg_or_none as _avg, median_or_none as _median, deep
 def extract_metrics(video, human_scores):
     """1本の動画データから表示用の指標辞書を作成する。"""
     vid = video["_video_id"]
-    meta = video.get("metadata", {})
-    ao = video.get("analytics_overview", {})
-    dd = video.get("daily_data", {})
-    md = video.get("manual_data", {})
+    meta = video.get("metadata") or {}
+    ao = video.get("analytics_overview") or {}
+    dd = video.get("daily_data") or {}
+    md = video.get("manual_data") or {}
 
     views = _deep(meta, "current_stats", "view_count") or ao.get("views", 0)
     likes = ao.get("likes", 0) or 0
@@ -81,12 +92,19 @@ def extract_metrics(video, human_scores):
 # ユーティリティ
 # ---------------------------------------------------------------------------
 
-def _find_video(videos, video_id):
-    """video_idに一致する動画データを返す。"""
-    for v in videos:
-        if v.get("_video_id") == video_id:
-            return v
-    return None
+def _hit_label(m):
+    return "HIT" if m["hit"] else "MISS"
+
+
+def _script(v):
+    return (v.get("script_analysis") or {}) if v else {}
+
+
+def _daily_views(v, days=7):
+    """Day1..days の再生数リスト（欠損日は None）"""
+    daily = (v.get("daily_data") or {}).get("daily", []) if v else []
+    by_day = {entry.get("day_number"): entry.get("views") for entry in daily}
+    return [by_day.get(d) for d in range(1, days + 1)]
 
 
 def _classify_growth_pattern(day_views):
@@ -117,35 +135,365 @@ def _classify_growth_pattern(day_views):
         return "初日ピーク→急落"
 
 
+GROWTH_DAYS = 7          # クラスタリングに使う日数（Day1〜N）
+GROWTH_CLUSTERS = 5      # 成長カーブのクラスタ数
+NEAREST_CURVES = 2       # 表示する類似過去カーブの数
+
+
+def build_growth_clusters(videos, artists, k=GROWTH_CLUSTERS):
+    """全動画の Day1-N カーブを DTW 距離でクラスタリングし、成長パターンを割り当てる。
+
+    パターン名は各群のメドイド（代表カーブ）に _classify_growth_pattern() を当てて付け、
+    同名の群は (2), (3) … で区別する。類似カーブは自身より前に公開された動画から探す。
+    戻り値: {"videos": {動画ID: {"cluster", "pattern", "nearest"}}, "clusters": [...],
+             "digest": 入力の内容ハッシュ, "stats": DTW計算数/枝刈り数}
+    """
+    day_views = {v["_video_id"]: _daily_views(v, GROWTH_DAYS) for v in videos}
+    published = {v["_video_id"]: (v.get("metadata") or {}).get("published_at") or "" for v in videos}
+    curves = {}
+    for vid, views in day_views.items():
+        curve = normalize_curve(views)
+        if curve is not None:
+            curves[vid] = curve
+
+    index = build_curve_index(curves)
+    result = cluster_curves(index, k)
+    names, seen = [], {}
+    for medoid in result["medoids"]:
+        name = _classify_growth_pattern(day_views[medoid])
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}({seen[name]})")
+
+    per_video = {}
+    for vid in day_views:
+        if vid not in curves:
+            per_video[vid] = {"cluster": None, "pattern": "データ不足", "nearest": []}
+            continue
+        c = result["assignments"][vid]
+        past = [o for o in curves if published[o] and published[o] < published[vid]]
+        per_video[vid] = {
+            "cluster": c + 1,
+            "pattern": names[c],
+            "nearest": [[o, round(d, 2)] for o, d in nearest(index, vid, past, NEAREST_CURVES)],
+        }
+
+    clusters = [
+        {
+            "id": c + 1,
+            "name": names[c],
+            "medoid": medoid,
+            "members": [vid for vid, a in sorted(result["assignments"].items()) if a == c],
+        }
+        for c, medoid in enumerate(result["medoids"])
+    ]
+    return {
+        "videos": per_video,
+        "clusters": clusters,
+        "digest": stable_hash(day_views, published, artists, k)[:12],
+        "stats": index["stats"],
+    }
+
+
+# ---------------------------------------------------------------------------
+# 共有コンテキスト
+# ---------------------------------------------------------------------------
+
+# 行キャッシュ: 動画ごとの extract_metrics() 結果と各セクションの行文字列を、
+# 動画JSON（台本JSON結合済み）と human_scores エントリの内容ハッシュで保存する。
+# 行ビルダーの実装・HIT_THRESHOLD 等の設定が変わったら自動で無効化されるよう、ソースのハッシュを版とする。
+ROW_CACHE_NAME = "step3_rows"
+ROW_CACHE_VERSION = source_version(
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "metrics.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "traffic_tensor.py"),
+)
+
+
+def build_summary_context(videos, human_scores, row_cache=None):
+    """全出力で共有するコンテキストを作る。
+    指標抽出・ソート・動画ID索引は1回だけ行い、各セクションの出力はここにキャッシュされる。
+    row_cache（前回の export_row_cache() の内容）を渡すと、内容ハッシュが一致する動画は
+    指標と行を再利用し、変更のあった動画の行だけを再計算する。
+    """
+    cached_rows = {}
+    if row_cache and row_cache.get("version") == ROW_CACHE_VERSION:
+        cached_rows = row_cache.get("rows", {})
+
+    rows = {}
+    reused = 0
+    for v in videos:
+        vid = v["_video_id"]
+        digest = stable_hash(v, human_scores.get(vid))
+        entry = cached_rows.get(vid)
+        if entry and entry.get("hash") == digest:
+            reused += 1
+        else:
+            entry = {"hash": digest, "metrics": extract_metrics(v, human_scores), "cells": {}}
+        rows[vid] = entry
+
+    all_metrics = [entry["metrics"] for entry in rows.values()]
+    all_metrics.sort(key=lambda m: m["views"] or 0, reverse=True)
+    artists = {m["video_id"]: m["artist"] for m in all_metrics}
+    return {
+        "all_metrics": all_metrics,
+        "videos_by_id": {v["_video_id"]: v for v in videos},
+        "human_scores": human_scores,
+        "artists": artists,
+        "growth": build_growth_clusters(videos, artists),
+        "traffic": build_traffic_tensor(videos),
+        "rows": rows,
+        "sections": {},
+        "cache_stats": {"reused": reused, "recomputed": len(rows) - reused},
+    }
+
+
+def export_row_cache(ctx):
+    """コンテキストの行キャッシュを保存用の辞書にする（現存する動画のみ）"""
+    return {"version": ROW_CACHE_VERSION, "rows": ctx["rows"]}
+
+
+def _row_cell(ctx, num, m, row_func):
+    """動画 m のセクション num の行（通し番号列を除く）。キャッシュが無ければ計算して保存"""
+    cells = ctx["rows"][m["video_id"]]["cells"]
+    key = str(num)
+    if key not in cells:
+        cells[key] = row_func(m, ctx["videos_by_id"].get(m["video_id"]))
+    return cells[key]
+
+
+def _growth_cell(ctx, key, m, row_func):
+    """成長クラスタ（コーパス全体）に依存する行。キーにクラスタ入力のハッシュを含め、古い版は捨てる"""
+    cells = ctx["rows"][m["video_id"]]["cells"]
+    versioned = f"{key}@{ctx['growth']['digest']}"
+    if versioned not in cells:
+        for stale in [k for k in cells if k.startswith(f"{key}@")]:
+            del cells[stale]
+    return _row_cell(ctx, versioned, m, row_func)
+
+
+def _numbered_rows(ctx, num, row_func):
+    """all_metrics の順にセクション num の行を並べ、先頭に通し番号列を付ける。
+    通し番号は並び順に依存するためキャッシュせず、ここで毎回付与する。
+    """
+    return [
+        f"| {i} " + _row_cell(ctx, num, m, row_func)
+        for i, m in enumerate(ctx["all_metrics"], 1)
+    ]
+
+
+# ---------------------------------------------------------------------------
+# 行ビルダー（1動画 → 通し番号列を除く1行）
+# ---------------------------------------------------------------------------
+
+def _row_1_overview(m, v):
+    return (
+        f"| {m['artist']} "
+        f"| {_fmt_int(m['views'])} "
+        f"| {_fmt(m['gi_x_ca'])} "
+        f"| {_fmt(m['eng_rate'])} "
+        f"| {_fmt(m['b_ctr'])} "
+        f"| {_fmt(m['d1_d2'])} "
+        f"| {_fmt(m['avg_view'], 0)} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_4_script(m, v):
+    sa = _script(v)
+    st = sa.get("structure", {})
+    hook = sa.get("hook_analysis", {})
+    mv = sa.get("mv_insertions", {})
+    ca = sa.get("curiosity_alignment", {})
+    return (
+        f"| {m['artist']} "
+        f"| {st.get('theme_word', '-')} "
+        f"| {'Y' if st.get('has_antagonist') else 'N'} "
+        f"| {st.get('emotional_bottoms_count', '-')} "
+        f"| {'Y' if st.get('bottoms_escalate') else 'N'} "
+        f"| {'Y' if st.get('has_savior') else 'N'} "
+        f"| {mv.get('count', '-')} "
+        f"| {'Y' if hook.get('hook_answered_in_script') else 'N'} "
+        f"| {_fmt(hook.get('hook_answer_position_percent'), 0)} "
+        f"| {'Y' if ca.get('top1_addressed') else 'N'} "
+        f"| {'Y' if ca.get('top2_addressed') else 'N'} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_5_titles(m, v):
+    ca = _script(v).get("curiosity_alignment", {})
+    pub = m.get("published_at", "")
+    if pub and len(pub) >= 10:
+        pub = pub[:10]
+    title = m.get("title", "-")
+    if len(title) > 40:
+        title = title[:40] + "…"
+    return (
+        f"| {m['artist']} "
+        f"| {title} "
+        f"| {ca.get('top1_topic', '-')[:30] if ca.get('top1_topic') else '-'} "
+        f"| {ca.get('top2_topic', '-')[:30] if ca.get('top2_topic') else '-'} "
+        f"| {pub} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_6_gi_subscores(m, hs):
+    src = (hs.get("source", "-") or "-")[:1]
+    top1 = hs.get("curiosity_top1", "-")
+    if top1 and len(top1) > 20:
+        top1 = top1[:20] + "…"
+    return (
+        f"| {m['artist']} "
+        f"| {hs.get('G1', '-')} "
+        f"| {hs.get('G2', '-')} "
+        f"| {hs.get('G3', '-')} "
+        f"| {hs.get('G4', '-')} "
+        f"| {hs.get('G6', '-')} "
+        f"| {hs.get('GI_v3', '-')} "
+        f"| {hs.get('CA', '-')} "
+        f"| {hs.get('GI_x_CA', '-')} "
+        f"| {src} "
+        f"| {top1 if top1 else '-'} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_7_traffic(m, v):
+    md_data = v.get("manual_data") or {} if v else {}
+    ts = v.get("traffic_sources") or {} if v else {}
+    return (
+        f"| {m['artist']} "
+        f"| {_fmt(_deep(md_data, 'browsing', 'views_percent'))} "
+        f"| {_fmt(_deep(ts, 'SUBSCRIBER', 'percentage'))} "
+        f"| {_fmt(_deep(ts, 'RELATED_VIDEO', 'percentage'))} "
+        f"| {_fmt(_deep(ts, 'YT_SEARCH', 'percentage'))} "
+        f"| {_fmt_int(m['views'])} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_8_growth(m, v, growth, artists):
+    day_views = _daily_views(v)
+    day_strs = [_fmt_int(dv) if dv is not None else "-" for dv in day_views]
+    similar = ", ".join(f"{artists.get(o, o)}({d})" for o, d in growth["nearest"]) or "-"
+    return (
+        f"| {m['artist']} "
+        f"| {day_strs[0]} | {day_strs[1]} | {day_strs[2]} | {day_strs[3]} "
+        f"| {day_strs[4]} | {day_strs[5]} | {day_strs[6]} "
+        f"| {growth['pattern']} "
+        f"| {similar} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_9_emotion(m, v):
+    ec = _script(v).get("emotional_curve", {})
+    pba = ec.get("pattern_by_act", {})
+    return (
+        f"| {m['artist']} "
+        f"| {ec.get('total_ups', '-')} "
+        f"| {ec.get('total_downs', '-')} "
+        f"| {ec.get('total_transitions', '-')} "
+        f"| {pba.get('intro', '-')} "
+        f"| {pba.get('first_act', '-')} "
+        f"| {pba.get('second_act', '-')} "
+        f"| {pba.get('third_act', '-')} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_10_opening(m, v):
+    o30 = _script(v).get("opening_30sec", {})
+    return (
+        f"| {m['artist']} "
+        f"| {o30.get('opening_type', '-')} "
+        f"| {o30.get('hook_strength', '-')} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_11_media(m, v):
+    sa = _script(v)
+    mv_count = sa.get("mv_insertions", {}).get("count", 0) or 0
+    non_mv = sa.get("non_mv_media", {}).get("total_links", 0) or 0
+    return (
+        f"| {m['artist']} "
+        f"| {mv_count} "
+        f"| {non_mv} "
+        f"| {mv_count + non_mv} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _day1_traffic(traffic, video_id):
+    """Day1 の総再生数と流入元別再生数（テンソルから引く。記録がなければ None）"""
+    return {
+        "total": day_total(traffic, video_id, 1),
+        **{s: traffic_value(traffic, "views", video_id, 1, s)
+           for s in ("BROWSE", "RELATED", "SEARCH", "SUBSCRIBER")},
+    }
+
+
+def _row_12_day1_traffic(m, traffic):
+    d1 = _day1_traffic(traffic, m["video_id"])
+
+    def _cell(val):
+        return _fmt_int(val) if isinstance(val, (int, float)) else "-"
+
+    return (
+        f"| {m['artist']} "
+        f"| {_cell(d1['total'])} "
+        f"| {_cell(d1['BROWSE'])} "
+        f"| {_cell(d1['RELATED'])} "
+        f"| {_cell(d1['SEARCH'])} "
+        f"| {_cell(d1['SUBSCRIBER'])} "
+        f"| {_hit_label(m)} |"
+    )
+
+
+def _row_13_related(m, v):
+    dd = v.get("daily_data") or {} if v else {}
+    sources = dd.get("related_video_sources", [])
+    top3 = sorted(sources, key=lambda s: s.get("views", 0), reverse=True)[:3]
+    total_related = sum(s.get("views", 0) for s in sources)
+
+    def _fmt_source(s):
+        title = s.get("source_video_title") or s.get("source_video_id", "?")
+        return f"{title}({_fmt_int(s.get('views', 0))})"
+
+    s1 = _fmt_source(top3[0]) if len(top3) > 0 else "-"
+    s2 = _fmt_source(top3[1]) if len(top3) > 1 else "-"
+    s3 = _fmt_source(top3[2]) if len(top3) > 2 else "-"
+    return (
+        f"| {m['artist']} "
+        f"| {s1} "
+        f"| {s2} "
+        f"| {s3} "
+        f"| {_fmt_int(total_related)} "
+        f"| {_hit_label(m)} |"
+    )
+
+
 # ---------------------------------------------------------------------------
 # セクション別ビルダー（各セクションを独立した関数に分離）
 # ---------------------------------------------------------------------------
 
-def _build_section_1_overview(all_metrics):
+def _build_section_1_overview(ctx):
     """§1 概要テーブル"""
     lines = []
     lines.append("## 1. 概要テーブル\n")
     lines.append("| # | アーティスト | 再生数 | GI×CA | eng率(%) | B-CTR(%) | D1→D2(%) | 平均視聴(秒) | HIT |")
     lines.append("|---|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {_fmt_int(m['views'])} "
-            f"| {_fmt(m['gi_x_ca'])} "
-            f"| {_fmt(m['eng_rate'])} "
-            f"| {_fmt(m['b_ctr'])} "
-            f"| {_fmt(m['d1_d2'])} "
-            f"| {_fmt(m['avg_view'], 0)} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 1, _row_1_overview))
     lines.append("")
     return lines
 
 
-def _build_section_2_distribution(all_metrics):
+def _build_section_2_distribution(ctx):
     """§2 分布サマリ"""
+    all_metrics = ctx["all_metrics"]
     lines = []
     lines.append("## 2. 分布サマリ\n")
     hit_list = [m for m in all_metrics if m["hit"]]
@@ -180,8 +528,9 @@ def _build_section_2_distribution(all_metrics):
     return lines
 
 
-def _build_section_3_human_scores(all_metrics, human_scores):
+def _build_section_3_human_scores(ctx):
     """§3 人間評価スコア概要"""
+    human_scores = ctx["human_scores"]
     lines = []
     lines.append("## 3. 人間評価スコア概要\n")
     scored = {vid: s for vid, s in human_scores.items() if s.get("GI_x_CA") is not None}
@@ -207,7 +556,7 @@ def _build_section_3_human_scores(all_metrics, human_scores):
     return lines
 
 
-def _build_section_4_script(all_metrics, videos):
+def _build_section_4_script(ctx):
     """§4 台本構造テーブル"""
     lines = []
     lines.append("## 4. 台本構造テーブル\n")
@@ -216,65 +565,25 @@ def _build_section_4_script(all_metrics, videos):
         "| MV数 | フック回答 | 回答位置(%) | CA_top1回答 | CA_top2回答 | HIT |"
     )
     lines.append("|---|---|---|---|---|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        sa = (v.get("script_analysis") or {}) if v else {}
-        st = sa.get("structure", {})
-        hook = sa.get("hook_analysis", {})
-        mv = sa.get("mv_insertions", {})
-        ca = sa.get("curiosity_alignment", {})
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {st.get('theme_word', '-')} "
-            f"| {'Y' if st.get('has_antagonist') else 'N'} "
-            f"| {st.get('emotional_bottoms_count', '-')} "
-            f"| {'Y' if st.get('bottoms_escalate') else 'N'} "
-            f"| {'Y' if st.get('has_savior') else 'N'} "
-            f"| {mv.get('count', '-')} "
-            f"| {'Y' if hook.get('hook_answered_in_script') else 'N'} "
-            f"| {_fmt(hook.get('hook_answer_position_percent'), 0)} "
-            f"| {'Y' if ca.get('top1_addressed') else 'N'} "
-            f"| {'Y' if ca.get('top2_addressed') else 'N'} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 4, _row_4_script))
     lines.append("")
     return lines
 
 
-def _build_section_5_titles(all_metrics, videos):
+def _build_section_5_titles(ctx):
     """§5 タイトル・好奇心TOP1-2"""
     lines = []
     lines.append("## 5. タイトル・好奇心TOP1-2\n")
     lines.append("| # | アーティスト | タイトル | 好奇心TOP1 | 好奇心TOP2 | 公開日 | HIT |")
     lines.append("|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        sa = (v.get("script_analysis") or {}) if v else {}
-        ca = sa.get("curiosity_alignment", {})
-        pub = m.get("published_at", "")
-        if pub and len(pub) >= 10:
-            pub = pub[:10]
-        hit_label = "HIT" if m["hit"] else "MISS"
-        title = m.get("title", "-")
-        if len(title) > 40:
-            title = title[:40] + "…"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {title} "
-            f"| {ca.get('top1_topic', '-')[:30] if ca.get('top1_topic') else '-'} "
-            f"| {ca.get('top2_topic', '-')[:30] if ca.get('top2_topic') else '-'} "
-            f"| {pub} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 5, _row_5_titles))
     lines.append("")
     return lines
 
 
-def _build_section_6_gi_subscores(all_metrics, human_scores):
+def _build_section_6_gi_subscores(ctx):
     """§6 GIサブスコア"""
+    human_scores = ctx["human_scores"]
     lines = []
     lines.append("## 6. GIサブスコア\n")
     lines.append("> **注意**: 人間評価とAI評価は異なる。AI評価は系統的に過大評価する（insights参照）。")
@@ -286,324 +595,812 @@ def _build_section_6_gi_subscores(all_metrics, human_scores):
     lines.append(f"### 6a. 評価済み（{len(scored_vids)}本: 定量{q_count}本 + 人間{h_count}本）\n")
     lines.append("| アーティスト | G1 | G2 | G3 | G4 | G6 | GI_v3 | CA | GI×CA | src | TOP1 | HIT |")
     lines.append("|---|---|---|---|---|---|---|---|---|---|---|---|")
-    for m in all_metrics:
+    for m in ctx["all_metrics"]:
         hs = human_scores.get(m["video_id"], {})
         if hs.get("GI_x_CA") is None:
             continue
-        hit_label = "HIT" if m["hit"] else "MISS"
-        src = (hs.get("source", "-") or "-")[:1]
-        top1 = hs.get("curiosity_top1", "-")
-        if top1 and len(top1) > 20:
-            top1 = top1[:20] + "…"
-        lines.append(
-            f"| {m['artist']} "
-            f"| {hs.get('G1', '-')} "
-            f"| {hs.get('G2', '-')} "
-            f"| {hs.get('G3', '-')} "
-            f"| {hs.get('G4', '-')} "
-            f"| {hs.get('G6', '-')} "
-            f"| {hs.get('GI_v3', '-')} "
-            f"| {hs.get('CA', '-')} "
-            f"| {hs.get('GI_x_CA', '-')} "
-            f"| {src} "
-            f"| {top1 if top1 else '-'} "
-            f"| {hit_label} |"
-        )
+        lines.append(_row_cell(ctx, 6, m, lambda m, v: _row_6_gi_subscores(m, hs)))
     lines.append("")
     return lines
 
 
-def _build_section_7_traffic(all_metrics, videos):
+def _build_section_7_traffic(ctx):
     """§7 トラフィック構成"""
     lines = []
     lines.append("## 7. トラフィック構成\n")
     lines.append("| # | アーティスト | BROWSING(%) | SUBSCRIBER(%) | RELATED(%) | 検索(%) | 再生数 | HIT |")
     lines.append("|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        md_data = v.get("manual_data", {}) if v else {}
-        ts = v.get("traffic_sources", {}) if v else {}
-        brow_pct = _deep(md_data, "browsing", "views_percent")
-        sub_pct = _deep(ts, "SUBSCRIBER", "percentage")
-        rel_pct = _deep(ts, "RELATED_VIDEO", "percentage")
-        search_pct = _deep(ts, "YT_SEARCH", "percentage")
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {_fmt(brow_pct)} "
-            f"| {_fmt(sub_pct)} "
-            f"| {_fmt(rel_pct)} "
-            f"| {_fmt(search_pct)} "
-            f"| {_fmt_int(m['views'])} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 7, _row_7_traffic))
     lines.append("")
     return lines
 
 
-def _build_section_8_growth(all_metrics, videos):
+def _build_section_8_growth(ctx):
     """§8 日別成長パターン"""
     lines = []
     lines.append("## 8. 日別再生数推移 (Day1-7)\n")
-    lines.append("| # | アーティスト | Day1 | Day2 | Day3 | Day4 | Day5 | Day6 | Day7 | パターン | HIT |")
-    lines.append("|---|---|---|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        dd = v.get("daily_data", {}).get("daily", []) if v else []
-        day_views = []
-        for d in range(1, 8):
-            dv = None
-            for entry in dd:
-                if entry.get("day_number") == d:
-                    dv = entry.get("views")
-                    break
-            day_views.append(dv)
-        pattern = _classify_growth_pattern(day_views)
-        hit_label = "HIT" if m["hit"] else "MISS"
-        day_strs = [_fmt_int(dv) if dv is not None else "-" for dv in day_views]
+    lines.append("> パターン: Day1-7 カーブ（log → z正規化）の DTW 距離による k-medoids クラスタ。"
+                 "名称は各群の代表カーブに従来の分類ルールを適用したもの。"
+                 "類似カーブは先に公開された動画のうち DTW 距離が近いもの（括弧内は距離）。\n")
+    lines.append("| # | アーティスト | Day1 | Day2 | Day3 | Day4 | Day5 | Day6 | Day7 | パターン | 類似カーブ | HIT |")
+    lines.append("|---|---|---|---|---|---|---|---|---|---|---|---|")
+    growth, artists = ctx["growth"], ctx["artists"]
+    for i, m in enumerate(ctx["all_metrics"], 1):
+        g = growth["videos"][m["video_id"]]
+        row = _growth_cell(ctx, "8", m, lambda m, v: _row_8_growth(m, v, g, artists))
+        lines.append(f"| {i} " + row)
+    lines.append("")
+
+    lines.append("### 成長パターン群\n")
+    lines.append("| 群 | パターン | 代表 | 本数 | HIT | MISS |")
+    lines.append("|---|---|---|---|---|---|")
+    hit_by_id = {m["video_id"]: m["hit"] for m in ctx["all_metrics"]}
+    for c in growth["clusters"]:
+        n_hit = sum(1 for vid in c["members"] if hit_by_id.get(vid))
         lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {day_strs[0]} | {day_strs[1]} | {day_strs[2]} | {day_strs[3]} "
-            f"| {day_strs[4]} | {day_strs[5]} | {day_strs[6]} "
-            f"| {pattern} "
-            f"| {hit_label} |"
+            f"| {c['id']} | {c['name']} | {artists.get(c['medoid'], c['medoid'])} "
+            f"| {len(c['members'])} | {n_hit} | {len(c['members']) - n_hit} |"
         )
     lines.append("")
     return lines
 
 
-def _build_section_9_emotion(all_metrics, videos):
+def _build_section_9_emotion(ctx):
     """§9 感情曲線テーブル"""
     lines = []
     lines.append("## 9. 感情曲線テーブル\n")
     lines.append("| # | アーティスト | UP数 | DOWN数 | 転換合計 | Intro | 1幕 | 2幕 | 3幕 | HIT |")
     lines.append("|---|---|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        sa = (v.get("script_analysis") or {}) if v else {}
-        ec = sa.get("emotional_curve", {})
-        hit_label = "HIT" if m["hit"] else "MISS"
-        pba = ec.get("pattern_by_act", {})
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {ec.get('total_ups', '-')} "
-            f"| {ec.get('total_downs', '-')} "
-            f"| {ec.get('total_transitions', '-')} "
-            f"| {pba.get('intro', '-')} "
-            f"| {pba.get('first_act', '-')} "
-            f"| {pba.get('second_act', '-')} "
-            f"| {pba.get('third_act', '-')} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 9, _row_9_emotion))
     lines.append("")
     return lines
 
 
-def _build_section_10_opening(all_metrics, videos):
+def _build_section_10_opening(ctx):
     """§10 導入30秒テーブル"""
     lines = []
     lines.append("## 10. 導入30秒テーブル\n")
     lines.append("| # | アーティスト | 開始タイプ | 引きの強さ(1-5) | HIT |")
     lines.append("|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        sa = (v.get("script_analysis") or {}) if v else {}
-        o30 = sa.get("opening_30sec", {})
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {o30.get('opening_type', '-')} "
-            f"| {o30.get('hook_strength', '-')} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 10, _row_10_opening))
     lines.append("")
     return lines
 
 
-def _build_section_11_media(all_metrics, videos):
+def _build_section_11_media(ctx):
     """§11 本人映像テーブル"""
     lines = []
     lines.append("## 11. 本人映像テーブル\n")
     lines.append("| # | アーティスト | MV数 | 非MVリンク数 | 合計メディア数 | HIT |")
     lines.append("|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        sa = (v.get("script_analysis") or {}) if v else {}
-        mv_count = sa.get("mv_insertions", {}).get("count", 0) or 0
-        non_mv = sa.get("non_mv_media", {}).get("total_links", 0) or 0
-        total_media = mv_count + non_mv
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {mv_count} "
-            f"| {non_mv} "
-            f"| {total_media} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 11, _row_11_media))
     lines.append("")
     return lines
 
 
-def _build_section_12_day1_traffic(all_metrics, videos):
+def _build_section_12_day1_traffic(ctx):
     """§12 Day1トラフィック内訳"""
     lines = []
     lines.append("## 12. Day1トラフィック内訳テーブル\n")
     lines.append("| # | アーティスト | D1合計 | D1_BROWSE | D1_RELATED | D1_SEARCH | D1_SUB | HIT |")
     lines.append("|---|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        dd = v.get("daily_data", {}).get("daily", []) if v else []
-        day1 = dd[0] if dd else {}
-        tb = day1.get("traffic_breakdown", {})
-        d1_total = day1.get("views", "-")
-        d1_browse = tb.get("BROWSE", {}).get("views", "-") if tb else "-"
-        d1_related = tb.get("RELATED", {}).get("views", "-") if tb else "-"
-        d1_search = tb.get("SEARCH", {}).get("views", "-") if tb else "-"
-        d1_sub = tb.get("SUBSCRIBER", {}).get("views", "-") if tb else "-"
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {_fmt_int(d1_total) if isinstance(d1_total, (int, float)) else d1_total} "
-            f"| {_fmt_int(d1_browse) if isinstance(d1_browse, (int, float)) else d1_browse} "
-            f"| {_fmt_int(d1_related) if isinstance(d1_related, (int, float)) else d1_related} "
-            f"| {_fmt_int(d1_search) if isinstance(d1_search, (int, float)) else d1_search} "
-            f"| {_fmt_int(d1_sub) if isinstance(d1_sub, (int, float)) else d1_sub} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 12, lambda m, v: _row_12_day1_traffic(m, ctx["traffic"])))
     lines.append("")
     return lines
 
 
-def _build_section_13_related(all_metrics, videos):
+def _build_section_13_related(ctx):
     """§13 関連動画ソーステーブル"""
     lines = []
     lines.append("## 13. 関連動画ソーステーブル\n")
     lines.append("| # | アーティスト | ソース上位1 | ソース上位2 | ソース上位3 | 関連合計視聴数 | HIT |")
     lines.append("|---|---|---|---|---|---|---|")
-    for i, m in enumerate(all_metrics, 1):
-        v = _find_video(videos, m["video_id"])
-        dd = v.get("daily_data", {}) if v else {}
-        sources = dd.get("related_video_sources", [])
-        top3 = sorted(sources, key=lambda s: s.get("views", 0), reverse=True)[:3]
-        total_related = sum(s.get("views", 0) for s in sources)
-
-        def _fmt_source(s):
-            title = s.get("source_video_title") or s.get("source_video_id", "?")
-            v_count = s.get("views", 0)
-            return f"{title}({_fmt_int(v_count)})"
-
-        s1 = _fmt_source(top3[0]) if len(top3) > 0 else "-"
-        s2 = _fmt_source(top3[1]) if len(top3) > 1 else "-"
-        s3 = _fmt_source(top3[2]) if len(top3) > 2 else "-"
-        hit_label = "HIT" if m["hit"] else "MISS"
-        lines.append(
-            f"| {i} "
-            f"| {m['artist']} "
-            f"| {s1} "
-            f"| {s2} "
-            f"| {s3} "
-            f"| {_fmt_int(total_related)} "
-            f"| {hit_label} |"
-        )
+    lines.extend(_numbered_rows(ctx, 13, _row_13_related))
     lines.append("")
     return lines
 
 
+SECTION_BUILDERS = {
+    1: _build_section_1_overview,
+    2: _build_section_2_distribution,
+    3: _build_section_3_human_scores,
+    4: _build_section_4_script,
+    5: _build_section_5_titles,
+    6: _build_section_6_gi_subscores,
+    7: _build_section_7_traffic,
+    8: _build_section_8_growth,
+    9: _build_section_9_emotion,
+    10: _build_section_10_opening,
+    11: _build_section_11_media,
+    12: _build_section_12_day1_traffic,
+    13: _build_section_13_related,
+}
+
+
+def _section(ctx, num):
+    """セクション num の行リスト。初回のみ構築し、以降は ctx のキャッシュを返す。"""
+    cache = ctx["sections"]
+    if num not in cache:
+        cache[num] = SECTION_BUILDERS[num](ctx)
+    return cache[num]
+
+
 # ---------------------------------------------------------------------------
-# フル要約モード（全13セクション）
+# 出力定義（ファイル名 → タイトル・注記・収録セクション）
 # ---------------------------------------------------------------------------
 
-def build_full_summary(videos, human_scores):
-    """全動画の要約マークダウンを生成する（全13セクション）。"""
+SUMMARY_OUTPUTS = {
+    "data_summary.md": {
+        "title": "動画データ要約",
+        "note": None,
+        "sections": list(range(1, 14)),
+    },
+    "retention_data_pack.md": {
+        "title": "維持率分析用データパック",
+        "note": "> Step 4（維持率分析エージェント）専用。維持率×台本構造の分析に必要なデータのみ収録。\n",
+        "sections": [1, 2, 4, 9, 10, 11],
+    },
+    "ctr_data_pack.md": {
+        "title": "CTR分析用データパック",
+        "note": "> Step 5（CTR分析エージェント）専用。CTR×トピック×タイトル分析に必要なデータのみ収録。\n",
+        "sections": [1, 2, 3, 5, 6, 7, 12, 13],
+    },
+}
+
+
+def render_output(ctx, filename):
+    """SUMMARY_OUTPUTS[filename] の定義に従ってマークダウンを組み立てる。"""
+    spec = SUMMARY_OUTPUTS[filename]
     now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-    all_metrics = [extract_metrics(v, human_scores) for v in videos]
-    all_metrics.sort(key=lambda m: m["views"] or 0, reverse=True)
+    lines = [f"# {spec['title']}\n", f"生成日時: {now_str}\n"]
+    if spec["note"]:
+        lines.append(spec["note"])
+    for num in spec["sections"]:
+        lines.extend(_section(ctx, num))
+    return "\n".join(lines)
+
+
+def render_all_outputs(ctx):
+    """全出力を1回のデータ走査で生成し、{ファイル名: 内容} を返す。"""
+    return {filename: render_output(ctx, filename) for filename in SUMMARY_OUTPUTS}
+
+
+# ---------------------------------------------------------------------------
+# 機械可読データパック（JSONL / 列指向JSON / Parquet + スキーマ）
+# ---------------------------------------------------------------------------
+
+# マークダウン表と同じ行（再生数降順）を型付きで出力する。
+# 集計のみの §2 分布 / §3 人間評価サマリは行を持たないため対象外。
+# 表示用の丸め・省略（"…"）・Y/N 変換はせず、欠損は null とする。
+DATA_PACK_SCHEMA_VERSION = 1
+DATA_PACK_SCHEMA_FILE = "data_pack_schema.json"
+
+# （列名, 型, セクション, 説明）  型: string / integer / number / boolean
+DATA_PACK_FIELDS = [
+    ("rank", "integer", 1, "再生数降順の通し番号"),
+    ("video_id", "string", 1, "動画ID"),
+    ("artist", "string", 1, "アーティスト名"),
+    ("views", "integer", 1, "再生数"),
+    ("gi_x_ca", "number", 1, "GI×CA"),
+    ("eng_rate", "number", 1, "エンゲージメント率(%)"),
+    ("b_ctr", "number", 1, "ブラウジングCTR(%)"),
+    ("d1_d2", "number", 1, "Day1→Day2 変化率(%)"),
+    ("avg_view", "number", 1, "平均視聴時間(秒)"),
+    ("hit", "boolean", 1, "HIT判定"),
+    ("theme_word", "string", 4, "テーマワード"),
+    ("has_antagonist", "boolean", 4, "敵役の有無"),
+    ("emotional_bottoms_count", "integer", 4, "どん底の数"),
+    ("bottoms_escalate", "boolean", 4, "どん底のエスカレート"),
+    ("has_savior", "boolean", 4, "救済者の有無"),
+    ("mv_count", "integer", 4, "MV挿入数"),
+    ("hook_answered", "boolean", 4, "フックの回答が台本内にあるか"),
+    ("hook_answer_position_percent", "number", 4, "フック回答位置(%)"),
+    ("top1_addressed", "boolean", 4, "好奇心TOP1に言及"),
+    ("top2_addressed", "boolean", 4, "好奇心TOP2に言及"),
+    ("title", "string", 5, "タイトル（省略なし）"),
+    ("curiosity_top1_topic", "string", 5, "好奇心TOP1トピック"),
+    ("curiosity_top2_topic", "string", 5, "好奇心TOP2トピック"),
+    ("published_date", "string", 5, "公開日(YYYY-MM-DD)"),
+    ("G1", "number", 6, "GIサブスコア G1"),
+    ("G2", "number", 6, "GIサブスコア G2"),
+    ("G3", "number", 6, "GIサブスコア G3"),
+    ("G4", "number", 6, "GIサブスコア G4"),
+    ("G6", "number", 6, "GIサブスコア G6"),
+    ("GI_v3", "number", 6, "GI v3 合計"),
+    ("CA", "number", 6, "CA"),
+    ("score_source", "string", 6, "スコアの出典"),
+    ("curiosity_top1", "string", 6, "好奇心TOP1（human_scores）"),
+    ("browsing_views_percent", "number", 7, "ブラウジング流入比率(%)"),
+    ("subscriber_percent", "number", 7, "登録者流入比率(%)"),
+    ("related_video_percent", "number", 7, "関連動画流入比率(%)"),
+    ("yt_search_percent", "number", 7, "検索流入比率(%)"),
+    ("day1_views", "integer", 8, "Day1 再生数"),
+    ("day2_views", "integer", 8, "Day2 再生数"),
+    ("day3_views", "integer", 8, "Day3 再生数"),
+    ("day4_views", "integer", 8, "Day4 再生数"),
+    ("day5_views", "integer", 8, "Day5 再生数"),
+    ("day6_views", "integer", 8, "Day6 再生数"),
+    ("day7_views", "integer", 8, "Day7 再生数"),
+    ("growth_pattern", "string", 8, "成長パターン（DTWクラスタ名）"),
+    ("growth_cluster", "integer", 8, "成長パターン群の番号"),
+    ("nearest_curve_video_id", "string", 8, "最も近い過去動画のカーブ"),
+    ("nearest_curve_distance", "number", 8, "上記との DTW 距離"),
+    ("emotion_ups", "integer", 9, "感情曲線の上昇数"),
+    ("emotion_downs", "integer", 9, "感情曲線の下降数"),
+    ("emotion_transitions", "integer", 9, "感情曲線の転換数"),
+    ("act_intro", "string", 9, "導入の感情パターン"),
+    ("act_first", "string", 9, "第1幕の感情パターン"),
+    ("act_second", "string", 9, "第2幕の感情パターン"),
+    ("act_third", "string", 9, "第3幕の感情パターン"),
+    ("opening_type", "string", 10, "導入30秒のタイプ"),
+    ("hook_strength", "integer", 10, "フック強度"),
+    ("non_mv_media_links", "integer", 11, "MV以外の映像素材数"),
+    ("media_total", "integer", 11, "映像素材の総数（MV含む）"),
+    ("day1_total_views", "integer", 12, "Day1 再生数（トラフィック内訳の母数）"),
+    ("day1_browse_views", "integer", 12, "Day1 ブラウジング再生数"),
+    ("day1_related_views", "integer", 12, "Day1 関連動画再生数"),
+    ("day1_search_views", "integer", 12, "Day1 検索再生数"),
+    ("day1_subscriber_views", "integer", 12, "Day1 登録者再生数"),
+    ("related_top1_title", "string", 13, "関連動画ソース1位"),
+    ("related_top1_views", "integer", 13, "関連動画ソース1位の再生数"),
+    ("related_top2_title", "string", 13, "関連動画ソース2位"),
+    ("related_top2_views", "integer", 13, "関連動画ソース2位の再生数"),
+    ("related_top3_title", "string", 13, "関連動画ソース3位"),
+    ("related_top3_views", "integer", 13, "関連動画ソース3位の再生数"),
+    ("related_total_views", "integer", 13, "関連動画経由の総再生数"),
+]
+
+_TYPE_CASTS = {"string": str, "integer": int, "number": float, "boolean": bool}
+
+
+def _typed(value, ftype):
+    """スキーマの型に変換する。欠損・変換不能は None"""
+    if value is None:
+        return None
+    try:
+        return _TYPE_CASTS[ftype](value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _record_1_overview(m, v):
+    return {k: m[k] for k in ("video_id", "artist", "views", "gi_x_ca", "eng_rate",
+                              "b_ctr", "d1_d2", "avg_view", "hit")}
+
+
+def _record_4_script(m, v):
+    sa = _script(v)
+    st = sa.get("structure", {})
+    hook = sa.get("hook_analysis", {})
+    ca = sa.get("curiosity_alignment", {})
+    return {
+        "theme_word": st.get("theme_word"),
+        "has_antagonist": st.get("has_antagonist"),
+        "emotional_bottoms_count": st.get("emotional_bottoms_count"),
+        "bottoms_escalate": st.get("bottoms_escalate"),
+        "has_savior": st.get("has_savior"),
+        "mv_count": sa.get("mv_insertions", {}).get("count"),
+        "hook_answered": hook.get("hook_answered_in_script"),
+        "hook_answer_position_percent": hook.get("hook_answer_position_percent"),
+        "top1_addressed": ca.get("top1_addressed"),
+        "top2_addressed": ca.get("top2_addressed"),
+    }
+
+
+def _record_5_titles(m, v):
+    ca = _script(v).get("curiosity_alignment", {})
+    return {
+        "title": m.get("title") or None,
+        "curiosity_top1_topic": ca.get("top1_topic"),
+        "curiosity_top2_topic": ca.get("top2_topic"),
+        "published_date": (m.get("published_at") or "")[:10] or None,
+    }
+
+
+def _record_6_gi_subscores(m, hs):
+    record = {k: hs.get(k) for k in ("G1", "G2", "G3", "G4", "G6", "GI_v3", "CA")}
+    record["score_source"] = hs.get("source")
+    record["curiosity_top1"] = hs.get("curiosity_top1")
+    return record
+
+
+def _record_7_traffic(m, v):
+    md_data = v.get("manual_data") or {} if v else {}
+    ts = v.get("traffic_sources") or {} if v else {}
+    return {
+        "browsing_views_percent": _deep(md_data, "browsing", "views_percent"),
+        "subscriber_percent": _deep(ts, "SUBSCRIBER", "percentage"),
+        "related_video_percent": _deep(ts, "RELATED_VIDEO", "percentage"),
+        "yt_search_percent": _deep(ts, "YT_SEARCH", "percentage"),
+    }
+
 
-    lines = [f"# 動画データ要約\n", f"生成日時: {now_str}\n"]
-    lines.extend(_build_section_1_overview(all_metrics))
-    lines.extend(_build_section_2_distribution(all_metrics))
-    lines.extend(_build_section_3_human_scores(all_metrics, human_scores))
-    lines.extend(_build_section_4_script(all_metrics, videos))
-    lines.extend(_build_section_5_titles(all_metrics, videos))
-    lines.extend(_build_section_6_gi_subscores(all_metrics, human_scores))
-    lines.extend(_build_section_7_traffic(all_metrics, videos))
-    lines.extend(_build_section_8_growth(all_metrics, videos))
-    lines.extend(_build_section_9_emotion(all_metrics, videos))
-    lines.extend(_build_section_10_opening(all_metrics, videos))
-    lines.extend(_build_section_11_media(all_metrics, videos))
-    lines.extend(_build_section_12_day1_traffic(all_metrics, videos))
-    lines.extend(_build_section_13_related(all_metrics, videos))
+def _record_8_growth(m, v, growth):
+    record = {f"day{d}_views": dv for d, dv in enumerate(_daily_views(v), 1)}
+    record["growth_pattern"] = growth["pattern"]
+    record["growth_cluster"] = growth["cluster"]
+    if growth["nearest"]:
+        record["nearest_curve_video_id"], record["nearest_curve_distance"] = growth["nearest"][0]
+    return record
+
+
+def _record_9_emotion(m, v):
+    ec = _script(v).get("emotional_curve", {})
+    pba = ec.get("pattern_by_act", {})
+    return {
+        "emotion_ups": ec.get("total_ups"),
+        "emotion_downs": ec.get("total_downs"),
+        "emotion_transitions": ec.get("total_transitions"),
+        "act_intro": pba.get("intro"),
+        "act_first": pba.get("first_act"),
+        "act_second": pba.get("second_act"),
+        "act_third": pba.get("third_act"),
+    }
+
+
+def _record_10_opening(m, v):
+    o30 = _script(v).get("opening_30sec", {})
+    return {
+        "opening_type": o30.get("opening_type"),
+        "hook_strength": o30.get("hook_strength"),
+    }
+
+
+def _record_11_media(m, v):
+    sa = _script(v)
+    if not sa:
+        return {"non_mv_media_links": None, "media_total": None}
+    mv_count = sa.get("mv_insertions", {}).get("count", 0) or 0
+    non_mv = sa.get("non_mv_media", {}).get("total_links", 0) or 0
+    return {"non_mv_media_links": non_mv, "media_total": mv_count + non_mv}
+
+
+def _record_12_day1_traffic(m, traffic):
+    d1 = _day1_traffic(traffic, m["video_id"])
+    return {
+        "day1_total_views": d1["total"],
+        "day1_browse_views": d1["BROWSE"],
+        "day1_related_views": d1["RELATED"],
+        "day1_search_views": d1["SEARCH"],
+        "day1_subscriber_views": d1["SUBSCRIBER"],
+    }
+
+
+def _record_13_related(m, v):
+    dd = v.get("daily_data") or {} if v else {}
+    sources = dd.get("related_video_sources", [])
+    top3 = sorted(sources, key=lambda s: s.get("views", 0), reverse=True)[:3]
+    record = {"related_total_views": sum(s.get("views", 0) for s in sources)}
+    for rank in range(1, 4):
+        s = top3[rank - 1] if len(top3) >= rank else {}
+        record[f"related_top{rank}_title"] = s.get("source_video_title") or s.get("source_video_id")
+        record[f"related_top{rank}_views"] = s.get("views")
+    return record
+
+
+RECORD_BUILDERS = {
+    1: _record_1_overview,
+    4: _record_4_script,
+    5: _record_5_titles,
+    7: _record_7_traffic,
+    9: _record_9_emotion,
+    10: _record_10_opening,
+    11: _record_11_media,
+    13: _record_13_related,
+}
+
+
+def _record_cell(ctx, num, m):
+    """動画 m のセクション num の型付きレコード（行キャッシュと同じ仕組みで保存）"""
+    if num == 6:
+        hs = ctx["human_scores"].get(m["video_id"], {})
+        return _row_cell(ctx, "6.record", m, lambda m, v: _record_6_gi_subscores(m, hs))
+    if num == 8:
+        g = ctx["growth"]["videos"][m["video_id"]]
+        return _growth_cell(ctx, "8.record", m, lambda m, v: _record_8_growth(m, v, g))
+    if num == 12:
+        return _row_cell(ctx, "12.record", m, lambda m, v: _record_12_day1_traffic(m, ctx["traffic"]))
+    return _row_cell(ctx, f"{num}.record", m, RECORD_BUILDERS[num])
+
+
+def _pack_fields(sections):
+    return [f for f in DATA_PACK_FIELDS if f[2] in sections]
+
+
+def build_data_pack_rows(ctx, sections):
+    """sections に含まれる列だけを持つ型付き行のリスト（マークダウン表と同じ並び）"""
+    fields = _pack_fields(sections)
+    record_sections = [num for num in sections if num in (6, 8, 12) or num in RECORD_BUILDERS]
+    rows = []
+    for i, m in enumerate(ctx["all_metrics"], 1):
+        raw = {"rank": i}
+        for num in record_sections:
+            raw.update(_record_cell(ctx, num, m))
+        rows.append({name: _typed(raw.get(name), ftype) for name, ftype, _, _ in fields})
+    return rows
+
+
+def _write_parquet(path, fields, columns):
+    """pyarrow が使える環境でのみ Parquet を書き出す。書き出せたら True"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return False
+    arrow_types = {"string": pa.string(), "integer": pa.int64(),
+                   "number": pa.float64(), "boolean": pa.bool_()}
+    table = pa.table({
+        name: pa.array(columns[name], type=arrow_types[ftype])
+        for name, ftype, _, _ in fields
+    })
+    pq.write_table(table, path)
+    return True
+
+
+def export_data_packs(ctx, output_dir=OUTPUT_DIR):
+    """SUMMARY_OUTPUTS の各出力と同じ行を機械可読形式で書き出し、書き出したパスを返す。
+
+    {stem}.jsonl         — 1行1動画の JSON Lines
+    {stem}.columns.json  — 列指向 JSON（{"fields": [...], "columns": {列名: [値...]}}）
+    {stem}.parquet       — pyarrow がある場合のみ
+    data_pack_schema.json — 列の型・出典セクション・説明と、出力ごとの列一覧
+    """
+    paths = []
+    schema = {
+        "version": DATA_PACK_SCHEMA_VERSION,
+        "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "fields": [
+            {"name": name, "type": ftype, "section": num, "description": desc}
+            for name, ftype, num, desc in DATA_PACK_FIELDS
+        ],
+        "outputs": {},
+    }
+    for filename, spec in SUMMARY_OUTPUTS.items():
+        stem = os.path.splitext(filename)[0]
+        fields = _pack_fields(spec["sections"])
+        names = [f[0] for f in fields]
+        rows = build_data_pack_rows(ctx, spec["sections"])
+        columns = {name: [row[name] for row in rows] for name in names}
+        files = [f"{stem}.jsonl", f"{stem}.columns.json"]
+
+        path = os.path.join(output_dir, files[0])
+        with open(path, "w", encoding="utf-8") as f:
+            for row in rows:
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+        paths.append(path)
+
+        path = os.path.join(output_dir, files[1])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"fields": names, "columns": columns}, f, ensure_ascii=False)
+        paths.append(path)
+
+        path = os.path.join(output_dir, f"{stem}.parquet")
+        if _write_parquet(path, fields, columns):
+            files.append(f"{stem}.parquet")
+            paths.append(path)
+
+        schema["outputs"][stem] = {
+            "markdown": filename,
+            "sections": [num for num in spec["sections"] if num not in (2, 3)],
+            "fields": names,
+            "rows": len(rows),
+            "files": files,
+        }
+
+    path = os.path.join(output_dir, DATA_PACK_SCHEMA_FILE)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(schema, f, ensure_ascii=False, indent=2)
+    paths.append(path)
+    return paths
+
+
+# ---------------------------------------------------------------------------
+# トークン予算付きコンパクトパック（Step 4/5 エージェント向け）
+# ---------------------------------------------------------------------------
+
+# フル版のドメインパックは動画数に比例して大きくなるため、予算内に収めた
+# {stem}.compact.md を併せて出力する。
+#   - アーティスト名・再生数・HIT は凡例表に1回だけ載せ、各表は短いIDで参照
+#   - 数値は k/M 表記、真偽は Y/N、全行欠損・全行同値の列は注記に畳む
+#   - 行は HIT と公開日の近いMISSの組 → 外れ値MISS → 残りのMISS の順に予算まで採用
+#   - §3 の動画別の表は動画数に比例して伸びるため、件数・範囲だけを残す
+DEFAULT_TOKEN_BUDGET = 4000
+COMPACT_OUTPUTS = ["retention_data_pack.md", "ctr_data_pack.md"]
+COMPACT_TEXT_LIMIT = 40          # 文字列セルの最大長
+OUTLIER_Z = 2.0                  # 外れ値とみなす |z|
+LEGEND_FIELDS = ["video_id", "artist", "views", "hit"]
+
+
+def estimate_tokens(text):
+    """トークン数の概算。非ASCII（日本語）は1文字≒1トークン、ASCIIは4文字≒1トークン"""
+    non_ascii = sum(1 for ch in text if ord(ch) > 127)
+    return non_ascii + (len(text) - non_ascii + 3) // 4
+
+
+def _compact_value(value):
+    """セル値の短縮表記"""
+    if value is None:
+        return "-"
+    if isinstance(value, bool):
+        return "Y" if value else "N"
+    if isinstance(value, float) and abs(value) < 10000:
+        return f"{value:.1f}".rstrip("0").rstrip(".")
+    if isinstance(value, (int, float)):
+        value = int(round(value))
+        if abs(value) >= 1_000_000:
+            return f"{value / 1e6:.1f}M"
+        if abs(value) >= 10_000:
+            return f"{value / 1e3:.0f}k"
+        return str(value)
+    text = str(value).replace("|", "/")
+    return text if len(text) <= COMPACT_TEXT_LIMIT else text[:COMPACT_TEXT_LIMIT] + "…"
+
+
+def _date_ordinal(date_str):
+    try:
+        return datetime.strptime(date_str, "%Y-%m-%d").toordinal()
+    except (TypeError, ValueError):
+        return None
 
+
+def _outlier_scores(rows, numeric_fields):
+    """各行の max|z|（数値列ごとに全行で標準化）"""
+    scores = [0.0] * len(rows)
+    for name in numeric_fields:
+        vals = [row[name] for row in rows if row.get(name) is not None]
+        if len(vals) < 3:
+            continue
+        mean = sum(vals) / len(vals)
+        sd = math.sqrt(sum((x - mean) ** 2 for x in vals) / (len(vals) - 1))
+        if sd == 0:
+            continue
+        for i, row in enumerate(rows):
+            if row.get(name) is not None:
+                scores[i] = max(scores[i], abs(row[name] - mean) / sd)
+    return scores
+
+
+def select_stratified(rows, numeric_fields):
+    """層別の優先順で (行番号, 区分) を並べる。
+
+    1. HIT（再生数順）と、その直後に公開日が最も近いMISS（対応MISS、重複なし）
+    2. 外れ値MISS: いずれかの数値列で |z| >= OUTLIER_Z（|z| の大きい順）
+    3. 残りのMISS（再生数順 = HIT閾値に近い順）
+    """
+    hits = [i for i, row in enumerate(rows) if row["hit"]]
+    misses = [i for i, row in enumerate(rows) if not row["hit"]]
+    order = []
+    taken = set(hits)
+
+    # 予算が HIT 全件に満たなくても比較対象が残るよう、HIT と対応MISS を交互に並べる
+    dates = {i: _date_ordinal(rows[i].get("published_date")) for i in range(len(rows))}
+    for h in hits:
+        order.append((h, "HIT"))
+        if dates[h] is None:
+            continue
+        candidates = [i for i in misses if i not in taken and dates[i] is not None]
+        if candidates:
+            best = min(candidates, key=lambda i: (abs(dates[i] - dates[h]), i))
+            order.append((best, "MISS(対応)"))
+            taken.add(best)
+
+    scores = _outlier_scores(rows, numeric_fields)
+    outliers = sorted(
+        (i for i in misses if i not in taken and scores[i] >= OUTLIER_Z),
+        key=lambda i: -scores[i],
+    )
+    order.extend((i, "MISS(外れ値)") for i in outliers)
+    taken.update(outliers)
+    order.extend((i, "MISS") for i in misses if i not in taken)
+    return order
+
+
+def _compact_row(vid_id, row, columns):
+    """表の1行。全セルが欠損なら None"""
+    cells = [_compact_value(row.get(c)) for c in columns]
+    if all(c == "-" for c in cells):
+        return None
+    return f"| {vid_id} | " + " | ".join(cells) + " |"
+
+
+def _legend_row(vid_id, row, label):
+    return (
+        f"| {vid_id} | {row['video_id']} | {_compact_value(row['artist'])} "
+        f"| {_compact_value(row['views'])} | {label} |"
+    )
+
+
+def _compact_table(ids, rows, columns):
+    """ID列 + columns の表。全セルが欠損の行は省く"""
+    lines = ["| ID | " + " | ".join(columns) + " |", "|" + "---|" * (len(columns) + 1)]
+    for vid_id, row in zip(ids, rows):
+        line = _compact_row(vid_id, row, columns)
+        if line:
+            lines.append(line)
+    return lines
+
+
+def _compact_section_3(ctx):
+    """§3 のコンパクト版: 件数・範囲だけ残し、動画ごとの表（全動画分）は省く"""
+    lines = _section(ctx, 3)
+    head = lines[:lines.index("| アーティスト | VID | GI_v3 | CA | GI×CA |")]
+    return head + ["> 動画ごとの GI×CA は §1・§6 の表を参照。", ""]
+
+
+def _render_compact(ctx, spec, rows, picked, section_columns, folded, summary):
+    ids = [f"V{i + 1}" for i in range(len(picked))]
+    sel_rows = [rows[i] for i, _ in picked]
+    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    lines = [f"# {spec['title']}（コンパクト版）\n", f"生成日時: {now_str}\n"]
+    if spec["note"]:
+        lines.append(spec["note"])
+    lines.append(summary)
+    lines.append("> 表記: k=千, M=百万, Y/N=真偽, -=欠損。各表の ID は凡例を参照。")
+    lines.extend(folded)
+    lines.append("")
+    lines.append("## 凡例\n")
+    lines.append("| ID | video_id | アーティスト | 再生数 | 区分 |")
+    lines.append("|---|---|---|---|---|")
+    for vid_id, row, (_, label) in zip(ids, sel_rows, picked):
+        lines.append(_legend_row(vid_id, row, label))
+    lines.append("")
+    for num in spec["sections"]:
+        if num == 2:
+            # 分布サマリは動画数によらず一定の大きさなのでマークダウン版を流用
+            lines.extend(_section(ctx, num))
+            continue
+        if num == 3:
+            lines.extend(_compact_section_3(ctx))
+            continue
+        if not section_columns.get(num):
+            continue
+        lines.append(_section(ctx, num)[0])
+        lines.extend(_compact_table(ids, sel_rows, section_columns[num]))
+        lines.append("")
     return "\n".join(lines)
 
 
+def render_compact_pack(ctx, filename, token_budget=DEFAULT_TOKEN_BUDGET):
+    """SUMMARY_OUTPUTS[filename] のコンパクト版を予算内で組み立てる。
+    戻り値: (マークダウン, {"full_tokens", "tokens", "budget", "selected", "total"})
+    """
+    spec = SUMMARY_OUTPUTS[filename]
+    rows = build_data_pack_rows(ctx, list(range(1, 14)))
+    fields = [f for f in _pack_fields(spec["sections"]) if f[0] not in LEGEND_FIELDS + ["rank"]]
+
+    # 全行欠損・全行同値の列は表から外して注記に畳む
+    empty, constant = [], []
+    section_columns = {}
+    for name, _, num, _ in fields:
+        values = {json.dumps(row.get(name), ensure_ascii=False) for row in rows}
+        if values == {"null"}:
+            empty.append(name)
+        elif len(values) == 1 and len(rows) > 1:
+            constant.append(f"{name}={_compact_value(rows[0].get(name))}")
+        else:
+            section_columns.setdefault(num, []).append(name)
+    folded = []
+    if empty:
+        folded.append(f"> 全行欠損のため省略した列: {', '.join(empty)}")
+    if constant:
+        folded.append(f"> 全行同値の列: {', '.join(constant)}")
+
+    numeric = [name for name, ftype, _, _ in fields if ftype in ("integer", "number")
+               and any(name in cols for cols in section_columns.values())]
+    order = select_stratified(rows, numeric)
+    full_tokens = estimate_tokens(render_output(ctx, filename))
+
+    def _summary(picked, tokens):
+        counts = {}
+        for _, label in picked:
+            counts[label] = counts.get(label, 0) + 1
+        breakdown = "・".join(f"{k} {v}" for k, v in counts.items()) or "なし"
+        saved = full_tokens - tokens
+        return (
+            f"> トークン予算 {token_budget:,} / 推定 {tokens:,} tokens"
+            f"（フル版 {full_tokens:,} から -{saved:,}, {saved / full_tokens * 100:.0f}%削減）。"
+            f"収録 {len(picked)}/{len(rows)}本（{breakdown}）。§2/§3 の集計は全{len(rows)}本が対象"
+            "（§3 は件数・範囲のみ）。"
+        )
+
+    def _render(picked):
+        # 注記の数値は描画後に確定するため、桁数の近い仮値で一度測ってから確定させる
+        draft = _render_compact(ctx, spec, rows, sorted(picked), section_columns, folded,
+                                _summary(picked, full_tokens))
+        tokens = estimate_tokens(draft)
+        text = _render_compact(ctx, spec, rows, sorted(picked), section_columns, folded,
+                               _summary(picked, tokens))
+        return text, estimate_tokens(text)
+
+    def _row_cost(vid_id, row, label):
+        # 凡例の1行 + 各表の1行（全欠損の表には行が出ない）。改行の分も数える
+        lines = [_legend_row(vid_id, row, label)]
+        for num in spec["sections"]:
+            if section_columns.get(num) and num not in (2, 3):
+                lines.append(_compact_row(vid_id, row, section_columns[num]))
+        return sum(estimate_tokens(line) + 1 for line in lines if line)
+
+    # 行ごとの増分を行自身のテキストから見積もって優先順に採用し、
+    # 注記の桁数などで超過したら末尾から削って確定
+    _, base_tokens = _render([])
+    picked, used = [], base_tokens
+    for i, label in order:
+        cost = _row_cost(f"V{len(picked) + 1}", rows[i], label)
+        if used + cost <= token_budget:
+            picked.append((i, label))
+            used += cost
+    text, tokens = _render(picked)
+    while tokens > token_budget and picked:
+        picked.pop()
+        text, tokens = _render(picked)
+    return text, {
+        "full_tokens": full_tokens,
+        "tokens": tokens,
+        "budget": token_budget,
+        "selected": len(picked),
+        "total": len(rows),
+    }
+
+
+# ---------------------------------------------------------------------------
+# フル要約モード（全13セクション）
+# ---------------------------------------------------------------------------
+
+def build_full_summary(videos, human_scores, ctx=None):
+    """全動画の要約マークダウンを生成する（全13セクション）。"""
+    ctx = ctx or build_summary_context(videos, human_scores)
+    return render_output(ctx, "data_summary.md")
+
+
 # ---------------------------------------------------------------------------
 # ドメイン別データパック
 # ---------------------------------------------------------------------------
 
-def build_retention_data_pack(videos, human_scores):
+def build_retention_data_pack(videos, human_scores, ctx=None):
     """維持率分析用データパック（Step 4専用）。
     含まれるセクション: §1概要, §2分布, §4台本構造, §9感情曲線, §10導入30秒, §11本人映像
     """
-    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-    all_metrics = [extract_metrics(v, human_scores) for v in videos]
-    all_metrics.sort(key=lambda m: m["views"] or 0, reverse=True)
-
-    lines = [f"# 維持率分析用データパック\n", f"生成日時: {now_str}\n"]
-    lines.append("> Step 4（維持率分析エージェント）専用。維持率×台本構造の分析に必要なデータのみ収録。\n")
-    lines.extend(_build_section_1_overview(all_metrics))
-    lines.extend(_build_section_2_distribution(all_metrics))
-    lines.extend(_build_section_4_script(all_metrics, videos))
-    lines.extend(_build_section_9_emotion(all_metrics, videos))
-    lines.extend(_build_section_10_opening(all_metrics, videos))
-    lines.extend(_build_section_11_media(all_metrics, videos))
-
-    return "\n".join(lines)
+    ctx = ctx or build_summary_context(videos, human_scores)
+    return render_output(ctx, "retention_data_pack.md")
 
 
-def build_ctr_data_pack(videos, human_scores):
+def build_ctr_data_pack(videos, human_scores, ctx=None):
     """CTR分析用データパック（Step 5専用）。
     含まれるセクション: §1概要, §2分布, §3人間評価, §5タイトル, §6GIサブスコア,
                         §7トラフィック, §12Day1トラフィック, §13関連動画ソース
     """
-    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-    all_metrics = [extract_metrics(v, human_scores) for v in videos]
-    all_metrics.sort(key=lambda m: m["views"] or 0, reverse=True)
-
-    lines = [f"# CTR分析用データパック\n", f"生成日時: {now_str}\n"]
-    lines.append("> Step 5（CTR分析エージェント）専用。CTR×トピック×タイトル分析に必要なデータのみ収録。\n")
-    lines.extend(_build_section_1_overview(all_metrics))
-    lines.extend(_build_section_2_distribution(all_metrics))
-    lines.extend(_build_section_3_human_scores(all_metrics, human_scores))
-    lines.extend(_build_section_5_titles(all_metrics, videos))
-    lines.extend(_build_section_6_gi_subscores(all_metrics, human_scores))
-    lines.extend(_build_section_7_traffic(all_metrics, videos))
-    lines.extend(_build_section_12_day1_traffic(all_metrics, videos))
-    lines.extend(_build_section_13_related(all_metrics, videos))
-
-    return "\n".join(lines)
+    ctx = ctx or build_summary_context(videos, human_scores)
+    return render_output(ctx, "ctr_data_pack.md")
 
 
 # ---------------------------------------------------------------------------
 # 差分モード
 # ---------------------------------------------------------------------------
 
-def _percentile(val, all_vals):
-    """val が all_vals の中で何パーセンタイルに位置するかを返す。"""
-    if not all_vals or val is None:
-        return None
-    below = sum(1 for v in all_vals if v < val)
-    return round(below / len(all_vals) * 100, 1)
+# パーセンタイル索引の対象指標（表示名, キー, 単位, 小数桁）
+DIFF_PERCENTILE_METRICS = [
+    ("再生数", "views", "", None),
+    ("eng率", "eng_rate", "%", 1),
+    ("B-CTR", "b_ctr", "%", 1),
+    ("平均視聴", "avg_view", "秒", 0),
+]
 
 
-def build_diff_summary(target_vid, videos, human_scores):
-    """指定動画の詳細 + 全体比較マークダウンを生成する。"""
+def build_diff_index(videos, human_scores):
+    """差分モード用の共通コンテキスト（全動画の指標 + パーセンタイル索引）を1回だけ作る。"""
+    all_metrics = [extract_metrics(v, human_scores) for v in videos]
+    return {
+        "metrics_by_id": {m["video_id"]: m for m in all_metrics},
+        "percentiles": build_percentile_index(
+            all_metrics, [key for _, key, _, _ in DIFF_PERCENTILE_METRICS]
+        ),
+    }
+
+
+def build_diff_summary(target_vid, videos, human_scores, diff_index=None):
+    """指定動画の詳細 + 全体比較マークダウンを生成する。
+    diff_index を渡すと全動画の指標抽出と索引構築を省略する（複数動画の一括生成用）。
+    """
     lines = []
     now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
 
@@ -617,15 +1414,17 @@ def build_diff_summary(target_vid, videos, human_scores):
     if target is None:
         return f"# エラー\n\n動画 `{target_vid}` が見つかりません。\n"
 
-    all_metrics = [extract_metrics(v, human_scores) for v in videos]
-    target_metrics = extract_metrics(target, human_scores)
+    if diff_index is None:
+        diff_index = build_diff_index(videos, human_scores)
+    pindex = diff_index["percentiles"]
+    target_metrics = diff_index["metrics_by_id"].get(target_vid) or extract_metrics(target, human_scores)
 
     lines.append(f"# 動画詳細: {target_metrics['artist']} ({target_vid})\n")
     lines.append(f"生成日時: {now_str}\n")
 
     # 基本情報
     lines.append("## 基本情報\n")
-    meta = target.get("metadata", {})
+    meta = target.get("metadata") or {}
     lines.append(f"- タイトル: {meta.get('title', '-')}")
     lines.append(f"- 公開日: {meta.get('published_at', '-')}")
     lines.append(f"- 動画長: {meta.get('duration_display', '-')} ({meta.get('duration_seconds', '-')}秒)")
@@ -633,32 +1432,30 @@ def build_diff_summary(target_vid, videos, human_scores):
     lines.append(f"- HIT判定: {'HIT' if target_metrics['hit'] else 'MISS'}")
     lines.append("")
 
-    # パーセンタイル比較
+    # パーセンタイル比較（全体 / HIT群内 / MISS群内）
     lines.append("## 全体での位置づけ (パーセンタイル)\n")
-
-    views_all = [m["views"] for m in all_metrics if m["views"] is not None]
-    eng_all = [m["eng_rate"] for m in all_metrics if m["eng_rate"] is not None]
-    avd_all = [m["avg_view"] for m in all_metrics if m["avg_view"] is not None]
-    bctr_all = [m["b_ctr"] for m in all_metrics if m["b_ctr"] is not None]
-
-    lines.append(f"| 指標 | 値 | パーセンタイル |")
-    lines.append(f"|---|---|---|")
-    lines.append(f"| 再生数 | {_fmt_int(target_metrics['views'])} | {_fmt(_percentile(target_metrics['views'], views_all))}% |")
-    lines.append(f"| eng率 | {_fmt(target_metrics['eng_rate'])}% | {_fmt(_percentile(target_metrics['eng_rate'], eng_all))}% |")
-    lines.append(f"| B-CTR | {_fmt(target_metrics['b_ctr'])}% | {_fmt(_percentile(target_metrics['b_ctr'], bctr_all))}% |")
-    lines.append(f"| 平均視聴 | {_fmt(target_metrics['avg_view'], 0)}秒 | {_fmt(_percentile(target_metrics['avg_view'], avd_all))}% |")
+    lines.append(f"| 指標 | 値 | 全体 | HIT群内 | MISS群内 |")
+    lines.append(f"|---|---|---|---|---|")
+    for label, key, unit, decimals in DIFF_PERCENTILE_METRICS:
+        val = target_metrics[key]
+        val_s = _fmt_int(val) if decimals is None else f"{_fmt(val, decimals)}{unit}"
+        cells = [
+            f"{_fmt(percentile_of(pindex, key, val, cohort))}%"
+            for cohort in ("all", "HIT", "MISS")
+        ]
+        lines.append(f"| {label} | {val_s} | " + " | ".join(cells) + " |")
     lines.append("")
 
     # analytics_overview 全フィールド
     lines.append("## Analytics Overview\n")
-    ao = target.get("analytics_overview", {})
+    ao = target.get("analytics_overview") or {}
     for k, v in ao.items():
         lines.append(f"- {k}: {_fmt(v) if isinstance(v, float) else v}")
     lines.append("")
 
     # traffic_sources
     lines.append("## Traffic Sources\n")
-    ts = target.get("traffic_sources", {})
+    ts = target.get("traffic_sources") or {}
     if ts:
         lines.append("| ソース | 再生数 | 割合(%) |")
         lines.append("|---|---|---|")
@@ -668,7 +1465,7 @@ def build_diff_summary(target_vid, videos, human_scores):
 
     # demographics
     lines.append("## Demographics\n")
-    demo = target.get("demographics", {})
+    demo = target.get("demographics") or {}
     breakdown = demo.get("breakdown", {})
     if breakdown:
         lines.append("| 年代 | 男性(%) | 女性(%) |")
@@ -682,7 +1479,7 @@ def build_diff_summary(target_vid, videos, human_scores):
 
     # daily_data
     lines.append("## Daily Data\n")
-    dd = target.get("daily_data", {})
+    dd = target.get("daily_data") or {}
     daily = dd.get("daily", [])
     if daily:
         lines.append("| Day | 日付 | 再生数 | 平均視聴(秒) | 登録者増 |")
@@ -700,7 +1497,7 @@ def build_diff_summary(target_vid, videos, human_scores):
 
     # manual_data (browsing / related)
     lines.append("## Manual Data (主要トラフィック)\n")
-    md = target.get("manual_data", {})
+    md = target.get("manual_data") or {}
     for section_name in ["browsing", "related"]:
         sec = md.get(section_name, {})
         if sec:
@@ -739,13 +1536,118 @@ def build_diff_summary(target_vid, videos, human_scores):
     return "\n".join(lines)
 
 
+# ---------------------------------------------------------------------------
+# 差分モード（複数動画の一括生成）
+# ---------------------------------------------------------------------------
+
+def _iso_date(value):
+    """argparse 用: YYYY-MM-DD または ISO 日時を検証してそのまま返す"""
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付の形式が不正です: {value}（例: 2026-03-01）")
+    return value
+
+
+def _on_or_after(timestamp, bound):
+    """ISO 文字列同士を bound の桁数で比較する（日付でも日時でも指定可能）"""
+    return bool(timestamp) and timestamp[:len(bound)] >= bound
+
+
+def select_diff_targets(videos, video_ids=None, since=None, until=None, fetched_since=None):
+    """差分レポートの対象動画を選ぶ。戻り値: (対象動画リスト, 見つからなかったID)
+    video_ids 指定時はその順、それ以外は公開日順。日付条件は AND で絞り込む。
+    """
+    by_id = {v["_video_id"]: v for v in videos}
+    if video_ids:
+        missing = [vid for vid in video_ids if vid not in by_id]
+        targets = [by_id[vid] for vid in dict.fromkeys(video_ids) if vid in by_id]
+    else:
+        missing = []
+        targets = sorted(videos, key=lambda v: (v.get("metadata") or {}).get("published_at", ""))
+
+    def _published(v):
+        return (v.get("metadata") or {}).get("published_at", "")
+
+    if since:
+        targets = [v for v in targets if _on_or_after(_published(v), since)]
+    if until:
+        targets = [v for v in targets if _published(v)[:len(until)] <= until]
+    if fetched_since:
+        targets = [v for v in targets if _on_or_after(v.get("fetch_timestamp"), fetched_since)]
+    return targets, missing
+
+
+def _render_diff_chunk(task):
+    """ワーカー: 動画群の差分レポートを生成し [(動画ID, マークダウン)] を返す"""
+    targets, human_scores, diff_index = task
+    return [
+        (v["_video_id"], build_diff_summary(v["_video_id"], [v], human_scores, diff_index))
+        for v in targets
+    ]
+
+
+def build_diff_index_page(targets, diff_index):
+    """複数動画の差分レポートへの索引ページ"""
+    now_str = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    pindex = diff_index["percentiles"]
+    lines = [f"# 動画詳細レポート索引（{len(targets)}本）\n", f"生成日時: {now_str}\n"]
+    lines.append("| # | アーティスト | 公開日 | 再生数 | 再生数パーセンタイル | HIT | レポート |")
+    lines.append("|---|---|---|---|---|---|---|")
+    for i, v in enumerate(targets, 1):
+        vid = v["_video_id"]
+        m = diff_index["metrics_by_id"][vid]
+        pct = percentile_of(pindex, "views", m["views"])
+        lines.append(
+            f"| {i} | {m['artist']} | {(m.get('published_at') or '-')[:10]} "
+            f"| {_fmt_int(m['views'])} | {_fmt(pct)}% | {_hit_label(m)} | [{vid}]({vid}.md) |"
+        )
+    lines.append("")
+    return "\n".join(lines)
+
+
+def write_diff_reports(targets, human_scores, diff_index, output_dir=DIFF_OUTPUT_DIR, workers=None):
+    """対象動画ごとの差分レポートをプロセスプールで生成し、output_dir/{動画ID}.md と
+    index.md に書き出す。コーパスと索引は呼び出し側で1回だけ作ったものを共有する。
+    戻り値: 書き出したパスのリスト（index.md が末尾）
+    """
+    workers = workers or default_workers()
+    sizes = split_count(len(targets), workers)
+    tasks, start = [], 0
+    for size in sizes:
+        tasks.append((targets[start:start + size], human_scores, diff_index))
+        start += size
+
+    os.makedirs(output_dir, exist_ok=True)
+    paths = []
+    for chunk in run_parallel(_render_diff_chunk, tasks, workers):
+        for vid, content in chunk:
+            path = os.path.join(output_dir, f"{vid}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            paths.append(path)
+
+    path = os.path.join(output_dir, "index.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_diff_index_page(targets, diff_index))
+    paths.append(path)
+    return paths
+
+
 # ---------------------------------------------------------------------------
 # main
 # ---------------------------------------------------------------------------
 
 def main():
     parser = argparse.ArgumentParser(description="動画データ要約ツール")
-    parser.add_argument("--diff", metavar="VIDEO_ID", help="指定動画の詳細 + 全体比較")
+    parser.add_argument("--diff", metavar="VIDEO_ID", nargs="*",
+                        help="指定動画の詳細 + 全体比較（複数指定時は data/output/diff/ に個別出力）")
+    parser.add_argument("--since", type=_iso_date, help="差分モード: この日以降に公開された動画")
+    parser.add_argument("--until", type=_iso_date, help="差分モード: この日までに公開された動画")
+    parser.add_argument("--fetched-since", type=_iso_date, help="差分モード: この日時以降に取得された動画")
+    parser.add_argument("--no-cache", action="store_true", help="行キャッシュを使わず全行を再計算")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET,
+                        help=f"コンパクト版データパックのトークン予算（既定: {DEFAULT_TOKEN_BUDGET}）")
     args = parser.parse_args()
 
     # 不変基盤の整合性チェック (W-23)
@@ -756,37 +1658,67 @@ def main():
     videos = load_all_videos()
     human_scores = load_human_scores()
 
-    if args.diff:
-        md_content = build_diff_summary(args.diff, videos, human_scores)
-        print(f"[diff] 動画 {args.diff} の詳細を生成しました")
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(md_content)
-        print(f"[output] {output_path}")
+    filters = args.since or args.until or args.fetched_since
+    if args.diff is not None or filters:
+        if not args.diff and not filters:
+            parser.error("--diff には動画IDを指定するか、--since / --until / --fetched-since を併用してください")
+        diff_index = build_diff_index(videos, human_scores)
+
+        if len(args.diff or []) == 1 and not filters:
+            # 従来どおり1本だけ: data_summary.md に出力
+            vid = args.diff[0]
+            md_content = build_diff_summary(vid, videos, human_scores, diff_index)
+            print(f"[diff] 動画 {vid} の詳細を生成しました")
+
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(md_content)
+            print(f"[output] {output_path}")
+            return
+
+        targets, missing = select_diff_targets(
+            videos, args.diff, args.since, args.until, args.fetched_since
+        )
+        for vid in missing:
+            print(f"[diff] WARNING: 動画 {vid} が見つかりません")
+        if not targets:
+            print("[diff] 条件に一致する動画がありません")
+            return
+        paths = write_diff_reports(targets, human_scores, diff_index)
+        print(f"[diff] {len(targets)}本の動画の詳細を生成しました")
+        print(f"[output] {paths[-1]}")
     else:
-        # --- フルサマリ ---
-        md_content = build_full_summary(videos, human_scores)
+        # --- フルサマリ + ドメイン別データパック（共有コンテキストで一括生成） ---
+        row_cache = None if args.no_cache else load_cache(ROW_CACHE_NAME)
+        ctx = build_summary_context(videos, human_scores, row_cache)
+        outputs = render_all_outputs(ctx)
         n_videos = len(videos)
-        n_hit = sum(1 for v in videos
-                    if (_deep(v, "metadata", "current_stats", "view_count") or 0) >= HIT_THRESHOLD)
+        n_hit = sum(1 for m in ctx["all_metrics"] if m["hit"])
+        stats = ctx["cache_stats"]
         print(f"[summary] {n_videos}本の動画を要約しました (HIT: {n_hit}本, MISS: {n_videos - n_hit}本)")
-
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(md_content)
-        print(f"[output] {output_path}")
-
-        # --- ドメイン別データパック ---
-        ret_path = os.path.join(OUTPUT_DIR, "retention_data_pack.md")
-        ret_content = build_retention_data_pack(videos, human_scores)
-        with open(ret_path, "w", encoding="utf-8") as f:
-            f.write(ret_content)
-        print(f"[output] {ret_path}")
-
-        ctr_path = os.path.join(OUTPUT_DIR, "ctr_data_pack.md")
-        ctr_content = build_ctr_data_pack(videos, human_scores)
-        with open(ctr_path, "w", encoding="utf-8") as f:
-            f.write(ctr_content)
-        print(f"[output] {ctr_path}")
+        print(f"[cache] 行キャッシュ再利用 {stats['reused']}本 / 再計算 {stats['recomputed']}本")
+        gstats = ctx["growth"]["stats"]
+        print(f"[growth] {len(ctx['growth']['clusters'])}群にクラスタリング "
+              f"(DTW計算 {gstats['dtw']}回 / 下界で枝刈り {gstats['pruned']}回)")
+
+        for filename, content in outputs.items():
+            path = os.path.join(OUTPUT_DIR, filename)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            print(f"[output] {path}")
+
+        for path in export_data_packs(ctx):
+            print(f"[output] {path}")
+
+        for filename in COMPACT_OUTPUTS:
+            content, st = render_compact_pack(ctx, filename, args.token_budget)
+            path = os.path.join(OUTPUT_DIR, os.path.splitext(filename)[0] + ".compact.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            print(f"[compact] {filename}: 推定 {st['full_tokens']:,} → {st['tokens']:,} tokens "
+                  f"(-{st['full_tokens'] - st['tokens']:,}, 予算 {st['budget']:,}), "
+                  f"収録 {st['selected']}/{st['total']}本")
+            print(f"[output] {path}")
+        save_cache(ROW_CACHE_NAME, export_row_cache(ctx))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+"""
+Step 8 サブモジュール: 視聴者層プロファイル分析
+
+視聴者層テンソル（common.demographics）から動画ごとの 年齢層×性別 プロファイルを作り、
+  - 全ペアのコサイン類似度（最も似た動画の組）
+  - k-means による視聴者層クラスタ（群ごとの HIT 率）
+  - 公開日に沿った視聴者層の推移（年齢層シェアの傾き、直前の動画群からのずれ）
+を計算して、動画ごとの特徴量（compute_derived_metrics に渡す）とまとめを返す。
+"""
+
+from datetime import date
+
+from config import HIT_THRESHOLD
+from common.demographics import (
+    AGE_GROUPS, build_demographics_tensor, profile, age_marginal, gender_marginal,
+    mean_age, cosine, similarity_matrix, mean_vector, kmeans,
+)
+
+
+AUDIENCE_CLUSTERS = 3    # 視聴者層クラスタ数
+DRIFT_WINDOW = 5         # 「直前の動画群」として比べる本数
+MIN_DRIFT_HISTORY = 2    # ずれを計算するのに必要な直前の動画数
+TOP_SIMILAR_PAIRS = 5
+YOUNG_AGES = ("age13-17", "age18-24", "age25-34")
+AUDIENCE_FEATURES = (
+    "audience_mean_age", "audience_female_pct", "audience_young_pct",
+    "audience_cluster", "audience_typicality", "audience_shift",
+)
+
+
+def _age_label(age):
+    label = age.replace("age", "")
+    return label[:-1] + "歳以上" if label.endswith("-") else label + "歳"
+
+
+def _cluster_name(centroid):
+    """群の中心から「最大の年齢層・男性比率」の名前を付ける"""
+    ages = age_marginal(centroid)
+    top = max(range(len(ages)), key=lambda i: ages[i])
+    male = gender_marginal(centroid)[0]
+    return f"{_age_label(AGE_GROUPS[top])}中心・男性{male * 100:.0f}%"
+
+
+def _slope_per_year(points):
+    """[(日付の序数, 値)] の最小二乗傾きを1年あたりに換算する"""
+    if len(points) < 3:
+        return None
+    mx = sum(x for x, _ in points) / len(points)
+    my = sum(y for _, y in points) / len(points)
+    sxx = sum((x - mx) ** 2 for x, _ in points)
+    if sxx == 0:
+        return None
+    return sum((x - mx) * (y - my) for x, y in points) / sxx * 365
+
+
+def analyze_audience_profiles(videos):
+    """全動画の視聴者層プロファイルを分析する。
+
+    戻り値: {"videos": {動画ID: 特徴量}, "clusters": [...], "drift": {...}, "similar_pairs": [...], ...}
+    """
+    tensor = build_demographics_tensor(videos)
+    meta = {v.get("_video_id") or v["metadata"]["video_id"]: v["metadata"] for v in videos}
+    profiles = {}
+    for vid in tensor["videos"]:
+        vec = profile(tensor, vid)
+        if vec is not None:
+            profiles[vid] = vec
+
+    result = {
+        "profiled_count": len(profiles),
+        "videos": {vid: None for vid in tensor["videos"]},
+        "clusters": [],
+        "drift": {},
+        "similar_pairs": [],
+    }
+    if not profiles:
+        return result
+
+    corpus_mean = mean_vector(profiles.values())
+    clustering = kmeans(profiles, AUDIENCE_CLUSTERS)
+    names = []
+    for centroid in clustering["centroids"]:
+        name = _cluster_name(centroid)
+        names.append(name if name not in names else f"{name}({sum(n.startswith(name) for n in names) + 1})")
+
+    # 公開日順に並べ、直前 DRIFT_WINDOW 本の平均プロファイルからのずれを求める
+    ordered = sorted(profiles, key=lambda vid: (meta[vid]["published_at"], vid))
+    shift = {}
+    for i, vid in enumerate(ordered):
+        history = ordered[max(0, i - DRIFT_WINDOW):i]
+        if len(history) >= MIN_DRIFT_HISTORY:
+            shift[vid] = round(1 - cosine(profiles[vid], mean_vector(profiles[h] for h in history)), 4)
+
+    for vid, vec in profiles.items():
+        ages = age_marginal(vec)
+        young = sum(ages[AGE_GROUPS.index(a)] for a in YOUNG_AGES)
+        result["videos"][vid] = {
+            "audience_mean_age": round(mean_age(vec), 1),
+            "audience_female_pct": round(gender_marginal(vec)[1] * 100, 1),
+            "audience_young_pct": round(young * 100, 1),
+            "audience_cluster": names[clustering["assignments"][vid]],
+            "audience_typicality": round(cosine(vec, corpus_mean), 4),
+            "audience_shift": shift.get(vid),
+        }
+
+    for c, (name, centroid) in enumerate(zip(names, clustering["centroids"])):
+        members = [vid for vid, a in clustering["assignments"].items() if a == c]
+        hits = sum(1 for vid in members if meta[vid]["current_stats"]["view_count"] >= HIT_THRESHOLD)
+        result["clusters"].append({
+            "name": name,
+            "size": len(members),
+            "hit_rate": round(hits / len(members), 3) if members else None,
+            "mean_age": round(mean_age(centroid), 1),
+            "age_shares": {a: round(x * 100, 1) for a, x in zip(AGE_GROUPS, age_marginal(centroid))},
+            "videos": members,
+        })
+
+    # 年齢層シェア・平均年齢の公開日に沿った傾き（pt/年・歳/年）
+    ordinals = {vid: date.fromisoformat(meta[vid]["published_at"][:10]).toordinal() for vid in ordered}
+    age_slopes = {}
+    for i, age in enumerate(AGE_GROUPS):
+        s = _slope_per_year([(ordinals[vid], age_marginal(profiles[vid])[i] * 100) for vid in ordered])
+        age_slopes[age] = round(s, 2) if s is not None else None
+    age_slope = _slope_per_year([(ordinals[vid], mean_age(profiles[vid])) for vid in ordered])
+    half = len(ordered) // 2
+    result["drift"] = {
+        "age_share_slope_per_year": age_slopes,
+        "mean_age_slope_per_year": round(age_slope, 2) if age_slope is not None else None,
+        "early_mean_age": round(mean_age(mean_vector(profiles[v] for v in ordered[:half])), 1) if half else None,
+        "late_mean_age": round(mean_age(mean_vector(profiles[v] for v in ordered[half:])), 1),
+        "first_published": meta[ordered[0]]["published_at"][:10],
+        "last_published": meta[ordered[-1]]["published_at"][:10],
+    }
+
+    sims = similarity_matrix(profiles)
+    result["similar_pairs"] = [
+        {"videos": [a, b], "similarity": round(s, 4)}
+        for (a, b), s in sorted(sims.items(), key=lambda x: (-x[1], x[0]))[:TOP_SIMILAR_PAIRS]
+    ]
+    return result
@@ -0,0 +1,173 @@
+"""
+Step 8 サブモジュール: 相関係数のブートストラップ信頼区間
+
+N≈24 の相関は1本の入れ替えで順位が変わるため、レコード表を復元抽出して
+r(log再生数) の95%信頼区間と、原因/結果指標内での順位の安定度を付与する。
+
+高速化:
+  - 各指標を (x, y, x², y², xy, 有無) の列に前処理し、1回のリサンプルは
+    インデックス行列 → 重み(出現回数)ベクトルに変換して map(mul) で一括集計
+  - リサンプルをチャンクに分割し、プロセスプールで並列実行
+"""
+
+import math
+import random
+from collections import Counter
+from operator import mul
+
+from common.parallel import run_parallel, split_count
+from step8_patterns import CAUSE_METRIC_DEFS, EFFECT_METRIC_DEFS
+
+
+BOOTSTRAP_RESAMPLES = 10000    # リサンプル回数
+BOOTSTRAP_SEED = 20260302      # 再現性のための乱数シード
+BOOTSTRAP_CHUNK = 1000         # 1タスクのリサンプル数（結果がコア数に依存しないよう固定）
+RANK_TOLERANCE = 1             # 順位安定度: 観測順位±この範囲に収まった割合
+
+
+# ===========================================================================
+#  前処理
+# ===========================================================================
+
+def _build_columns(records, keys):
+    """指標ごとに (x, y, xx, yy, xy, present) の6列を作る。欠損は0埋め + present=0"""
+    ys = [r["log_views"] for r in records]
+    columns = []
+    for key in keys:
+        cols = ([], [], [], [], [], [])
+        for r, y in zip(records, ys):
+            x = r.get(key)
+            if x is None:
+                vals = (0.0, 0.0, 0.0, 0.0, 0.0, 0)
+            else:
+                x = float(x)
+                vals = (x, y, x * x, y * y, x * y, 1)
+            for c, v in zip(cols, vals):
+                c.append(v)
+        columns.append(cols)
+    return columns
+
+
+def _weighted_r(cols, w):
+    """重みベクトル w（各レコードの出現回数）での Pearson r。計算不能なら None"""
+    sx, sy, sxx, syy, sxy, cnt = (sum(map(mul, w, c)) for c in cols)
+    if cnt < 3:
+        return None
+    vx = cnt * sxx - sx * sx
+    vy = cnt * syy - sy * sy
+    if vx <= 1e-12 or vy <= 1e-12:
+        return None
+    return (cnt * sxy - sx * sy) / math.sqrt(vx * vy)
+
+
+def _bootstrap_chunk(task):
+    """ワーカー: 1チャンク分のリサンプルを実行し、[リサンプル][指標] の r 行列を返す"""
+    columns, n, seed, count = task
+    rng = random.Random(seed)
+    population = range(n)
+    # インデックス行列 (count × n) を一括生成し、重み行列に変換
+    index_matrix = [rng.choices(population, k=n) for _ in range(count)]
+    out = []
+    for idx in index_matrix:
+        counts = Counter(idx)
+        w = [counts.get(i, 0) for i in population]
+        out.append([_weighted_r(cols, w) for cols in columns])
+    return out
+
+
+# ===========================================================================
+#  集計
+# ===========================================================================
+
+def _quantile(sorted_vals, q):
+    """ソート済みリストの線形補間分位点"""
+    if not sorted_vals:
+        return None
+    pos = (len(sorted_vals) - 1) * q
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    frac = pos - lo
+    return sorted_vals[lo] * (1 - frac) + sorted_vals[hi] * frac
+
+
+def _rank_stats(samples, member_idx, observed_order):
+    """カテゴリ内の |r| 順位を各リサンプルで求め、指標ごとの順位分布を返す"""
+    ranks = {m: [] for m in member_idx}
+    for row in samples:
+        # None（計算不能）は最下位扱い
+        ordered = sorted(
+            member_idx,
+            key=lambda m: -abs(row[m]) if row[m] is not None else 1.0,
+        )
+        for rank, m in enumerate(ordered, 1):
+            ranks[m].append(rank)
+    out = {}
+    for m in member_idx:
+        rs = sorted(ranks[m])
+        obs = observed_order[m]
+        stable = sum(1 for r in rs if abs(r - obs) <= RANK_TOLERANCE)
+        out[m] = {
+            "rank_ci95": [round(_quantile(rs, 0.025)), round(_quantile(rs, 0.975))],
+            "rank_stability": round(stable / len(rs), 3) if rs else None,
+        }
+    return out
+
+
+def attach_bootstrap_intervals(correlations, records, n_resamples=BOOTSTRAP_RESAMPLES,
+                               seed=BOOTSTRAP_SEED, workers=None):
+    """compute_correlations() の結果に95%CIと順位安定度を付与する（in-place）。
+
+    各エントリに追加されるフィールド:
+      - ci95_r_log_views: r(log再生数) のパーセンタイル95%CI
+      - bootstrap_se:     r のブートストラップ標準誤差
+      - rank_ci95:        カテゴリ内 |r| 順位の95%区間
+      - rank_stability:   リサンプルのうち順位が観測順位±RANK_TOLERANCE に収まった割合
+    """
+    sections = [
+        ("cause_metrics", dict(CAUSE_METRIC_DEFS)),
+        ("effect_metrics", dict(EFFECT_METRIC_DEFS)),
+    ]
+    entries = []  # (section, 指標名, キー, 観測順位)
+    for section, name_to_key in sections:
+        for rank, name in enumerate(correlations.get(section, {}), 1):
+            if name in name_to_key:
+                entries.append((section, name, name_to_key[name], rank))
+    if not entries or len(records) < 3:
+        return correlations
+
+    columns = _build_columns(records, [e[2] for e in entries])
+    chunk_counts = split_count(n_resamples, -(-n_resamples // BOOTSTRAP_CHUNK))
+    tasks = [
+        (columns, len(records), seed + i, c) for i, c in enumerate(chunk_counts)
+    ]
+    samples = [row for chunk in run_parallel(_bootstrap_chunk, tasks, workers) for row in chunk]
+
+    # 信頼区間
+    for m, (section, name, _, _) in enumerate(entries):
+        vals = sorted(row[m] for row in samples if row[m] is not None)
+        entry = correlations[section][name]
+        if len(vals) < 2:
+            entry["ci95_r_log_views"] = None
+            entry["bootstrap_se"] = None
+            continue
+        mean = sum(vals) / len(vals)
+        se = math.sqrt(sum((v - mean) ** 2 for v in vals) / (len(vals) - 1))
+        entry["ci95_r_log_views"] = [
+            round(_quantile(vals, 0.025), 3), round(_quantile(vals, 0.975), 3)
+        ]
+        entry["bootstrap_se"] = round(se, 3)
+
+    # 順位安定度（カテゴリ内）
+    for section, _ in sections:
+        member_idx = [m for m, e in enumerate(entries) if e[0] == section]
+        observed = {m: entries[m][3] for m in member_idx}
+        for m, stats in _rank_stats(samples, member_idx, observed).items():
+            correlations[section][entries[m][1]].update(stats)
+
+    correlations["bootstrap"] = {
+        "resamples": n_resamples,
+        "seed": seed,
+        "ci_level": 0.95,
+        "rank_tolerance": RANK_TOLERANCE,
+    }
+    return correlations
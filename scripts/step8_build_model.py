@@ -15,33 +15,89 @@ Step 8: 4軸モデル構築 — 第一原理に基づく分析
 出力:
   - data/output/model.json                   <- モデル定義
   - data/output/analysis_report.md           <- 人間向け分析レポート
-  - data/history/v{X.X}_{date}/              <- 履歴スナップショット
-  - data/history/index.md                    <- 履歴インデックス更新
+  - data/history/manifest.json + blobs/       <- 履歴スナップショット（圧縮・重複排除）
+  - data/history/registry.jsonl              <- 版レジストリ（1ビルド1レコード）
+  - data/history/index.md                    <- 履歴インデックス（レジストリから生成）
 """
 
 import json
 import math
 import os
 import sys
+import time
 from datetime import datetime, timezone
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import DATA_DIR, OUTPUT_DIR, MODEL_FILE, HIT_THRESHOLD
-from common.data_loader import load_all_videos, load_video_index, load_human_scores, load_golden_theory, save_golden_theory, validate_fundamentals
+from common.data_loader import load_all_videos, load_video_index, load_human_scores, load_golden_theory, save_golden_theory, validate_fundamentals, load_cache, save_cache, stable_hash, source_version
 from common.metrics import deep, avg, median, pearson
+from common.bitsets import to_bitset
+from common.projection import project_batch, PROJECTION_HORIZONS, LABEL_HORIZON
+from common.traffic_tensor import build_traffic_tensor, value as traffic_value
+from common.parallel import run_stages
 from step8_filters import analyze_three_stage_filter, analyze_gi_ca_model
-from step8_patterns import compute_correlations, analyze_patterns, compute_group_comparisons, compute_benchmarks
+from step8_thresholds import optimize_filter_thresholds
+from step8_predictive import analyze_predictive_model
+from step8_roc import compute_roc_sweeps
+from step8_rules import mine_rules, rule_matches, classify_discriminative_power
+from step8_patterns import compute_correlations, compute_rank_correlations, analyze_patterns, compute_group_comparisons, compute_benchmarks, update_benchmark_sketches, tier_bounds, BENCHMARK_TIERS
+from step8_bootstrap import attach_bootstrap_intervals
+from step8_importance import compute_permutation_importance
+from step8_permutation import permutation_pvalues, attach_fdr
+from step8_traffic import analyze_traffic_trajectories
+from step8_graph import build_related_graph
+from step8_audience import analyze_audience_profiles, AUDIENCE_FEATURES
 from step8_report import generate_report
 from step8_history import get_next_version, save_history_snapshot, update_history_index
 
 
+# 派生指標キャッシュ: 指標の実装・HIT_THRESHOLD 等の設定が変わったら自動で無効化されるよう、
+# このファイルと compute_derived_metrics が使う設定・ヘルパーのソースのハッシュを版とする
+DERIVED_CACHE_NAME = "step8_records"
+DERIVED_CACHE_VERSION = source_version(
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "metrics.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "data_loader.py"),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "traffic_tensor.py"),
+)
+
 # ===========================================================================
 #  派生指標の計算
 # ===========================================================================
 
-def compute_derived_metrics(v, human_scores, index):
-    """各動画の全指標を計算して1つのフラットな辞書にまとめる"""
+def apply_age_metrics(d, v):
+    """実行時刻に依存する指標（動画年齢・日あたり再生数）を d に設定する（in-place）"""
+    views = v["metadata"]["current_stats"]["view_count"]
+    try:
+        pub = datetime.fromisoformat(
+            v["metadata"]["published_at"].replace("Z", "+00:00")
+        )
+        age_days = (datetime.now(timezone.utc) - pub).days
+        d["age_days"] = age_days
+        d["views_per_day"] = round(views / age_days, 1) if age_days > 0 else 0
+        d["log_vpd"] = round(math.log10(views / age_days), 3) if age_days > 0 and views > 0 else None
+    except Exception:
+        d["age_days"] = None
+        d["views_per_day"] = None
+        d["log_vpd"] = None
+    return d
+
+
+def apply_audience_features(d, vid, audience):
+    """コーパス全体に依存する視聴者層の特徴量（クラスタ・典型度など）を d に設定する（in-place）"""
+    features = audience["videos"].get(vid) or {}
+    for key in AUDIENCE_FEATURES:
+        d[key] = features.get(key)
+    return d
+
+
+def compute_derived_metrics(v, human_scores, index, traffic=None, audience=None):
+    """各動画の全指標を計算して1つのフラットな辞書にまとめる。
+    traffic:  全動画分の流入元テンソル（省略時はこの動画だけで作る）
+    audience: 全動画分の視聴者層分析 analyze_audience_profiles()（省略時はこの動画だけで行う）
+    """
     vid = v["metadata"]["video_id"]
     views = v["metadata"]["current_stats"]["view_count"]
     likes = v["metadata"]["current_stats"]["like_count"]
@@ -68,18 +124,7 @@ def compute_derived_metrics(v, human_scores, index):
     }
 
     # 動画年齢（日数）
-    try:
-        pub = datetime.fromisoformat(
-            v["metadata"]["published_at"].replace("Z", "+00:00")
-        )
-        age_days = (datetime.now(timezone.utc) - pub).days
-        d["age_days"] = age_days
-        d["views_per_day"] = round(views / age_days, 1) if age_days > 0 else 0
-        d["log_vpd"] = round(math.log10(views / age_days), 3) if age_days > 0 and views > 0 else None
-    except Exception:
-        d["age_days"] = None
-        d["views_per_day"] = None
-        d["log_vpd"] = None
+    apply_age_metrics(d, v)
 
     # ======= 原因指標（CAUSE: コントロール可能） =======
 
@@ -117,6 +162,11 @@ def compute_derived_metrics(v, human_scores, index):
     # コアターゲット比率
     d["core_target_pct"] = deep(v, "demographics", "core_target_45_64_percent")
 
+    # 視聴者層プロファイル（年齢層×性別）
+    if audience is None:
+        audience = analyze_audience_profiles([v])
+    apply_audience_features(d, vid, audience)
+
     # ======= 結果指標（EFFECT: 伸びた「結果」） =======
 
     d["total_impressions"] = manual.get("total_impressions")
@@ -200,12 +250,10 @@ def compute_derived_metrics(v, human_scores, index):
 
     # ======= Day1トラフィック内訳 =======
 
-    day1_entry = daily_list[0] if daily_list else {}
-    day1_tb = day1_entry.get("traffic_breakdown", {})
-    d["day1_browse_views"] = deep(day1_tb, "BROWSE", "views")
-    d["day1_related_views"] = deep(day1_tb, "RELATED", "views")
-    d["day1_search_views"] = deep(day1_tb, "SEARCH", "views")
-    d["day1_subscriber_views"] = deep(day1_tb, "SUBSCRIBER", "views")
+    if traffic is None:
+        traffic = build_traffic_tensor([v])
+    for source in ("BROWSE", "RELATED", "SEARCH", "SUBSCRIBER"):
+        d[f"day1_{source.lower()}_views"] = traffic_value(traffic, "views", vid, 1, source)
 
     # ======= 関連動画ソース =======
 
@@ -218,15 +266,98 @@ def compute_derived_metrics(v, human_scores, index):
     return d
 
 
+def build_derived_records(videos, human_scores, index, traffic, audience, use_cache=True):
+    """全動画の compute_derived_metrics() を、入力の内容ハッシュをキーにキャッシュして求める。
+
+    キーの入力: 動画JSON（台本JSON結合済み）・human_scores の行・video_index の行（動画ごとの入力のみ）。
+    版はこのファイルと依存モジュールのハッシュ。キャッシュから戻したレコードも、
+    実行時刻に依存する指標とコーパス全体に依存する視聴者層の特徴量は毎回設定し直す。
+    戻り値: (レコードのリスト, {"reused": 本数, "recomputed": 本数})
+    """
+    cache = load_cache(DERIVED_CACHE_NAME) if use_cache else {}
+    cached = cache.get("records", {}) if cache.get("version") == DERIVED_CACHE_VERSION else {}
+    entries = {}
+    records = []
+    reused = 0
+    for v in videos:
+        vid = v["metadata"]["video_id"]
+        digest = stable_hash(v, human_scores.get(vid), index.get(vid))
+        entry = cached.get(vid)
+        if entry and entry.get("hash") == digest:
+            d = apply_age_metrics(dict(entry["record"]), v)
+            apply_audience_features(d, vid, audience)
+            reused += 1
+        else:
+            d = compute_derived_metrics(v, human_scores, index, traffic, audience)
+            entry = {"hash": digest, "record": dict(d)}
+        entries[vid] = entry
+        records.append(d)
+    if use_cache and (reused < len(records) or len(entries) != len(cached)):
+        save_cache(DERIVED_CACHE_NAME, {"version": DERIVED_CACHE_VERSION, "records": entries})
+    return records, {"reused": reused, "recomputed": len(records) - reused}
+
+
+def attach_projections(records, videos):
+    """日別再生数の減衰カーブから将来再生数を予測し、各レコードに付与する（in-place）。
+
+    追加フィールド: projected_views_{30,90,365}（+ _low/_high）, projection_method,
+    eventual_views, projected_hit（LABEL_HORIZON 日時点の予測による代替HIT判定）
+    戻り値: model.json 用のサマリ
+    """
+    series = {}
+    for v in videos:
+        daily = (v.get("daily_data") or {}).get("daily", [])
+        by_day = {d.get("day_number"): d.get("views") for d in daily}
+        last = max((k for k in by_day if k), default=0)
+        series[v["metadata"]["video_id"]] = [by_day.get(t) for t in range(1, last + 1)]
+    current = {r["video_id"]: (r["views"], r.get("age_days")) for r in records}
+    projections, pooled = project_batch(series, current)
+
+    changes = []
+    for r in records:
+        p = projections.get(r["video_id"])
+        r["projection_method"] = p["method"] if p else None
+        for h in PROJECTION_HORIZONS:
+            proj = p["projections"][str(h)] if p else {}
+            r[f"projected_views_{h}"] = proj.get("views")
+            r[f"projected_views_{h}_low"] = proj.get("low")
+            r[f"projected_views_{h}_high"] = proj.get("high")
+        r["eventual_views"] = p["eventual_views"] if p else None
+        r["projected_hit"] = p["projected_hit"] if p else None
+        if r["projected_hit"] is not None and r["projected_hit"] != r["is_hit"]:
+            changes.append({
+                "video_id": r["video_id"],
+                "artist": r["artist"],
+                "views": r["views"],
+                "age_days": r.get("age_days"),
+                "eventual_views": r["eventual_views"],
+                "is_hit": r["is_hit"],
+                "projected_hit": r["projected_hit"],
+            })
+
+    labeled = [r for r in records if r["projected_hit"] is not None]
+    return {
+        "model": "power_law_decay",
+        "horizons": list(PROJECTION_HORIZONS),
+        "label_horizon": LABEL_HORIZON,
+        "pooled_exponent": pooled,
+        "projected_count": len(labeled),
+        "fit_count": sum(1 for r in labeled if r["projection_method"] == "fit"),
+        "projected_hits": sum(1 for r in labeled if r["projected_hit"]),
+        "label_agreement": (
+            round(sum(1 for r in labeled if r["projected_hit"] == r["is_hit"]) / len(labeled), 3)
+            if labeled else None
+        ),
+        "label_changes": changes,
+    }
+
+
 # ===========================================================================
 #  golden_theory 検証
 # ===========================================================================
 
 def validate_golden_theory(golden, records):
     """golden_theory.json のチェックリスト条件を実データで再検証する (BUG-3)"""
-    hits = [r for r in records if r["is_hit"]]
-    misses = [r for r in records if not r["is_hit"]]
-
     # 条件名→評価関数のマッピング
     CONDITION_EVALUATORS = {
         "G1+G6>=8": lambda r: (r.get("g1") or 0) + (r.get("g6") or 0) >= 8,
@@ -238,25 +369,40 @@ def validate_golden_theory(golden, records):
         "メディア挿入2件以上": lambda r: (r.get("total_media_count") or 0) >= 2,
     }
 
+    # 評価対象: GI/CAスコアを使う条件はscored recordsのみ
+    scored = [r for r in records if r.get("gi_v3") is not None]
+    scored_hits = [r for r in scored if r["is_hit"]]
+    scored_misses = [r for r in scored if not r["is_hit"]]
+    if not scored:
+        save_golden_theory(golden)
+        return golden
+
+    evaluated = []  # (item, evaluator)
     for item in golden.get("checklist", []):
         condition = item["condition"]
         # 条件名から評価関数を部分一致で検索
         evaluator = None
+        if item.get("rule"):
+            # ルールマイニング由来の項目は構造化された条件をそのまま評価する
+            evaluator = lambda r, rule=item["rule"]: rule_matches(rule, r)
         for key, func in CONDITION_EVALUATORS.items():
-            if key in condition:
+            if evaluator is None and key in condition:
                 evaluator = func
                 break
 
         if evaluator is None:
             continue  # 評価不能な条件はスキップ
+        evaluated.append((item, evaluator))
 
-        # 評価対象: GI/CAスコアを使う条件はscored recordsのみ
-        scored_hits = [r for r in hits if r.get("gi_v3") is not None]
-        scored_misses = [r for r in misses if r.get("gi_v3") is not None]
-
-        if not scored_hits and not scored_misses:
-            continue
+    # 並べ替え検定（HIT/MISSラベルをシャッフル）+ FDR補正
+    label_bits = to_bitset(r["is_hit"] for r in scored)
+    feature_bits = [to_bitset(ev(r) for r in scored) for _, ev in evaluated]
+    significance = attach_fdr(
+        permutation_pvalues(label_bits, len(scored), feature_bits)
+    )
 
+    for (item, evaluator), sig in zip(evaluated, significance):
+        condition = item["condition"]
         hit_pass = sum(1 for r in scored_hits if evaluator(r))
         miss_pass = sum(1 for r in scored_misses if evaluator(r))
 
@@ -273,17 +419,10 @@ def validate_golden_theory(golden, records):
             "count": miss_pass, "total": len(scored_misses),
             "rate": round(new_miss_rate, 3),
         }
+        item["significance"] = sig
 
-        # 弁別力を再判定
-        diff = new_hit_rate - new_miss_rate
-        if diff > 0.5:
-            item["discriminative_power"] = "high"
-        elif diff > 0.2:
-            item["discriminative_power"] = "medium"
-        elif diff > 0:
-            item["discriminative_power"] = "low"
-        else:
-            item["discriminative_power"] = "none"
+        # 弁別力を再判定（差の大きさ + 並べ替え検定で有意な場合のみ medium 以上）
+        item["discriminative_power"] = classify_discriminative_power(new_hit_rate - new_miss_rate, sig["significant"])
 
         # 大幅変化時にWARNING
         if abs(new_hit_rate - old_hit_rate) > 0.1 or abs(new_miss_rate - old_miss_rate) > 0.1:
@@ -299,6 +438,22 @@ def validate_golden_theory(golden, records):
 #  メイン
 # ===========================================================================
 
+# records だけに依存する分析ステージ（互いに独立なので並列に実行する）。
+# ブートストラップCI・並べ替え重要度はそれ自体がチャンク並列なので、ステージの後に全コアで実行する
+ANALYSIS_STAGES = {
+    "three_stage_filter": analyze_three_stage_filter,
+    "filter_thresholds": optimize_filter_thresholds,
+    "gi_ca_model": analyze_gi_ca_model,
+    "predictive_model": analyze_predictive_model,
+    "correlations": compute_correlations,
+    "rank_correlations": compute_rank_correlations,
+    "patterns": analyze_patterns,
+    "group_comparisons": compute_group_comparisons,
+    "roc": compute_roc_sweeps,
+    "rule_mining": mine_rules,
+}
+
+
 def build_and_save():
     """モデル構築→保存→履歴保存。外部から呼び出し可能。"""
     # 不変基盤の整合性チェック (W-23)
@@ -314,29 +469,59 @@ def build_and_save():
     print(f"  動画: {len(videos)}本 / 人間評価: {len(human_scores)}件")
 
     print("[2/7] 派生指標計算...")
-    records = [compute_derived_metrics(v, human_scores, index) for v in videos]
+    traffic = build_traffic_tensor(videos)
+    audience = analyze_audience_profiles(videos)
+    records, cache_stats = build_derived_records(videos, human_scores, index, traffic, audience)
+    print(f"  [cache] 派生指標 再利用 {cache_stats['reused']}本 / 再計算 {cache_stats['recomputed']}本")
+    projection = attach_projections(records, videos)
 
     hits = [r for r in records if r["is_hit"]]
     misses = [r for r in records if not r["is_hit"]]
     scored = [r for r in records if r.get("gi_v3") is not None]
     print(f"  HIT: {len(hits)}本 / MISS: {len(misses)}本")
     print(f"  人間評価あり: {len(scored)}本 / なし: {len(records) - len(scored)}本")
+    print(
+        f"  減衰カーブ予測: {projection['projected_count']}本 "
+        f"(予測HIT: {projection['projected_hits']}本 / 現ラベルと不一致: {len(projection['label_changes'])}本)"
+    )
 
     # golden_theory 読み込み・検証
     golden = load_golden_theory()
     golden = validate_golden_theory(golden, records)
 
-    print("[3/7] 3段階フィルター分析...")
-    filter_results = analyze_three_stage_filter(records)
-
-    print("[4/7] GI×CAモデル分析...")
-    gi_ca_result = analyze_gi_ca_model(records)
-
-    print("[5/7] 相関・パターン分析...")
-    correlations = compute_correlations(records)
-    patterns = analyze_patterns(records)
-    group_comp = compute_group_comparisons(records)
-    benchmarks = compute_benchmarks(records)
+    print("[3-5/7] 3段階フィルター・GI×CAモデル・相関・パターン分析（並列）...")
+    stage_results, timings = run_stages(ANALYSIS_STAGES, records)
+    for name, sec in sorted(timings.items(), key=lambda x: -x[1]):
+        print(f"  {name:<22} {sec * 1000:8.1f} ms")
+    filter_results = stage_results["three_stage_filter"]
+    filter_thresholds = stage_results["filter_thresholds"]
+    gi_ca_result = stage_results["gi_ca_model"]
+    predictive_model, predictive_fit = stage_results["predictive_model"]
+    correlations = stage_results["correlations"]
+    start = time.perf_counter()
+    attach_bootstrap_intervals(correlations, records)
+    print(f"  {'bootstrap_intervals':<22} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    start = time.perf_counter()
+    feature_importance = compute_permutation_importance(predictive_fit)
+    print(f"  {'feature_importance':<22} {(time.perf_counter() - start) * 1000:8.1f} ms")
+    rank_correlations, partial_correlations = stage_results["rank_correlations"]
+    patterns = stage_results["patterns"]
+    group_comp = stage_results["group_comparisons"]
+    sketch_state, sketch_stats = update_benchmark_sketches(records)
+    benchmarks = compute_benchmarks(records, sketch_state["sketches"])
+    print(
+        f"  ベンチマーク分位点スケッチ: {'全件から再構築' if sketch_stats['rebuilt'] else '差分更新'}"
+        f"（追加 {sketch_stats['added']}本）"
+    )
+    roc = stage_results["roc"]
+    rule_mining = stage_results["rule_mining"]
+    traffic_trajectory = analyze_traffic_trajectories(records, traffic)
+    related_graph = build_related_graph(videos, records)
+    inc = related_graph["incremental"]
+    print(
+        f"  関連動画グラフ: ノード{related_graph['nodes']} / 辺{related_graph['edges']} "
+        f"(再取得で変化: {inc['updated']}本{' / 前回結果を再利用' if inc['reused'] else ''})"
+    )
 
     version = get_next_version()
 
@@ -347,11 +532,27 @@ def build_and_save():
         "hit_threshold": HIT_THRESHOLD,
         "classification": {"hits": len(hits), "misses": len(misses)},
         "gi_ca_model": gi_ca_result,
+        "predictive_model": predictive_model,
         "three_stage_filter": filter_results,
+        "filter_thresholds": filter_thresholds,
         "correlations": correlations,
+        "feature_importance": feature_importance,
+        "roc": roc,
+        "rule_mining": rule_mining,
+        "rank_correlations": rank_correlations,
+        "partial_correlations": partial_correlations,
+        "projection": projection,
         "patterns": patterns,
         "group_comparisons": group_comp,
+        "traffic_trajectory": traffic_trajectory,
+        "related_graph": related_graph,
+        "audience": {k: val for k, val in audience.items() if k != "videos"},
         "benchmarks": benchmarks,
+        "benchmark_tiers": {
+            "quantiles": dict(BENCHMARK_TIERS),
+            "bounds": tier_bounds(sketch_state["sketches"]),
+            "sketch_size": len(sketch_state["videos"]),
+        },
         "video_list": [
             {
                 "video_id": r["video_id"],
@@ -365,6 +566,8 @@ def build_and_save():
                 "age_days": r.get("age_days"),
                 "views_per_day": r.get("views_per_day"),
                 "log_vpd": r.get("log_vpd"),
+                "projected_views_365": r.get("projected_views_365"),
+                "projected_hit": r.get("projected_hit"),
             }
             for r in sorted(records, key=lambda x: x["views"], reverse=True)
         ],
@@ -407,6 +610,18 @@ def build_and_save():
         for i, (name, data) in enumerate(list(cause.items())[:5], 1):
             print(f"    {i}. {name}: r={data['r_log_views']:+.3f}")
 
+    top = next(
+        ((name, data) for name, data in traffic_trajectory["features"].items() if data["r_hit"] is not None),
+        None,
+    )
+    if top:
+        name, data = top
+        print(
+            f"\n  流入元推移 ({traffic_trajectory['eligible_count']}本): "
+            f"HIT との関係が最も強い指標 = {name} (r={data['r_hit']:+.3f}, "
+            f"q={data['significance']['q_value']})"
+        )
+
     if filter_results:
         with_data = [f for f in filter_results if f["f1_pass"] is not None]
         if with_data:
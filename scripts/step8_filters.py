@@ -9,28 +9,38 @@ from common.metrics import pearson
 #  3段階フィルター分析
 # ===========================================================================
 
+# 各フィルターの閾値（step8_thresholds の最適化結果と比較する現行値）
+FILTER_THRESHOLDS = {
+    "f1_ctr": 4.0,          # ブラウジング CTR(%) >= この値
+    "f2_change": -20.0,     # Day1→Day2 変化率(%) > この値
+    "f3_duration": 300,     # 平均視聴時間(秒) >= この値
+    "f3_engagement": 0.8,   # エンゲージメント率(%) >= この値
+}
+
+
 def analyze_three_stage_filter(records):
     """
     F1: 初動 CTR     -> ブラウジング CTR >= 4.0%
     F2: Day1->Day2    -> 変化率 > -20%
     F3: 深度×エンゲージメント -> 平均視聴>=300s AND eng率>=0.8%
     """
+    t = FILTER_THRESHOLDS
     results = []
     for r in records:
         f1 = f2 = f3 = None
 
         ctr = r.get("browsing_ctr")
         if ctr is not None:
-            f1 = ctr >= 4.0
+            f1 = ctr >= t["f1_ctr"]
 
         change = r.get("day1_day2_change")
         if change is not None:
-            f2 = change > -20.0
+            f2 = change > t["f2_change"]
 
         avd = r.get("avg_view_duration")
         eng = r.get("engagement_rate")
         if avd is not None and eng is not None:
-            f3 = avd >= 300 and eng >= 0.8
+            f3 = avd >= t["f3_duration"] and eng >= t["f3_engagement"]
 
         # 総合判定 -- データがある項目のみで判定
         evaluated = [x for x in [f1, f2, f3] if x is not None]
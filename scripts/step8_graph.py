@@ -0,0 +1,176 @@
+"""
+Step 8 サブモジュール: 関連動画流入グラフ
+
+daily_data.related_video_sources（どの動画から RELATED_VIDEO 流入があったか）を
+「流入元動画 → 自チャンネル動画」の重み付き有向グラフ（重み = 再生数）にまとめ、
+CSR 形式の疎行列（common.sparse_graph）で次を計算する。
+
+  - 自チャンネル内 / 外からの流入比率（動画ごと・全体）
+  - 重み付き PageRank による中心性
+  - ラベル伝播による流入コミュニティ（自チャンネル動画を2本以上含むもの）
+
+増分更新: 動画ごとの辺リストを related_video_sources の内容ハッシュ付きで
+data/cache/ に保存し、再取得で変わった動画だけ辺リストを差し替える。
+どの動画も変わっていなければ前回の結果をそのまま使い、変わっていれば
+前回の PageRank を初期値にして冪乗法を再開する。
+"""
+
+import os
+
+from common.data_loader import load_cache, save_cache, stable_hash, source_version
+from common.sparse_graph import build_csr, symmetrize, pagerank, label_propagation
+
+
+GRAPH_CACHE_NAME = "related_graph"
+GRAPH_CACHE_VERSION = source_version(
+    os.path.abspath(__file__),
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "sparse_graph.py"),
+)
+TOP_FEEDERS = 10       # レポートに出す流入元動画の数
+TOP_COMMUNITIES = 5    # レポートに出すコミュニティの数
+
+
+# ===========================================================================
+#  辺リスト（増分）
+# ===========================================================================
+
+def _edge_list(sources):
+    return [
+        [s["source_video_id"], s.get("views") or 0, s.get("estimated_minutes_watched") or 0]
+        for s in sources if s.get("source_video_id")
+    ]
+
+
+def _load_edge_lists(videos, cache):
+    """動画ごとの辺リスト。内容ハッシュが前回と同じ動画はキャッシュを使う"""
+    cached = cache.get("videos", {})
+    lists = {}
+    updated = 0
+    for v in videos:
+        vid = v["metadata"]["video_id"]
+        sources = (v.get("daily_data") or {}).get("related_video_sources") or []
+        digest = stable_hash(sources)
+        entry = cached.get(vid)
+        if not entry or entry.get("hash") != digest:
+            entry = {"hash": digest, "edges": _edge_list(sources)}
+            updated += 1
+        lists[vid] = entry
+    removed = len(set(cached) - set(lists))
+    return lists, updated, removed
+
+
+# ===========================================================================
+#  グラフ分析
+# ===========================================================================
+
+def _analyze(lists, warm_start):
+    own = list(lists)
+    own_set = set(own)
+    feeders = sorted({src for e in lists.values() for src, _, _ in e["edges"]} - own_set)
+    nodes = own + feeders
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = [
+        (node_index[src], node_index[vid], views)
+        for vid, e in lists.items() for src, views, _ in e["edges"]
+    ]
+    csr = build_csr(len(nodes), edges)
+
+    start = [warm_start.get(node, 0.0) for node in nodes] if warm_start else None
+    pr, iterations = pagerank(csr, start=start)
+    labels = label_propagation(symmetrize(csr))
+    n = len(nodes)
+
+    # 動画ごとの流入内訳
+    per_video = {}
+    sent = {}  # 流入元 → [送った再生数, 送り先の動画数]
+    for vid, e in lists.items():
+        total = sum(views for _, views, _ in e["edges"])
+        in_channel = sum(views for src, views, _ in e["edges"] if src in own_set)
+        top = max(e["edges"], key=lambda x: x[1], default=None)
+        per_video[vid] = {
+            "related_views": total,
+            "in_channel_views": in_channel,
+            "in_channel_share": round(in_channel / total, 3) if total else None,
+            "top_feeder": top[0] if top else None,
+            "pagerank": round(pr[node_index[vid]] * n, 4),
+            "community": labels[node_index[vid]],
+        }
+        for src, views, _ in e["edges"]:
+            acc = sent.setdefault(src, [0, 0])
+            acc[0] += views
+            acc[1] += 1
+
+    top_feeders = [
+        {"video_id": src, "in_channel": src in own_set, "views_sent": s[0], "targets": s[1]}
+        for src, s in sorted(sent.items(), key=lambda x: (-x[1][0], x[0]))[:TOP_FEEDERS]
+    ]
+
+    # コミュニティ: 自チャンネル動画を2本以上含むラベル群を、内部の辺の重み和で並べる
+    groups = {}
+    for node, lab in zip(nodes, labels):
+        groups.setdefault(lab, []).append(node)
+    internal = {}
+    for src, dst, w in edges:
+        if labels[src] == labels[dst]:
+            internal[labels[src]] = internal.get(labels[src], 0) + w
+    communities = []
+    for lab, members in groups.items():
+        videos_in = [m for m in members if m in own_set]
+        if len(videos_in) < 2:
+            continue
+        communities.append({
+            "label": lab,
+            "videos": videos_in,
+            "feeders": len(members) - len(videos_in),
+            "internal_views": internal.get(lab, 0),
+        })
+    communities.sort(key=lambda c: (-c["internal_views"], c["label"]))
+
+    total_views = sum(p["related_views"] for p in per_video.values())
+    in_channel_views = sum(p["in_channel_views"] for p in per_video.values())
+    result = {
+        "nodes": n,
+        "edges": len(csr["indices"]),
+        "own_videos": len(own),
+        "external_feeders": len(feeders),
+        "related_views": total_views,
+        "in_channel_share": round(in_channel_views / total_views, 3) if total_views else None,
+        "pagerank_iterations": iterations,
+        "videos": per_video,
+        "top_feeders": top_feeders,
+        "communities": communities[:TOP_COMMUNITIES],
+        "community_count": len(communities),
+    }
+    pagerank_by_node = {node: pr[i] for i, node in enumerate(nodes)}
+    return result, pagerank_by_node
+
+
+def build_related_graph(videos, records=None):
+    """関連動画流入グラフを（増分で）構築・分析する。
+
+    records を渡すと動画ごとの related_in_channel_share / related_pagerank を付与する（in-place）。
+    戻り値: model.json の related_graph に入れる辞書
+    """
+    cache = load_cache(GRAPH_CACHE_NAME)
+    if cache.get("version") != GRAPH_CACHE_VERSION:
+        cache = {}
+    lists, updated, removed = _load_edge_lists(videos, cache)
+
+    if not updated and not removed and cache.get("result"):
+        result = cache["result"]
+        result["incremental"] = {"updated": 0, "removed": 0, "reused": True}
+    else:
+        result, pagerank_by_node = _analyze(lists, cache.get("pagerank"))
+        result["incremental"] = {"updated": updated, "removed": removed, "reused": False}
+        save_cache(GRAPH_CACHE_NAME, {
+            "version": GRAPH_CACHE_VERSION,
+            "videos": lists,
+            "pagerank": pagerank_by_node,
+            "result": result,
+        })
+
+    for r in records or []:
+        g = result["videos"].get(r["video_id"], {})
+        r["related_in_channel_share"] = g.get("in_channel_share")
+        r["related_pagerank"] = g.get("pagerank")
+    return result
@@ -1,13 +1,32 @@
 """
 Step 3 サブモジュール: 履歴保存
+
+スナップショットは版ごとのフォルダにコピーせず、内容アドレス方式で保存する。
+  - model.json はトップレベルのセクションごと、analysis_report.md は「## 」の章ごとに
+    正規化JSON/テキストの SHA-256 をキーとした gzip blob（data/history/blobs/）にする
+  - 同じ内容のセクションは版をまたいで1つの blob を共有する
+  - data/history/manifest.json に 版・日付・R²・精度・blob ハッシュ を記録し、
+    クリーンアップとマイルストーン判定は manifest だけを読む
+
+ビルドごとの要約（指標・データセットハッシュ・相関・フィルター判定・ティア）は
+data/history/registry.jsonl に1行ずつ追記し、index.md の版履歴はここから生成する。
+2版の比較は diff_versions()（python scripts/step8_history.py --diff 6.2 7.0）。
+
+旧形式の v{X.X}_{date}/ フォルダ（git 管理下）は自動では移行しない。
+  python scripts/step8_history.py --migrate-legacy                  # blob 化して manifest に登録（フォルダは残す）
+  python scripts/step8_history.py --migrate-legacy --delete-legacy  # 復元を照合できたフォルダだけ削除
 """
 
+import argparse
+import gzip
+import hashlib
 import json
 import os
 import re
+import shutil
 from datetime import datetime
 
-from config import MODEL_FILE, HISTORY_DIR, HISTORY_INDEX
+from config import MODEL_FILE, HISTORY_DIR, HISTORY_INDEX, HISTORY_MANIFEST, HISTORY_BLOBS_DIR, HISTORY_REGISTRY
 
 
 # スナップショット保持ポリシー
@@ -16,6 +35,8 @@ SNAPSHOT_POLICY = {
     "keep_milestones": True,    # R²が0.05以上変化したバージョンはマイルストーンとして永久保持
     "auto_cleanup": True,       # save_history()実行時に自動でポリシーを適用
 }
+REPORT_SPLIT = "\n## "   # レポートを章単位の blob に分ける区切り
+LEGACY_SNAPSHOT_DIR = re.compile(r"v(\d+\.?\d*)_(\d{8})$")   # 旧形式のフォルダ名
 
 
 def get_next_version():
@@ -30,129 +51,556 @@ def get_next_version():
     return "2.0"
 
 
-def save_history_snapshot(model, report_text):
-    """model.json と analysis_report.md を履歴フォルダに保存"""
-    version = model["version"]
-    date = datetime.now().strftime("%Y%m%d")
-    snapshot_dir = os.path.join(HISTORY_DIR, f"v{version}_{date}")
-    os.makedirs(snapshot_dir, exist_ok=True)
+# ===========================================================================
+#  blob ストア
+# ===========================================================================
+
+def _blob_path(digest):
+    return os.path.join(HISTORY_BLOBS_DIR, f"{digest}.gz")
+
+
+def _put_blob(data):
+    """bytes を保存してハッシュを返す。既に同じ内容があれば書かない。戻り値: (ハッシュ, 新規か)"""
+    digest = hashlib.sha256(data).hexdigest()
+    path = _blob_path(digest)
+    if os.path.exists(path):
+        return digest, False
+    os.makedirs(HISTORY_BLOBS_DIR, exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(gzip.compress(data, mtime=0))
+    os.replace(tmp, path)
+    return digest, True
+
+
+def _get_blob(digest):
+    with open(_blob_path(digest), "rb") as f:
+        return gzip.decompress(f.read())
+
+
+def _json_bytes(obj):
+    return json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def load_manifest():
+    """manifest.json を読む。無ければ空の manifest"""
+    if not os.path.exists(HISTORY_MANIFEST):
+        return {"snapshots": []}
+    with open(HISTORY_MANIFEST, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save_manifest(manifest):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    tmp = HISTORY_MANIFEST + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, HISTORY_MANIFEST)
+
+
+def _version_key(entry):
+    try:
+        return float(entry["version"])
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ===========================================================================
+#  スナップショット
+# ===========================================================================
+
+def _store_snapshot(model, report_text, date, files=None):
+    """model・レポート・その他ファイルを blob にして manifest のエントリを返す"""
+    stats = {"new": 0, "shared": 0}
+
+    def _put(data):
+        digest, new = _put_blob(data)
+        stats["new" if new else "shared"] += 1
+        return digest
+
+    chunks = report_text.split(REPORT_SPLIT) if report_text else []
+    gi_ca = model.get("gi_ca_model", {})
+    entry = {
+        "name": f"v{model['version']}_{date}",
+        "version": model["version"],
+        "date": f"{date[:4]}-{date[4:6]}-{date[6:]}",
+        "dataset_size": model.get("dataset_size"),
+        "r_squared": gi_ca.get("correlations", {}).get("R_squared"),
+        "accuracy": gi_ca.get("threshold_16_accuracy"),
+        "loo_accuracy": (model.get("predictive_model") or {}).get("loo_accuracy"),
+        "model_sections": {key: _put(_json_bytes(val)) for key, val in model.items()},
+        "report_chunks": [_put(c.encode("utf-8")) for c in chunks],
+        "files": {name: _put(data) for name, data in sorted((files or {}).items())},
+    }
+    return entry, stats
+
 
-    with open(os.path.join(snapshot_dir, "model.json"), "w", encoding="utf-8") as f:
-        json.dump(model, f, ensure_ascii=False, indent=2)
-    with open(os.path.join(snapshot_dir, "analysis_report.md"), "w", encoding="utf-8") as f:
-        f.write(report_text)
+def _add_entry(manifest, entry):
+    manifest["snapshots"] = [e for e in manifest["snapshots"] if e["name"] != entry["name"]]
+    manifest["snapshots"].append(entry)
+    manifest["snapshots"].sort(key=_version_key)
 
-    print(f"  履歴保存: {snapshot_dir}")
+
+def save_history_snapshot(model, report_text):
+    """model.json と analysis_report.md を blob ストアに保存し、manifest に登録する"""
+    manifest = load_manifest()
+
+    date = datetime.now().strftime("%Y%m%d")
+    entry, stats = _store_snapshot(model, report_text, date)
+    _add_entry(manifest, entry)
+    _save_manifest(manifest)
+    print(f"  履歴保存: {entry['name']}（新規blob {stats['new']}個 / 既存と共有 {stats['shared']}個）")
 
     # 自動クリーンアップ
     if SNAPSHOT_POLICY["auto_cleanup"]:
         cleanup_old_snapshots()
 
-    return snapshot_dir
+    return entry["name"]
 
 
-def cleanup_old_snapshots():
-    """保持ポリシーに基づき古いスナップショットを削除する。
-    - 直近N件は常に保持
-    - R²が0.05以上変化したバージョンはマイルストーンとして永久保持
-    - 削除対象はディレクトリのみ削除（index.mdの履歴テーブルには残る）
+def _restore(entry):
+    model = {key: json.loads(_get_blob(h)) for key, h in entry["model_sections"].items()}
+    report = REPORT_SPLIT.join(_get_blob(h).decode("utf-8") for h in entry["report_chunks"])
+    files = {name: _get_blob(h) for name, h in entry.get("files", {}).items()}
+    return model, report, files
+
+
+def load_history_snapshot(name_or_version):
+    """スナップショットを復元する。名前（v6.2_20260302）または版（"6.2"）で指定。
+    戻り値: (model, report_text, {ファイル名: bytes})。無ければ None
     """
+    for entry in reversed(load_manifest()["snapshots"]):
+        if name_or_version in (entry["name"], entry["version"]):
+            return _restore(entry)
+    return None
+
+
+# ===========================================================================
+#  旧形式フォルダの移行（明示的に実行する）
+# ===========================================================================
+
+def _legacy_snapshot_dirs():
+    """旧形式のフォルダ [(名前, パス, 版, 日付)]"""
     if not os.path.exists(HISTORY_DIR):
-        return
+        return []
+    out = []
+    for name in sorted(os.listdir(HISTORY_DIR)):
+        path = os.path.join(HISTORY_DIR, name)
+        match = LEGACY_SNAPSHOT_DIR.match(name)
+        if match and os.path.isdir(path):
+            out.append((name, path, match.group(1), match.group(2)))
+    return out
 
-    # スナップショットディレクトリを列挙（v{X.X}_{date} 形式）
-    snapshot_dirs = []
-    for name in os.listdir(HISTORY_DIR):
-        full_path = os.path.join(HISTORY_DIR, name)
-        if os.path.isdir(full_path) and name.startswith("v"):
-            snapshot_dirs.append((name, full_path))
 
-    if len(snapshot_dirs) <= SNAPSHOT_POLICY["keep_latest"]:
-        return  # 保持上限以下なら何もしない
+def _read_legacy_snapshot(path, version):
+    """旧形式フォルダ直下の通常ファイルを読む（サブフォルダ等は対象外）。
+    戻り値: (model, report_text, {ファイル名: bytes}, 読まなかった項目)。model.json が読めなければ None
+    """
+    files, skipped = {}, []
+    for fname in sorted(os.listdir(path)):
+        fpath = os.path.join(path, fname)
+        if not os.path.isfile(fpath):
+            skipped.append(fname)
+            continue
+        with open(fpath, "rb") as f:
+            files[fname] = f.read()
+    try:
+        model = json.loads(files.pop("model.json"))
+    except (KeyError, json.JSONDecodeError):
+        return None
+    model.setdefault("version", version)
+    report = files.pop("analysis_report.md", b"").decode("utf-8")
+    return model, report, files, skipped
+
+
+def migrate_legacy_snapshots(delete=False):
+    """旧形式の v{X.X}_{date}/ フォルダを blob ストアに移し、manifest に登録する。
+
+    blob から復元した内容が元のファイルと一致したものだけを登録する。
+    delete=True のときは、照合できてサブフォルダ等の読み残しがないフォルダだけを削除する。
+    戻り値: {"migrated", "deleted", "kept"}
+    """
+    manifest = load_manifest()
+    stats = {"migrated": 0, "deleted": 0, "kept": []}
+    for name, path, version, date in _legacy_snapshot_dirs():
+        legacy = _read_legacy_snapshot(path, version)
+        if legacy is None:
+            stats["kept"].append(f"{name}（model.json が読めない）")
+            continue
+        model, report, files, skipped = legacy
+        entry, _ = _store_snapshot(model, report, date, files)
+        entry["name"] = name
+        if _restore(entry) != (model, report, files):
+            stats["kept"].append(f"{name}（blob からの復元が一致しない）")
+            continue
+        _add_entry(manifest, entry)
+        stats["migrated"] += 1
+        if not delete:
+            continue
+        if skipped:
+            stats["kept"].append(f"{name}（ファイル以外の項目: {', '.join(skipped)}）")
+            continue
+        shutil.rmtree(path)
+        stats["deleted"] += 1
+    if stats["migrated"]:
+        _save_manifest(manifest)
+    return stats
+
 
-    # バージョン番号でソート（新しい順）
-    def _version_key(item):
-        name = item[0]
-        match = re.match(r'v(\d+\.?\d*)_', name)
-        return float(match.group(1)) if match else 0
+def _gc_blobs(manifest):
+    """どのスナップショットからも参照されない blob を削除し、削除数を返す"""
+    if not os.path.exists(HISTORY_BLOBS_DIR):
+        return 0
+    live = set()
+    for e in manifest["snapshots"]:
+        live.update(e["model_sections"].values())
+        live.update(e["report_chunks"])
+        live.update(e.get("files", {}).values())
+    removed = 0
+    for fname in os.listdir(HISTORY_BLOBS_DIR):
+        if fname.endswith(".gz") and fname[:-3] not in live:
+            os.remove(os.path.join(HISTORY_BLOBS_DIR, fname))
+            removed += 1
+    return removed
 
-    snapshot_dirs.sort(key=_version_key, reverse=True)
 
-    # 直近N件を保護
-    keep_latest = set()
-    for i, (name, path) in enumerate(snapshot_dirs):
-        if i < SNAPSHOT_POLICY["keep_latest"]:
-            keep_latest.add(name)
+def cleanup_old_snapshots():
+    """保持ポリシーに基づき古いスナップショットを削除する。
+    - 直近N件は常に保持
+    - R²が0.05以上変化したバージョンはマイルストーンとして永久保持
+    - manifest だけを読んで判定し、参照されなくなった blob を削除する
+      （index.mdの履歴テーブルには残る）
+    """
+    manifest = load_manifest()
+    snapshots = sorted(manifest["snapshots"], key=_version_key, reverse=True)
+    if len(snapshots) <= SNAPSHOT_POLICY["keep_latest"]:
+        return  # 保持上限以下なら何もしない
+
+    keep_latest = {e["name"] for e in snapshots[:SNAPSHOT_POLICY["keep_latest"]]}
 
     # マイルストーン検出（R²が0.05以上変化したバージョン）
     milestones = set()
     if SNAPSHOT_POLICY["keep_milestones"]:
         prev_r2 = None
-        for name, path in reversed(snapshot_dirs):  # 古い順に処理
-            model_path = os.path.join(path, "model.json")
-            if not os.path.exists(model_path):
-                continue
-            try:
-                with open(model_path, "r", encoding="utf-8") as f:
-                    m = json.load(f)
-                r2 = m.get("gi_ca_model", {}).get("correlations", {}).get("R_squared")
-                if r2 is not None:
-                    if prev_r2 is not None and abs(r2 - prev_r2) >= 0.05:
-                        milestones.add(name)
-                    prev_r2 = r2
-            except (json.JSONDecodeError, KeyError):
-                continue
-
-    # 削除実行
-    import shutil
-    deleted = 0
-    for name, path in snapshot_dirs:
-        if name not in keep_latest and name not in milestones:
-            shutil.rmtree(path)
-            deleted += 1
+        for e in reversed(snapshots):  # 古い順に処理
+            r2 = e.get("r_squared")
+            if r2 is not None:
+                if prev_r2 is not None and abs(r2 - prev_r2) >= 0.05:
+                    milestones.add(e["name"])
+                prev_r2 = r2
 
+    kept = [e for e in manifest["snapshots"] if e["name"] in keep_latest or e["name"] in milestones]
+    deleted = len(manifest["snapshots"]) - len(kept)
     if deleted > 0:
-        print(f"  スナップショットクリーンアップ: {deleted}件削除（保持: 直近{SNAPSHOT_POLICY['keep_latest']}件 + マイルストーン{len(milestones)}件）")
+        manifest["snapshots"] = kept
+        _save_manifest(manifest)
+        removed = _gc_blobs(manifest)
+        print(
+            f"  スナップショットクリーンアップ: {deleted}件削除（保持: 直近{SNAPSHOT_POLICY['keep_latest']}件 + "
+            f"マイルストーン{len(milestones)}件 / blob {removed}個削除）"
+        )
 
 
-def update_history_index(model):
-    """index.md に1行サマリを追記"""
-    os.makedirs(HISTORY_DIR, exist_ok=True)
+# ===========================================================================
+#  バージョンレジストリ
+# ===========================================================================
+
+INDEX_BEGIN = "<!-- registry:begin -->"
+INDEX_END = "<!-- registry:end -->"
+INDEX_HEADER = (
+    "# 分析履歴インデックス\n\n"
+    "## バージョン履歴\n"
+)
+# 旧 update_history_index() が文字列操作で挿入していた行（レジストリの表に置き換える）
+LEGACY_INDEX_ROW = re.compile(r"^\| v[\d.]+ \| \d{4}-\d{2}-\d{2} \| \d+本\(HIT:\d+\) \| R2=[^|]*, 閾値16精度=[^|]*% \|$")
+TOP_CORRELATION_CHANGES = 3
+# 固定の再生数で区切っていた旧版のティア名（現行は分位点帯。名前が違うので版をまたいで比較しない）
+LEGACY_TIER_NAMES = {"S_500k+", "A_200k-500k", "B_100k-200k", "C_under_100k"}
+
+
+def _video_tiers(model):
+    """{動画ID: ティア名}。旧版のベンチマークは動画IDを持たないので再生数で照合する"""
+    by_views = {}
+    for v in model.get("video_list", []):
+        by_views.setdefault(v["views"], v["video_id"])
+    tiers = {}
+    for tier, data in model.get("benchmarks", {}).items():
+        for v in data.get("videos", []):
+            vid = v.get("video_id") or by_views.get(v["views"])
+            if vid:
+                tiers[vid] = tier
+    return tiers
 
-    version = model["version"]
-    date = datetime.now().strftime("%Y-%m-%d")
+
+def _tier_scheme(record):
+    """ティアの定義（"fixed_views" = 旧版の固定再生数 / "quantile" = 分位点帯）"""
+    if record.get("tier_scheme"):
+        return record["tier_scheme"]
+    return "fixed_views" if set(record.get("tiers", {}).values()) & LEGACY_TIER_NAMES else "quantile"
+
+
+def _filter_outcome(f):
+    if f.get("passed_all") is None:
+        return None
+    return "PASS" if f["passed_all"] else (f.get("first_fail") or "FAIL")
+
+
+def build_registry_record(model):
+    """model.json 1版分の構造化レコード（差分比較に必要な要約だけ）"""
     gi_ca = model.get("gi_ca_model", {})
-    corr = gi_ca.get("correlations", {})
-    r2 = corr.get("R_squared", "?")
-    acc = gi_ca.get("threshold_16_accuracy", "?")
-    n = model.get("dataset_size", 0)
-    hits = model["classification"]["hits"]
-
-    summary = (
-        f"| v{version} | {date} | {n}本(HIT:{hits}) | "
-        f"R2={r2}, 閾値16精度={acc}% |"
-    )
+    pred = model.get("predictive_model") or {}
+    videos = {v["video_id"]: v["views"] for v in model.get("video_list", [])}
+    correlations = {}
+    for section in ("cause_metrics", "effect_metrics"):
+        for name, data in model.get("correlations", {}).get(section, {}).items():
+            correlations[name] = data.get("r_log_views")
+    return {
+        "version": model["version"],
+        "built_at": model.get("built_at"),
+        "dataset_size": model.get("dataset_size"),
+        "hits": model.get("classification", {}).get("hits"),
+        "dataset_hash": hashlib.sha256(_json_bytes(videos)).hexdigest()[:16],
+        "videos": sorted(videos),
+        "metrics": {
+            "r_squared": gi_ca.get("correlations", {}).get("R_squared"),
+            "threshold_16_accuracy": gi_ca.get("threshold_16_accuracy"),
+            "loo_accuracy": pred.get("loo_accuracy"),
+            "loo_brier": pred.get("loo_brier"),
+        },
+        "correlations": correlations,
+        "filters": {
+            f["video_id"]: _filter_outcome(f) for f in model.get("three_stage_filter", []) if f.get("video_id")
+        },
+        "tiers": _video_tiers(model),
+        "tier_scheme": "quantile" if model.get("benchmark_tiers") else "fixed_views",
+    }
 
-    # index.md が無ければヘッダ付きで作成
-    if not os.path.exists(HISTORY_INDEX):
-        header = (
-            "# 分析履歴インデックス\n\n"
-            "## バージョン履歴\n\n"
-            "| バージョン | 日付 | データ | サマリ |\n"
-            "|-----------|------|--------|--------|\n"
+
+def load_registry():
+    """registry.jsonl を版ごとに1件（同じ版は後のレコード優先）、版の昇順で返す"""
+    if not os.path.exists(HISTORY_REGISTRY):
+        return []
+    records = {}
+    with open(HISTORY_REGISTRY, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                records[rec["version"]] = rec
+    return sorted(records.values(), key=_version_key)
+
+
+def _append_registry(records):
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    with open(HISTORY_REGISTRY, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False, sort_keys=True) + "\n")
+
+
+def _seed_registry_from_snapshots(skip_version):
+    """レジストリが無いとき、保存済みスナップショットから過去版のレコードを作る。
+    未移行の旧形式フォルダは読むだけで移行はしない
+    """
+    models = {}
+    for name, path, version, _ in _legacy_snapshot_dirs():
+        legacy = _read_legacy_snapshot(path, version)
+        if legacy:
+            models[name] = legacy[0]
+    for entry in load_manifest()["snapshots"]:
+        models[entry["name"]] = _restore(entry)[0]
+    return [
+        build_registry_record(model)
+        for model in sorted(models.values(), key=_version_key)
+        if model["version"] != skip_version
+    ]
+
+
+def _delta(a, b):
+    if a is None or b is None:
+        return None
+    return round(b - a, 3)
+
+
+def diff_versions(old, new):
+    """2つのレジストリレコード（または版番号）をセクションごとに比較する。model.json は読まない。
+
+    ティアの定義が違う版どうし（固定再生数 → 分位点帯）はティア移動を比較しない。
+    戻り値: {"from", "to", "dataset", "metrics", "correlations", "filter_changes",
+            "tier_comparable", "tier_moves"}
+    レジストリにない版を指定した場合は ValueError
+    """
+    if not isinstance(old, dict) or not isinstance(new, dict):
+        by_version = {r["version"]: r for r in load_registry()}
+        unknown = [str(v) for v in (old, new) if not isinstance(v, dict) and str(v) not in by_version]
+        if unknown:
+            raise ValueError(
+                f"レジストリにない版: {', '.join(unknown)}（登録済み: {', '.join(by_version) or 'なし'}）"
+            )
+        old = by_version[str(old)] if not isinstance(old, dict) else old
+        new = by_version[str(new)] if not isinstance(new, dict) else new
+
+    old_videos, new_videos = set(old["videos"]), set(new["videos"])
+    correlations = [
+        {"name": name, "from": old["correlations"].get(name), "to": r,
+         "delta": _delta(old["correlations"].get(name), r)}
+        for name, r in new["correlations"].items()
+    ]
+    correlations.sort(key=lambda c: -abs(c["delta"]) if c["delta"] is not None else 0)
+    tier_comparable = _tier_scheme(old) == _tier_scheme(new)
+    return {
+        "from": old["version"],
+        "to": new["version"],
+        "dataset": {
+            "changed": old["dataset_hash"] != new["dataset_hash"],
+            "added": sorted(new_videos - old_videos),
+            "removed": sorted(old_videos - new_videos),
+        },
+        "metrics": {
+            k: {"from": old["metrics"].get(k), "to": v, "delta": _delta(old["metrics"].get(k), v)}
+            for k, v in new["metrics"].items()
+        },
+        "correlations": correlations,
+        "filter_changes": [
+            {"video_id": vid, "from": old["filters"].get(vid), "to": out}
+            for vid, out in sorted(new["filters"].items())
+            if vid in old["filters"] and old["filters"][vid] != out
+        ],
+        "tier_comparable": tier_comparable,
+        "tier_moves": [
+            {"video_id": vid, "from": old["tiers"].get(vid), "to": tier}
+            for vid, tier in sorted(new["tiers"].items())
+            if vid in old["tiers"] and old["tiers"][vid] != tier
+        ] if tier_comparable else [],
+    }
+
+
+def _change_summary(diff):
+    parts = []
+    if diff["dataset"]["added"] or diff["dataset"]["removed"]:
+        parts.append(f"動画 +{len(diff['dataset']['added'])}/-{len(diff['dataset']['removed'])}")
+    moved = [c for c in diff["correlations"] if c["delta"]][:TOP_CORRELATION_CHANGES]
+    if moved:
+        parts.append("r変化: " + ", ".join(f"{c['name']} {c['delta']:+.3f}" for c in moved))
+    if diff["filter_changes"]:
+        parts.append(f"フィルター判定変化 {len(diff['filter_changes'])}本")
+    if not diff["tier_comparable"]:
+        parts.append("ティア定義変更")
+    elif diff["tier_moves"]:
+        parts.append(f"ティア移動 {len(diff['tier_moves'])}本")
+    return " / ".join(parts) or "変化なし"
+
+
+def render_registry_table(records):
+    """レジストリから版履歴の表（マークダウン行のリスト）を作る"""
+    lines = [
+        "| バージョン | 日付 | データ | R² | 閾値16精度 | LOO精度 | データハッシュ | 前版からの主な変化 |",
+        "|-----------|------|--------|----|-----------|--------|---------------|------------------|",
+    ]
+
+    def _v(val, suffix=""):
+        return f"{val}{suffix}" if val is not None else "-"
+
+    prev = None
+    for rec in records:
+        m = rec["metrics"]
+        loo = f"{m['loo_accuracy'] * 100:.1f}%" if m.get("loo_accuracy") is not None else "-"
+        change = _change_summary(diff_versions(prev, rec)) if prev else "-"
+        lines.append(
+            f"| v{rec['version']} | {(rec.get('built_at') or '')[:10]} | "
+            f"{rec['dataset_size']}本(HIT:{rec['hits']}) | {_v(m.get('r_squared'))} | "
+            f"{_v(m.get('threshold_16_accuracy'), '%')} | {loo} | `{rec['dataset_hash']}` | {change} |"
         )
-        with open(HISTORY_INDEX, "w", encoding="utf-8") as f:
-            f.write(header + summary + "\n")
-    else:
-        # 「## 未解決問題」の直前に挿入（なければ末尾に追記）
+        prev = rec
+    return lines
+
+
+def render_history_index(records):
+    """index.md のレジストリ部分を書き直す。マーカーの外（手書きの説明・旧形式の履歴）は残す"""
+    content = INDEX_HEADER
+    if os.path.exists(HISTORY_INDEX):
         with open(HISTORY_INDEX, "r", encoding="utf-8") as f:
             content = f.read()
+    block = "\n".join(
+        [INDEX_BEGIN, "## モデルバージョン履歴（registry.jsonl から自動生成）", ""]
+        + render_registry_table(records) + [INDEX_END]
+    )
+    if INDEX_BEGIN in content and INDEX_END in content:
+        head, rest = content.split(INDEX_BEGIN, 1)
+        content = head + block + rest.split(INDEX_END, 1)[1]
+    else:
+        content = "\n".join(l for l in content.split("\n") if not LEGACY_INDEX_ROW.match(l))
         marker = "\n## 未解決問題"
         if marker in content:
-            content = content.replace(marker, summary + "\n" + marker)
+            content = content.replace(marker, "\n" + block + "\n" + marker, 1)
         else:
-            content = content.rstrip() + "\n" + summary + "\n"
-        with open(HISTORY_INDEX, "w", encoding="utf-8") as f:
-            f.write(content)
+            content = content.rstrip() + "\n\n" + block + "\n"
+    with open(HISTORY_INDEX, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def update_history_index(model):
+    """レジストリに今回のビルドを登録し、index.md の版履歴を再生成する"""
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    new = [] if os.path.exists(HISTORY_REGISTRY) else _seed_registry_from_snapshots(model["version"])
+    new.append(build_registry_record(model))
+    _append_registry(new)
+    render_history_index(load_registry())
+    print(f"  履歴インデックス更新: {HISTORY_INDEX}（レジストリ {HISTORY_REGISTRY}）")
+
+
+def format_diff(diff):
+    """diff_versions() の結果をマークダウンにする"""
+    lines = [f"# v{diff['from']} → v{diff['to']}", "", "## 指標", "", "| 指標 | 前 | 後 | 差 |", "|------|----|----|----|"]
+    for k, m in diff["metrics"].items():
+        d = f"{m['delta']:+.3f}" if m["delta"] is not None else "-"
+        lines.append(f"| {k} | {m['from'] if m['from'] is not None else '-'} | {m['to'] if m['to'] is not None else '-'} | {d} |")
+    ds = diff["dataset"]
+    lines += ["", "## データ", "", f"- データセット: {'変化あり' if ds['changed'] else '同一'}"
+              f"（追加 {len(ds['added'])}本 / 削除 {len(ds['removed'])}本）"]
+    lines += [f"  - 追加: {v}" for v in ds["added"]] + [f"  - 削除: {v}" for v in ds["removed"]]
+    lines += ["", "## 相関 r(log再生数) の変化", "", "| 指標 | 前 | 後 | 差 |", "|------|----|----|----|"]
+    for c in diff["correlations"]:
+        if c["delta"]:
+            lines.append(f"| {c['name']} | {c['from']:+.3f} | {c['to']:+.3f} | {c['delta']:+.3f} |")
+    lines += ["", f"## 3段階フィルター判定の変化（{len(diff['filter_changes'])}本）", ""]
+    lines += [f"- {c['video_id']}: {c['from'] or '-'} → {c['to'] or '-'}" for c in diff["filter_changes"]]
+    if not diff["tier_comparable"]:
+        lines += ["", "## ベンチマークティアの移動", "", "- ティアの定義が異なる（固定再生数 → 分位点帯）ため比較しない"]
+    else:
+        lines += ["", f"## ベンチマークティアの移動（{len(diff['tier_moves'])}本）", ""]
+        lines += [f"- {c['video_id']}: {c['from']} → {c['to']}" for c in diff["tier_moves"]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="モデル版レジストリ: 版の一覧・差分")
+    parser.add_argument("--diff", nargs=2, metavar=("OLD", "NEW"), help="2つの版を比較（例: 6.2 7.0）")
+    parser.add_argument("--rebuild-index", action="store_true", help="index.md の版履歴を再生成")
+    parser.add_argument("--migrate-legacy", action="store_true",
+                        help="旧形式の v{X.X}_{date}/ フォルダを blob ストアに移行（フォルダは残す）")
+    parser.add_argument("--delete-legacy", action="store_true",
+                        help="--migrate-legacy と併用: 復元を照合できたフォルダを削除")
+    args = parser.parse_args()
+    if args.delete_legacy and not args.migrate_legacy:
+        parser.error("--delete-legacy は --migrate-legacy と併用する")
+
+    records = load_registry()
+    if args.migrate_legacy:
+        stats = migrate_legacy_snapshots(delete=args.delete_legacy)
+        print(f"旧形式スナップショットを移行: {stats['migrated']}件（フォルダ削除 {stats['deleted']}件）")
+        for kept in stats["kept"]:
+            print(f"  残したフォルダ: {kept}")
+    elif args.diff:
+        try:
+            diff = diff_versions(*args.diff)
+        except ValueError as e:
+            parser.exit(1, f"❌ {e}\n")
+        print(format_diff(diff))
+    elif args.rebuild_index:
+        render_history_index(records)
+        print(f"再生成: {HISTORY_INDEX}")
+    else:
+        print("\n".join(render_registry_table(records)))
+
 
-    print(f"  履歴インデックス更新: {HISTORY_INDEX}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""
+Step 8 サブモジュール: 原因指標の並べ替え重要度（permutation importance）
+
+相関 |r| は他の指標を知ったうえでの寄与を表さないので、step8_predictive の
+リッジ回帰モデルを固定したまま1列ずつ値をシャッフルし、二乗誤差（Brier）が
+どれだけ悪化するかを重要度とする。
+
+高速化:
+  - 予測値は線形なので「その列を除いた部分予測 + 係数 × シャッフル後の列」で再計算
+  - シャッフル用バッファは列ごとに1つだけ作り、random.shuffle でその場で並べ替える
+    （ループ内でリスト・行列のコピーを作らない）
+  - (指標, チャンク) 単位のタスクに分けてプロセスプールで並列実行
+"""
+
+import random
+
+from common.parallel import run_parallel
+from step8_patterns import CAUSE_METRIC_DEFS
+from step8_predictive import predict_score
+
+
+IMPORTANCE_REPEATS = 1000    # 指標ごとのシャッフル回数
+IMPORTANCE_SEED = 20260302   # 再現性のための乱数シード
+IMPORTANCE_CHUNK = 250       # 1タスクのシャッフル回数（結果がコア数に依存しないよう固定）
+
+
+def _importance_chunk(task):
+    """ワーカー: 1指標・1チャンク分のシャッフルを行い、Brier の悪化量のリストを返す"""
+    partial, column, coef, y, base_loss, seed, count = task
+    rng = random.Random(seed)
+    buf = list(column)   # このチャンクで使い回すシャッフル用バッファ
+    n = len(y)
+    out = []
+    for _ in range(count):
+        rng.shuffle(buf)
+        loss = 0.0
+        for i in range(n):
+            e = y[i] - partial[i] - coef * buf[i]
+            loss += e * e
+        out.append(loss / n - base_loss)
+    return out
+
+
+def _quantile(sorted_vals, q):
+    pos = (len(sorted_vals) - 1) * q
+    lo = int(pos)
+    hi = min(lo + 1, len(sorted_vals) - 1)
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (pos - lo)
+
+
+def compute_permutation_importance(fit, n_repeats=IMPORTANCE_REPEATS,
+                                   seed=IMPORTANCE_SEED, workers=None):
+    """各原因指標の並べ替え重要度（Brier の悪化量）の平均と95%区間を返す。
+    fit は analyze_predictive_model() が返す学習済みモデル（再学習しない）
+    """
+    if fit is None:
+        return {"error": "予測モデルを学習できないため計算しない"}
+
+    rows = fit["rows"]
+    y = [1.0 if h else 0.0 for h in fit["labels"]]
+    preds = [predict_score(fit, row) for row in rows]
+    base_loss = sum((yv - p) ** 2 for yv, p in zip(y, preds)) / len(y)
+
+    tasks, owners = [], []
+    chunks = [IMPORTANCE_CHUNK] * (n_repeats // IMPORTANCE_CHUNK)
+    if n_repeats % IMPORTANCE_CHUNK:
+        chunks.append(n_repeats % IMPORTANCE_CHUNK)
+    for j, (key, coef) in enumerate(zip(fit["keys"], fit["coefficients"])):
+        column = [row[j] for row in rows]
+        partial = [p - coef * v for p, v in zip(preds, column)]
+        for c, count in enumerate(chunks):
+            tasks.append((partial, column, coef, y, base_loss, seed + j * 1000 + c, count))
+            owners.append(key)
+
+    deltas = {key: [] for key in fit["keys"]}
+    for key, chunk in zip(owners, run_parallel(_importance_chunk, tasks, workers)):
+        deltas[key].extend(chunk)
+
+    names = {key: name for name, key in CAUSE_METRIC_DEFS}
+    metrics = {}
+    for key in fit["keys"]:
+        vals = sorted(deltas[key])
+        mean = sum(vals) / len(vals)
+        metrics[names[key]] = {
+            "key": key,
+            "importance": round(mean, 5),
+            "ci95": [round(_quantile(vals, 0.025), 5), round(_quantile(vals, 0.975), 5)],
+            "relative": round(mean / base_loss, 3) if base_loss else None,
+        }
+    return {
+        "model": "predictive_model",
+        "loss": "brier",
+        "base_loss": round(base_loss, 4),
+        "repeats": n_repeats,
+        "seed": seed,
+        "metrics": dict(sorted(metrics.items(), key=lambda x: (-x[1]["importance"], x[0]))),
+    }
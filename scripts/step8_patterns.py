@@ -3,58 +3,68 @@ Step 3 サブモジュール: 相関分析 / パターン分析 / グループ
 """
 
 import math
-from common.metrics import avg, median, pearson
+import os
+from common.metrics import avg, median, pearson, spearman, kendall_tau, rankdata
+from common.data_loader import load_cache, save_cache, source_version
+from common.quantile_sketch import new_sketch, sketch_update, sketch_quantile
+from common.linalg import ols_residuals
+from common.bitsets import to_bitset
+from step8_permutation import permutation_pvalues, attach_fdr
 
 
 # ===========================================================================
 #  相関分析（原因と結果を分離）
 # ===========================================================================
 
+# 原因指標: 制作者がコントロール可能な変数
+CAUSE_METRIC_DEFS = [
+    ("ブラウジングCTR(%)", "browsing_ctr"),
+    ("関連動画CTR(%)", "related_ctr"),
+    ("MV挿入数", "mv_count"),
+    ("感情の底の数", "emotional_bottoms"),
+    ("文字数", "word_count"),
+    ("動画の長さ(秒)", "duration_seconds"),
+    ("感情曲線の転換数", "emotional_transitions"),
+    ("導入30秒の引きの強さ", "hook_strength"),
+    ("非MVリンク数", "non_mv_links"),
+    ("総メディア数(MV+非MV)", "total_media_count"),
+]
+
+# 結果指標: 動画が伸びた「結果」として発生する数値
+EFFECT_METRIC_DEFS = [
+    ("総インプレッション", "total_impressions"),
+    ("ブラウジングIMP", "browsing_impressions"),
+    ("関連動画IMP", "related_impressions"),
+    ("ブラウジング視聴数", "browsing_views"),
+    ("SUBSCRIBER視聴数", "subscriber_views"),
+    ("いいね数", "likes_total"),
+    ("コメント数", "comments_total"),
+    ("シェア数", "shares_total"),
+    ("登録者獲得数", "subs_gained"),
+    ("エンゲージメント率(%)", "engagement_rate"),
+    ("いいね率(%)", "like_rate"),
+    ("コメント率(%)", "comment_rate"),
+    ("平均視聴時間(秒)", "avg_view_duration"),
+    ("平均視聴率(%)", "avg_view_percentage"),
+    ("Day1→Day2変化率(%)", "day1_day2_change"),
+    ("新規視聴者率(%)", "new_viewer_pct"),
+    ("コア視聴者率(%)", "core_viewer_pct"),
+    ("コアターゲット比率(%)", "core_target_pct"),
+    ("視聴者の推定平均年齢", "audience_mean_age"),
+    ("女性視聴者比率(%)", "audience_female_pct"),
+    ("視聴者層の前作からのずれ", "audience_shift"),
+    ("Day1ブラウジング視聴数", "day1_browse_views"),
+    ("Day1関連動画視聴数", "day1_related_views"),
+    ("流入元関連動画数", "related_source_count"),
+    ("最大流入元の視聴数", "top_related_source_views"),
+]
+
+
 def compute_correlations(records):
     """原因指標・結果指標それぞれと log(再生数) の相関を計算"""
     log_views = [r["log_views"] for r in records]
     raw_views = [r["views"] for r in records]
 
-    # 原因指標: 制作者がコントロール可能な変数
-    cause_defs = [
-        ("ブラウジングCTR(%)", "browsing_ctr"),
-        ("関連動画CTR(%)", "related_ctr"),
-        ("MV挿入数", "mv_count"),
-        ("感情の底の数", "emotional_bottoms"),
-        ("文字数", "word_count"),
-        ("動画の長さ(秒)", "duration_seconds"),
-        ("感情曲線の転換数", "emotional_transitions"),
-        ("導入30秒の引きの強さ", "hook_strength"),
-        ("非MVリンク数", "non_mv_links"),
-        ("総メディア数(MV+非MV)", "total_media_count"),
-    ]
-
-    # 結果指標: 動画が伸びた「結果」として発生する数値
-    effect_defs = [
-        ("総インプレッション", "total_impressions"),
-        ("ブラウジングIMP", "browsing_impressions"),
-        ("関連動画IMP", "related_impressions"),
-        ("ブラウジング視聴数", "browsing_views"),
-        ("SUBSCRIBER視聴数", "subscriber_views"),
-        ("いいね数", "likes_total"),
-        ("コメント数", "comments_total"),
-        ("シェア数", "shares_total"),
-        ("登録者獲得数", "subs_gained"),
-        ("エンゲージメント率(%)", "engagement_rate"),
-        ("いいね率(%)", "like_rate"),
-        ("コメント率(%)", "comment_rate"),
-        ("平均視聴時間(秒)", "avg_view_duration"),
-        ("平均視聴率(%)", "avg_view_percentage"),
-        ("Day1→Day2変化率(%)", "day1_day2_change"),
-        ("新規視聴者率(%)", "new_viewer_pct"),
-        ("コア視聴者率(%)", "core_viewer_pct"),
-        ("コアターゲット比率(%)", "core_target_pct"),
-        ("Day1ブラウジング視聴数", "day1_browse_views"),
-        ("Day1関連動画視聴数", "day1_related_views"),
-        ("流入元関連動画数", "related_source_count"),
-        ("最大流入元の視聴数", "top_related_source_views"),
-    ]
-
     def _calc(metric_defs, category):
         out = {}
         for name, key in metric_defs:
@@ -82,7 +92,7 @@ def compute_correlations(records):
 
     vpd_correlations = {}
     if has_vpd:
-        for name, key in cause_defs:
+        for name, key in CAUSE_METRIC_DEFS:
             paired = [
                 (r.get(key), r["log_vpd"])
                 for r in records
@@ -110,23 +120,98 @@ def compute_correlations(records):
             }
 
     return {
-        "cause_metrics": _calc(cause_defs, "cause"),
-        "effect_metrics": _calc(effect_defs, "effect"),
+        "cause_metrics": _calc(CAUSE_METRIC_DEFS, "cause"),
+        "effect_metrics": _calc(EFFECT_METRIC_DEFS, "effect"),
         "vpd_correlations": vpd_correlations,
     }
 
 
+# ===========================================================================
+#  順位相関・偏相関（裾の重い再生数分布への対応）
+# ===========================================================================
+
+PARTIAL_CONTROLS = [("経過日数", "age_days"), ("公開時登録者数", "subs_at_publish")]
+
+
+def compute_rank_correlations(records):
+    """全指標について Spearman / Kendall tau-b と、経過日数・公開時登録者数を
+    統制した偏相関（ピアソン / 順位）を1パスで計算する。
+
+    戻り値: (rank_correlations, partial_correlations)
+    """
+    control_keys = [k for _, k in PARTIAL_CONTROLS]
+    rank_out = {"cause_metrics": {}, "effect_metrics": {}}
+    partial_out = {
+        "controls": [name for name, _ in PARTIAL_CONTROLS],
+        "cause_metrics": {},
+        "effect_metrics": {},
+    }
+
+    for section, metric_defs, category in [
+        ("cause_metrics", CAUSE_METRIC_DEFS, "cause"),
+        ("effect_metrics", EFFECT_METRIC_DEFS, "effect"),
+    ]:
+        for name, key in metric_defs:
+            rows = [r for r in records if r.get(key) is not None]
+            if len(rows) < 3:
+                continue
+            xs = [float(r[key]) for r in rows]
+            lvs = [r["log_views"] for r in rows]
+            rank_out[section][name] = {
+                "spearman": round(spearman(xs, lvs), 3),
+                "kendall_tau": round(kendall_tau(xs, lvs), 3),
+                "r_log_views": round(pearson(xs, lvs), 3),
+                "n": len(rows),
+                "type": category,
+            }
+
+            # 偏相関: 統制変数がそろっている動画のみ（切片 + 統制変数 2列 → 自由度確保に n>=6）
+            ctrl_rows = [
+                (x, lv, [r[k] for k in control_keys])
+                for r, x, lv in zip(rows, xs, lvs)
+                if all(r.get(k) is not None for k in control_keys)
+            ]
+            if len(ctrl_rows) < 6:
+                continue
+            cx, cy, cc = zip(*ctrl_rows)
+            controls = [list(col) for col in zip(*cc)]
+            rank_controls = [rankdata(col) for col in controls]
+            rx = ols_residuals(list(cx), controls)
+            ry = ols_residuals(list(cy), controls)
+            rrx = ols_residuals(rankdata(cx), rank_controls)
+            rry = ols_residuals(rankdata(cy), rank_controls)
+            if None in (rx, ry, rrx, rry):
+                continue
+            partial_out[section][name] = {
+                "partial_r": round(pearson(rx, ry), 3),
+                "partial_spearman": round(pearson(rrx, rry), 3),
+                "n": len(ctrl_rows),
+                "type": category,
+            }
+
+    for section in ("cause_metrics", "effect_metrics"):
+        rank_out[section] = dict(sorted(
+            rank_out[section].items(), key=lambda x: abs(x[1]["spearman"]), reverse=True
+        ))
+        partial_out[section] = dict(sorted(
+            partial_out[section].items(), key=lambda x: abs(x[1]["partial_spearman"]), reverse=True
+        ))
+    return rank_out, partial_out
+
+
 # ===========================================================================
 #  パターン分析
 # ===========================================================================
 
 def analyze_patterns(records):
     patterns = []
+    conditions = []
 
     def _compare(name, cond):
         yes = [r["views"] for r in records if cond(r)]
         no = [r["views"] for r in records if not cond(r)]
         if yes and no:
+            conditions.append(cond)
             patterns.append({
                 "name": name,
                 "with_count": len(yes),
@@ -149,6 +234,16 @@ def analyze_patterns(records):
     _compare("感情エスカレーション", lambda r: r["bottoms_escalate"])
     _compare("感情の底3回以上", lambda r: r["emotional_bottoms"] >= 3)
 
+    # 並べ替え検定: パターンの有無で HIT 率に偏りがあるか（両側）+ FDR補正
+    if patterns:
+        label_bits = to_bitset(r["is_hit"] for r in records)
+        feature_bits = [to_bitset(cond(r) for r in records) for cond in conditions]
+        significance = attach_fdr(permutation_pvalues(
+            label_bits, len(records), feature_bits, alternative="two-sided"
+        ))
+        for p, sig in zip(patterns, significance):
+            p["significance"] = sig
+
     fraud = [
         {"artist": r["artist"], "views": r["views"],
          "day1_day2": r["day1_day2_change"]}
@@ -205,17 +300,95 @@ def compute_group_comparisons(records):
 #  ベンチマーク
 # ===========================================================================
 
-def compute_benchmarks(records):
-    tiers = {
-        "S_500k+": [r for r in records if r["views"] >= 500000],
-        "A_200k-500k": [
-            r for r in records if 200000 <= r["views"] < 500000
-        ],
-        "B_100k-200k": [
-            r for r in records if 100000 <= r["views"] < 200000
-        ],
-        "C_under_100k": [r for r in records if r["views"] < 100000],
+# 再生数・日あたり再生数・予測再生数の分布から決めるティア（上位からの分位点帯）
+BENCHMARK_TIERS = [
+    ("S_top10%", 0.9),
+    ("A_top30%", 0.7),
+    ("B_top60%", 0.4),
+    ("C_rest", 0.0),
+]
+SKETCH_METRICS = ("views", "views_per_day", "eventual_views")
+BENCHMARK_SKETCH_CACHE = "benchmark_sketch"
+# 先頭は保存形式の版（"videos" の値を投入した値そのものにした v2）
+BENCHMARK_SKETCH_VERSION = "v2-" + source_version(
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "common", "quantile_sketch.py"),
+)
+
+
+def _sketch_values(record):
+    return {m: record.get(m) for m in SKETCH_METRICS}
+
+
+def _add_to_sketches(sketches, values):
+    for m in SKETCH_METRICS:
+        if values.get(m) is not None:
+            sketch_update(sketches[m], values[m])
+
+
+def load_benchmark_sketches():
+    """保存済みのスケッチ {"videos": {動画ID: 投入した値}, "sketches": {指標: スケッチ}}。無ければ None"""
+    cache = load_cache(BENCHMARK_SKETCH_CACHE)
+    if cache.get("version") != BENCHMARK_SKETCH_VERSION:
+        return None
+    return cache
+
+
+def update_benchmark_sketches(records):
+    """ベンチマーク用の分位点スケッチを現在の値に合わせて更新する（step8 だけが書き込む）。
+
+    動画ごとに投入した値を記録しておき、既存の動画の値がすべて同じなら新しい動画だけを
+    追加する（1本あたり償却 O(1)）。値が変わった・消えた動画がある場合は KLL から
+    削除できないので、現在の records から全件作り直す（O(n log n)、33本なら数ミリ秒）。
+    再生数・日あたり再生数は実行のたびに伸びるので、通常は毎回作り直しになる。
+    戻り値: (state, {"added", "rebuilt"})
+    """
+    current = {r["video_id"]: _sketch_values(r) for r in records}
+    state = load_benchmark_sketches()
+    if state and all(current.get(vid) == values for vid, values in state["videos"].items()):
+        new = [vid for vid in current if vid not in state["videos"]]
+        rebuilt = False
+    else:
+        state = {"videos": {}, "sketches": {m: new_sketch() for m in SKETCH_METRICS}}
+        new = list(current)
+        rebuilt = True
+    for vid in new:
+        _add_to_sketches(state["sketches"], current[vid])
+        state["videos"][vid] = current[vid]
+    if new or rebuilt:
+        save_cache(BENCHMARK_SKETCH_CACHE, dict(state, version=BENCHMARK_SKETCH_VERSION))
+    return state, {"added": len(new), "rebuilt": rebuilt}
+
+
+def _tier_from_bounds(bounds, value):
+    for name, _ in BENCHMARK_TIERS:
+        if bounds[name] is None or value >= bounds[name]:
+            return name
+    return BENCHMARK_TIERS[-1][0]
+
+
+def tier_bounds(sketches):
+    """{指標: {ティア名: 下限値}}（最下位のティアは None）"""
+    return {
+        m: {name: sketch_quantile(sk, q) if q else None for name, q in BENCHMARK_TIERS}
+        for m, sk in sketches.items() if sk["n"]
     }
+
+
+def tier_of(sketches, metric, value):
+    """スケッチ上の分位点帯からティア名を返す。値・スケッチがなければ None"""
+    bounds = tier_bounds({metric: sketches[metric]}).get(metric) if sketches and metric in sketches else None
+    if value is None or not bounds:
+        return None
+    return _tier_from_bounds(bounds, value)
+
+
+def compute_benchmarks(records, sketches):
+    """再生数のスケッチの分位点帯で動画をティアに分ける"""
+    bounds = tier_bounds(sketches).get("views")
+    tiers = {name: [] for name, _ in BENCHMARK_TIERS}
+    if bounds:
+        for r in records:
+            tiers[_tier_from_bounds(bounds, r["views"])].append(r)
     out = {}
     for tier, group in tiers.items():
         if group:
@@ -224,6 +397,7 @@ def compute_benchmarks(records):
                 "avg_views": int(avg([r["views"] for r in group])),
                 "videos": [
                     {
+                        "video_id": r["video_id"],
                         "artist": r["artist"],
                         "views": r["views"],
                         "gi_x_ca": r.get("gi_x_ca"),
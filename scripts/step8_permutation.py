@@ -0,0 +1,134 @@
+"""
+Step 8 サブモジュール: 並べ替え検定（permutation test）
+
+HIT/MISS ラベルをシャッフルしたときの「条件を満たすHIT本数」の分布から
+p値を求める。条件・ラベルはどちらもビットセット(int)で表し、
+1回の順列 × 全条件の集計を popcount(条件 & ラベル) で行う。
+
+  - 全順列数が EXACT_LIMIT 以下: 全列挙による正確なp値
+  - それ以外: モンテカルロ (b+1)/(B+1)。順列バッチをチャンク単位で並列生成
+  - 結果はラベルベクトルをキーに data/cache/ へ保存し、同じラベルなら再利用
+"""
+
+import math
+import random
+from itertools import combinations
+
+from common.bitsets import from_indices, popcount
+from common.data_loader import load_cache, save_cache
+from common.metrics import bh_fdr
+from common.parallel import run_parallel, split_count, defer_to_parent
+
+
+PERMUTATIONS = 10000          # モンテカルロ時の順列数
+PERMUTATION_SEED = 20260302   # 再現性のための乱数シード
+PERMUTATION_CHUNK = 1000      # 1タスクの順列数（結果がコア数に依存しないよう固定）
+EXACT_LIMIT = 50000           # 全順列数がこれ以下なら全列挙
+SIGNIFICANCE_ALPHA = 0.05     # FDR補正後q値の有意水準
+CACHE_NAME = "permutation_tests"
+CACHE_MAX_LABELS = 16         # キャッシュに保持するラベルベクトル数
+
+
+# ===========================================================================
+#  検定本体
+# ===========================================================================
+
+def _exceeds(count, observed, expected, alternative):
+    """順列での統計量が観測値以上に極端か"""
+    if alternative == "two-sided":
+        return abs(count - expected) >= abs(observed - expected) - 1e-9
+    return count >= observed
+
+
+def _tally(label_batch, features, observed, expected, alternative):
+    """順列ラベルのバッチについて、各条件で観測値以上になった回数を数える"""
+    hits = [0] * len(features)
+    for perm in label_batch:
+        for j, f in enumerate(features):
+            if _exceeds(popcount(f & perm), observed[j], expected[j], alternative):
+                hits[j] += 1
+    return hits
+
+
+def _mc_chunk(task):
+    """ワーカー: 乱数順列バッチを生成して集計する"""
+    n, k, seed, count, features, observed, expected, alternative = task
+    rng = random.Random(seed)
+    population = range(n)
+    batch = [from_indices(rng.sample(population, k)) for _ in range(count)]
+    return _tally(batch, features, observed, expected, alternative)
+
+
+def _run_tests(label_bits, n, features, n_perm, seed, alternative, workers):
+    """features（ビットセットのリスト）それぞれの p値と手法を返す"""
+    k = popcount(label_bits)
+    observed = [popcount(f & label_bits) for f in features]
+    expected = [popcount(f) * k / n for f in features]
+    total = math.comb(n, k)
+
+    if total <= EXACT_LIMIT:
+        batch = (from_indices(c) for c in combinations(range(n), k))
+        hits = _tally(batch, features, observed, expected, alternative)
+        return [(h / total, "exact") for h in hits]
+
+    chunk_counts = split_count(n_perm, -(-n_perm // PERMUTATION_CHUNK))
+    tasks = [
+        (n, k, seed + i, c, features, observed, expected, alternative)
+        for i, c in enumerate(chunk_counts)
+    ]
+    hits = [sum(col) for col in zip(*run_parallel(_mc_chunk, tasks, workers))]
+    return [((h + 1) / (n_perm + 1), "monte_carlo") for h in hits]
+
+
+def _store_pvalues(key, computed):
+    """計算したp値をキャッシュに追記する。直近に使ったラベルを末尾に置き、古いものから捨てる"""
+    cache = load_cache(CACHE_NAME)
+    entry = cache.pop(key, {})
+    entry.update(computed)
+    cache[key] = entry
+    while len(cache) > CACHE_MAX_LABELS:
+        cache.pop(next(iter(cache)))
+    save_cache(CACHE_NAME, cache)
+
+
+def permutation_pvalues(label_bits, n, features, alternative="greater",
+                        n_perm=PERMUTATIONS, seed=PERMUTATION_SEED, workers=None):
+    """ラベル(HIT)ビットセットと条件ビットセット群から並べ替え検定のp値を返す。
+
+    alternative:
+      - "greater":   条件を満たす動画にHITが多い（片側）
+      - "two-sided": HITの偏りが多い/少ないのどちらでも（両側）
+    戻り値: [{"p_value", "method"}]（features と同順）
+    """
+    k = popcount(label_bits)
+    if n < 2 or k == 0 or k == n:
+        return [{"p_value": None, "method": None} for _ in features]
+
+    key = f"{n}:{label_bits:x}:{alternative}:{n_perm}:{seed}"
+    entry = dict(load_cache(CACHE_NAME).get(key, {}))
+
+    missing = [f for f in dict.fromkeys(features) if f"{f:x}" not in entry]
+    if missing:
+        computed = {}
+        for f, (p, method) in zip(missing, _run_tests(
+                label_bits, n, missing, n_perm, seed, alternative, workers)):
+            computed[f"{f:x}"] = [p, method]
+        entry.update(computed)
+        # 並列ステージ内ではキャッシュを書かず、親プロセスでまとめて保存する
+        if not defer_to_parent(_store_pvalues, key, computed):
+            _store_pvalues(key, computed)
+
+    out = []
+    for f in features:
+        p, method = entry[f"{f:x}"]
+        out.append({"p_value": round(p, 4), "method": method})
+    return out
+
+
+def attach_fdr(results):
+    """permutation_pvalues() の結果に BH法の q値と有意判定を付与する（in-place）"""
+    qs = bh_fdr([r["p_value"] for r in results])
+    for r, q in zip(results, qs):
+        r["q_value"] = round(q, 4) if q is not None else None
+        r["significant"] = q is not None and q < SIGNIFICANCE_ALPHA
+    return results
@@ -0,0 +1,284 @@
+"""
+Step 8 サブモジュール: 原因指標のリッジ回帰による HIT 予測モデル
+
+GI×CA >= 16 の手動閾値は学習データ上の正解率しか持たないので、原因指標
+（CAUSE_METRIC_DEFS）を標準化して HIT(1)/MISS(0) をリッジ回帰で予測し、
+1本抜き交差検証（LOO）で汎化性能を測る。
+
+  - LOO は閉形式: 予測残差 e_i / (1 - h_ii)（h_ii はハット行列の対角）。
+    (Z^T Z + λI) の逆行列を1回求めれば全 n 回分の LOO 予測が得られる
+  - λ は LOO の二乗誤差が最小になる候補を選ぶ
+  - LOO 予測値をプラット・スケーリング（1次元ロジスティック回帰）で較正し、
+    動画ごとの HIT 確率とする
+  - 欠損値は列平均で補完する。標準化・補完は全データで1回だけ行う（ラベルは使わない）
+
+評価指標（LOO 正解率・Brier・対数損失）は入れ子の LOO で求める。λ の選択と
+プラットの a, b を全データの LOO 予測値で決めると、同じ予測値で評価することになり
+楽観的になるため、外側で1本抜くごとに残り n-1 本だけで λ 選択（内側の閉形式 LOO）と
+較正をやり直し、抜いた1本の確率を求める。
+"""
+
+import math
+
+from common.linalg import gram, xty, inverse
+from step8_patterns import CAUSE_METRIC_DEFS
+
+
+RIDGE_LAMBDAS = (0.1, 0.3, 1.0, 3.0, 10.0, 30.0, 100.0)   # λ の候補
+MIN_FEATURE_COVERAGE = 0.5   # 値がある動画がこの割合未満の指標は使わない
+MIN_SAMPLES = 8
+PLATT_ITERATIONS = 50
+
+
+# ===========================================================================
+#  学習
+# ===========================================================================
+
+def _design(records, keys):
+    """標準化した特徴量行列と、各列の (平均, 標準偏差) を返す"""
+    scale = []
+    columns = []
+    for key in keys:
+        vals = [r.get(key) for r in records]
+        present = [v for v in vals if v is not None]
+        mean = sum(present) / len(present)
+        sd = math.sqrt(sum((v - mean) ** 2 for v in present) / len(present))
+        scale.append((mean, sd))
+        columns.append([((v if v is not None else mean) - mean) / sd for v in vals])
+    return [list(row) for row in zip(*columns)], scale
+
+
+def standardize(record, keys, scale):
+    """1レコードを学習時と同じ補完・標準化で特徴量ベクトルにする"""
+    row = []
+    for key, (mean, sd) in zip(keys, scale):
+        v = record.get(key)
+        row.append(((v if v is not None else mean) - mean) / sd)
+    return row
+
+
+def ridge_loo(z_rows, y, lam):
+    """切片（罰則なし）+ リッジ回帰を解き、係数と閉形式 LOO 予測を返す。
+
+    z_rows は列ごとに平均0に中心化済みであること。
+    戻り値: (切片, 係数, 学習データでの予測値, LOO 予測値)。解けなければ None
+    """
+    n, p = len(z_rows), len(z_rows[0])
+    g = gram(z_rows)
+    for i in range(p):
+        g[i][i] += lam
+    a_inv = inverse(g)
+    if a_inv is None:
+        return None
+    y_mean = sum(y) / n
+    zty = xty(z_rows, [v - y_mean for v in y])
+    beta = [sum(a * b for a, b in zip(row, zty)) for row in a_inv]
+
+    fitted, loo = [], []
+    for row, yv in zip(z_rows, y):
+        pred = y_mean + sum(b * v for b, v in zip(beta, row))
+        # 中心化した切片の分 1/n + z^T A^-1 z
+        h = 1 / n + sum(row[i] * sum(a_inv[i][j] * row[j] for j in range(p)) for i in range(p))
+        fitted.append(pred)
+        loo.append(yv - (yv - pred) / (1 - h))
+    return y_mean, beta, fitted, loo
+
+
+def _sigmoid(x):
+    if x >= 0:
+        return 1 / (1 + math.exp(-x))
+    e = math.exp(x)
+    return e / (1 + e)
+
+
+def platt_scaling(scores, labels):
+    """P(HIT) = sigmoid(a·score + b) の a, b をニュートン法で求める（Platt の目標値補正つき）"""
+    n_pos = sum(1 for y in labels if y)
+    n_neg = len(labels) - n_pos
+    t_pos = (n_pos + 1) / (n_pos + 2)
+    t_neg = 1 / (n_neg + 2)
+    targets = [t_pos if y else t_neg for y in labels]
+    a, b = 1.0, 0.0
+    for _ in range(PLATT_ITERATIONS):
+        g_a = g_b = h_aa = h_ab = h_bb = 0.0
+        for s, t in zip(scores, targets):
+            p = _sigmoid(a * s + b)
+            d = p - t
+            w = max(p * (1 - p), 1e-12)
+            g_a += d * s
+            g_b += d
+            h_aa += w * s * s
+            h_ab += w * s
+            h_bb += w
+        det = h_aa * h_bb - h_ab * h_ab
+        if abs(det) < 1e-12:
+            break
+        da = (h_bb * g_a - h_ab * g_b) / det
+        db = (h_aa * g_b - h_ab * g_a) / det
+        a, b = a - da, b - db
+        if abs(da) < 1e-9 and abs(db) < 1e-9:
+            break
+    return a, b
+
+
+def _select_lambda(z_rows, y):
+    """RIDGE_LAMBDAS のうち LOO 二乗誤差が最小の (MSE, λ, ridge_loo の戻り値)。解けなければ None"""
+    best = None
+    for lam in RIDGE_LAMBDAS:
+        solved = ridge_loo(z_rows, y, lam)
+        if solved is None:
+            continue
+        mse = sum((yv - p) ** 2 for yv, p in zip(y, solved[3])) / len(y)
+        if best is None or mse < best[0]:
+            best = (mse, lam, solved)
+    return best
+
+
+def nested_loo(z_rows, labels):
+    """入れ子の LOO。外側で1本ずつ抜き、残り n-1 本だけで λ 選択とプラット較正をやり直す。
+    戻り値: [(抜いた1本の予測値, 較正後の HIT 確率)]（z_rows と同順）
+    """
+    y = [1.0 if h else 0.0 for h in labels]
+    out = []
+    for i in range(len(z_rows)):
+        rest = z_rows[:i] + z_rows[i + 1:]
+        rest_y = y[:i] + y[i + 1:]
+        rest_labels = labels[:i] + labels[i + 1:]
+        # ridge_loo は列が中心化済みであることを前提にするので、n-1 本で中心化し直す
+        means = [sum(col) / len(rest) for col in zip(*rest)]
+        centered = [[v - m for v, m in zip(row, means)] for row in rest]
+        best = _select_lambda(centered, rest_y)
+        if best is None:
+            base = sum(rest_y) / len(rest_y)
+            out.append((base, base))
+            continue
+        intercept, beta, _, inner_loo = best[2]
+        score = intercept + sum(b * (v - m) for b, v, m in zip(beta, z_rows[i], means))
+        a, b = platt_scaling(inner_loo, rest_labels)
+        out.append((score, _sigmoid(a * score + b)))
+    return out
+
+
+def fit_predictive_model(records):
+    """λ を LOO で選んだリッジ回帰を学習する。
+
+    戻り値: {"keys", "scale", "lambda", "intercept", "coefficients", "platt", "rows", "labels",
+            "fitted", "loo"}。データ不足なら None
+    """
+    if len(records) < MIN_SAMPLES:
+        return None
+    keys = []
+    for _, key in CAUSE_METRIC_DEFS:
+        vals = [r.get(key) for r in records if r.get(key) is not None]
+        if len(vals) >= MIN_FEATURE_COVERAGE * len(records) and len(set(vals)) > 1:
+            keys.append(key)
+    labels = [bool(r["is_hit"]) for r in records]
+    if not keys or all(labels) or not any(labels):
+        return None
+
+    z_rows, scale = _design(records, keys)
+    y = [1.0 if h else 0.0 for h in labels]
+    best = _select_lambda(z_rows, y)
+    if best is None:
+        return None
+
+    _, lam, (intercept, beta, fitted, loo) = best
+    return {
+        "keys": keys,
+        "scale": scale,
+        "lambda": lam,
+        "intercept": intercept,
+        "coefficients": beta,
+        "platt": platt_scaling(loo, labels),
+        "rows": z_rows,
+        "labels": labels,
+        "fitted": fitted,
+        "loo": loo,
+    }
+
+
+def predict_score(fit, row):
+    """標準化済みの特徴量ベクトルに対するリッジ回帰の予測値（HIT なら 1 に近い）"""
+    return fit["intercept"] + sum(b * v for b, v in zip(fit["coefficients"], row))
+
+
+# ===========================================================================
+#  評価
+# ===========================================================================
+
+def _accuracy(scores, labels, cut=0.5):
+    return sum(1 for s, y in zip(scores, labels) if (s >= cut) == y) / len(labels)
+
+
+def _brier(probs, labels):
+    return sum((p - (1.0 if y else 0.0)) ** 2 for p, y in zip(probs, labels)) / len(labels)
+
+
+def _log_loss(probs, labels):
+    eps = 1e-12
+    return -sum(
+        math.log(max(p, eps)) if y else math.log(max(1 - p, eps)) for p, y in zip(probs, labels)
+    ) / len(labels)
+
+
+def analyze_predictive_model(records):
+    """原因指標のリッジ回帰モデルを学習し、入れ子 LOO の正解率と較正済み HIT 確率を返す。
+
+    戻り値: (model.json 用の要約, fit_predictive_model() の結果)。
+    fit は並べ替え重要度で再学習せずに使い回す（学習できなければ None）
+    """
+    fit = fit_predictive_model(records)
+    if fit is None:
+        return {"error": f"学習できるデータが不足（{MIN_SAMPLES}本未満または特徴量なし）", "sample_count": len(records)}, None
+
+    labels = fit["labels"]
+    a, b = fit["platt"]
+    nested = nested_loo(fit["rows"], labels)
+    scores = [s for s, _ in nested]
+    probs = [p for _, p in nested]
+    base = sum(labels) / len(labels)
+    majority = max(base, 1 - base)
+
+    # 同じ動画集合のうち人間評価がある動画で、GI×CA >= 16 の学習内正解率と並べる
+    scored = [(r, p) for r, p in zip(records, probs) if r.get("gi_x_ca") is not None]
+    comparison = None
+    if scored:
+        comparison = {
+            "scored_count": len(scored),
+            "gi_ca_16_in_sample_accuracy": round(
+                sum(1 for r, _ in scored if (r["gi_x_ca"] >= 16) == r["is_hit"]) / len(scored), 3
+            ),
+            "ridge_loo_accuracy": round(
+                sum(1 for r, p in scored if (p >= 0.5) == r["is_hit"]) / len(scored), 3
+            ),
+        }
+
+    coefficients = sorted(
+        zip(fit["keys"], fit["coefficients"]), key=lambda x: -abs(x[1])
+    )
+    summary = {
+        "method": "ridge_closed_form_loo",
+        "evaluation": "nested_loo",   # λ 選択・較正を各 fold の n-1 本でやり直した評価
+        "sample_count": len(records),
+        "features": fit["keys"],
+        "lambda": fit["lambda"],
+        "coefficients": {k: round(c, 4) for k, c in coefficients},
+        "in_sample_accuracy": round(_accuracy(fit["fitted"], labels), 3),
+        "loo_accuracy": round(_accuracy(probs, labels), 3),
+        "majority_baseline": round(majority, 3),
+        "loo_brier": round(_brier(probs, labels), 4),
+        "loo_log_loss": round(_log_loss(probs, labels), 4),
+        "platt": {"a": round(a, 4), "b": round(b, 4)},
+        "gi_ca_comparison": comparison,
+        "predictions": [
+            {
+                "video_id": r["video_id"],
+                "is_hit": r["is_hit"],
+                "loo_score": round(s, 4),
+                "hit_probability": round(p, 3),
+                "correct": (p >= 0.5) == r["is_hit"],
+            }
+            for r, s, p in sorted(zip(records, scores, probs), key=lambda x: -x[2])
+        ],
+    }
+    return summary, fit
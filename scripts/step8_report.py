@@ -5,6 +5,32 @@ Step 3 サブモジュール: レポート生成
 from config import HIT_THRESHOLD
 
 
+# ===========================================================================
+#  表示ヘルパー
+# ===========================================================================
+
+def _fmt_ci(ci):
+    """[lo, hi] → "[-0.12, +0.45]"。無ければ "-" """
+    if not ci:
+        return "-"
+    return f"[{ci[0]:+.2f}, {ci[1]:+.2f}]"
+
+
+def _fmt_stability(val):
+    """順位安定度(0-1) → パーセント表示"""
+    return f"{val * 100:.0f}%" if val is not None else "-"
+
+
+def _num(val, spec=""):
+    """数値を書式指定で表示。None なら "-" """
+    return format(val, spec) if val is not None else "-"
+
+
+def _rate(val):
+    """割合(0-1) → パーセント表示。None なら "-" """
+    return f"{val * 100:.0f}%" if val is not None else "-"
+
+
 # ===========================================================================
 #  レポート生成
 # ===========================================================================
@@ -44,6 +70,13 @@ def generate_report(model, records):
         for k, v in corr.items():
             _a(f"| {k} | {v if v is not None else 'N/A'} |")
         _a(f"\n閾値16判定精度: {gi_ca.get('threshold_16_accuracy', 'N/A')}%")
+        gi_roc = (model.get("roc") or {}).get("columns", {}).get("gi_x_ca")
+        if gi_roc:
+            y = gi_roc["youden"]
+            _a(
+                f"\nROC: AUC={gi_roc['auc']:.3f}（{gi_roc['n']}本）/ "
+                f"Youden最適閾値 {y['threshold']:g}（感度 {y['tpr'] * 100:.0f}% / 偽陽性率 {y['fpr'] * 100:.0f}%）"
+            )
 
     details = gi_ca.get("details", [])
     if details:
@@ -69,6 +102,35 @@ def generate_report(model, records):
                 f"{r.get('ai_gi_total', '-')} | {r.get('ai_ca', '-')} |"
             )
 
+    # 原因指標のリッジ回帰（LOO）
+    pred_model = model.get("predictive_model") or {}
+    if pred_model.get("predictions"):
+        _a("\n### 原因指標による予測モデル（リッジ回帰・1本抜き交差検証）")
+        _a(
+            f"\n> {pred_model['sample_count']}本・特徴量{len(pred_model['features'])}個、λ={pred_model['lambda']:g}（LOO二乗誤差で選択）。"
+            "LOO予測値をプラット・スケーリングで較正した HIT 確率 >= 50% で HIT 判定。"
+            "LOO の指標は入れ子の LOO（1本抜くごとに残りだけで λ 選択と較正をやり直す）で求めた値。"
+        )
+        _a("\n| 指標 | 値 |")
+        _a("|------|-----|")
+        _a(f"| 学習データでの正解率 | {pred_model['in_sample_accuracy'] * 100:.1f}% |")
+        _a(f"| LOO正解率 | {pred_model['loo_accuracy'] * 100:.1f}% |")
+        _a(f"| 多数派予測の正解率 | {pred_model['majority_baseline'] * 100:.1f}% |")
+        _a(f"| LOO Brier スコア | {pred_model['loo_brier']:.4f} |")
+        cmp_ = pred_model.get("gi_ca_comparison")
+        if cmp_:
+            _a(
+                f"| 人間評価あり{cmp_['scored_count']}本: GI×CA>=16（学習内） / リッジ（LOO） | "
+                f"{cmp_['gi_ca_16_in_sample_accuracy'] * 100:.1f}% / {cmp_['ridge_loo_accuracy'] * 100:.1f}% |"
+            )
+        _a("\n係数（標準化後）: " + ", ".join(f"{k} {c:+.3f}" for k, c in pred_model["coefficients"].items()))
+        misses = [p for p in pred_model["predictions"] if not p["correct"]]
+        if misses:
+            _a("\nLOOで外れた動画: " + ", ".join(
+                f"{p['video_id']}（{'HIT' if p['is_hit'] else 'MISS'}・確率{p['hit_probability'] * 100:.0f}%）"
+                for p in misses
+            ))
+
     # --- 2. 3段階フィルター ---
     fdata = model.get("three_stage_filter", [])
     _a("\n## 2. 3段階フィルター分析")
@@ -125,32 +187,140 @@ def generate_report(model, records):
                         "> 黄金理論のチェックリスト（golden_theory.json）の方が信頼性が高い。"
                     )
 
+    # 閾値の最適化
+    opt = model.get("filter_thresholds") or {}
+    if opt.get("best"):
+        labels = {
+            "f1_ctr": "F1 CTR(%)", "f2_change": "F2 変化率(%)",
+            "f3_duration": "F3 平均視聴(秒)", "f3_engagement": "F3 エンゲージメント率(%)",
+        }
+
+        def _t(val):
+            return "無効" if val is None else f"{val:g}"
+
+        def _p(val):
+            return f"{val * 100:.0f}%" if val is not None else "-"
+
+        _a("\n### 閾値の最適化（4閾値の同時グリッド探索）")
+        _a(
+            f"\n> 評価対象 {opt['evaluated_count']}本 / 組み合わせ {opt['grid_size']:,}通り。"
+            f"全データで最適な組の正解率 {_p(opt['best']['accuracy'])}、"
+            f"1本抜き交差検証（選び直し込み）の正解率 {_p(opt['loo_accuracy'])}。"
+        )
+        _a("\n| 閾値 | 現行 | 最適 | LOO安定度 |")
+        _a("|------|------|------|----------|")
+        for key, label in labels.items():
+            _a(
+                f"| {label} | {_t(opt['current']['thresholds'][key])} | "
+                f"{_t(opt['best']['thresholds'][key])} | {_p(opt['stability'][key])} |"
+            )
+        _a(
+            f"| 正解率 / 感度 / 特異度 | {_p(opt['current']['accuracy'])} / {_p(opt['current']['tpr'])} / "
+            f"{_p(opt['current']['tnr'])} | {_p(opt['best']['accuracy'])} / {_p(opt['best']['tpr'])} / "
+            f"{_p(opt['best']['tnr'])} | 組全体 {_p(opt['stability']['all'])} |"
+        )
+        if opt.get("pareto"):
+            _a("\n**パレート最適な閾値の組**（感度と特異度のどちらも劣らない）")
+            _a("\n| 感度 | 特異度 | 正解率 | " + " | ".join(labels.values()) + " |")
+            _a("|------|--------|--------|" + "------|" * len(labels))
+            for p in opt["pareto"]:
+                cells = " | ".join(_t(p["thresholds"][key]) for key in labels)
+                _a(f"| {_p(p['tpr'])} | {_p(p['tnr'])} | {_p(p['accuracy'])} | {cells} |")
+
     # --- 3. 原因指標の相関 ---
     correlations = model.get("correlations", {})
     _a("\n## 3. 原因指標と log(再生数) の相関")
     _a("\n> 原因指標 = コントロール可能な変数。結果指標は別セクションに分離")
 
     cause = correlations.get("cause_metrics", {})
+    boot = correlations.get("bootstrap")
+    if boot:
+        _a(
+            f"> 95%CI・順位安定度はブートストラップ{boot['resamples']:,}回。"
+            f"順位安定度 = 観測順位±{boot['rank_tolerance']}に収まった割合"
+        )
     if cause:
-        _a("\n| 指標 | r(log) | r(raw) | n | 強さ |")
-        _a("|------|--------|--------|---|------|")
+        _a("\n| 指標 | r(log) | 95%CI | 順位安定度 | r(raw) | n | 強さ |")
+        _a("|------|--------|-------|-----------|--------|---|------|")
         for name, data in cause.items():
             rl = data["r_log_views"]
             rr = data["r_raw_views"]
             s = "強" if abs(rl) >= 0.6 else "中" if abs(rl) >= 0.3 else "弱"
-            _a(f"| {name} | {rl:+.3f} | {rr:+.3f} | {data['n']} | {s} |")
+            _a(
+                f"| {name} | {rl:+.3f} | {_fmt_ci(data.get('ci95_r_log_views'))} | "
+                f"{_fmt_stability(data.get('rank_stability'))} | {rr:+.3f} | {data['n']} | {s} |"
+            )
+
+    # 並べ替え重要度（予測モデルへの寄与）
+    importance = model.get("feature_importance") or {}
+    if importance.get("metrics"):
+        _a("\n### 並べ替え重要度（原因指標の予測モデルへの寄与）")
+        _a(
+            f"\n> 予測モデル（§1 のリッジ回帰）を固定し、1指標ずつ値を{importance['repeats']:,}回シャッフルしたときの"
+            f"Brier スコアの悪化量（基準 {importance['base_loss']:.4f}）。他の指標を知ったうえでの寄与を表す。"
+        )
+        _a("\n| 指標 | 重要度 | 95%区間 | 基準比 |")
+        _a("|------|--------|--------|--------|")
+        for name, data in importance["metrics"].items():
+            lo, hi = data["ci95"]
+            rel = f"{data['relative'] * 100:+.1f}%" if data["relative"] is not None else "-"
+            _a(f"| {name} | {data['importance']:+.4f} | [{lo:+.4f}, {hi:+.4f}] | {rel} |")
 
     _a("\n### 結果指標（参考: これらは「伸びた結果」であり予測因子ではない）")
     effect = correlations.get("effect_metrics", {})
     if effect:
-        _a("\n| 指標 | r(log) | r(raw) | n |")
-        _a("|------|--------|--------|---|")
+        _a("\n| 指標 | r(log) | 95%CI | 順位安定度 | r(raw) | n |")
+        _a("|------|--------|-------|-----------|--------|---|")
         for name, data in effect.items():
             _a(
                 f"| {name} | {data['r_log_views']:+.3f} | "
+                f"{_fmt_ci(data.get('ci95_r_log_views'))} | "
+                f"{_fmt_stability(data.get('rank_stability'))} | "
                 f"{data['r_raw_views']:+.3f} | {data['n']} |"
             )
 
+    # 順位相関・偏相関
+    rank_corr = model.get("rank_correlations", {})
+    partial = model.get("partial_correlations", {})
+    rank_cause = rank_corr.get("cause_metrics", {})
+    if rank_cause:
+        partial_cause = partial.get("cause_metrics", {})
+        controls = "・".join(partial.get("controls", []))
+        _a("\n### 順位相関・偏相関（原因指標）")
+        _a(
+            "\n> 再生数の裾の重さに頑健な Spearman / Kendall と、"
+            f"{controls}を統制した偏相関（ピアソン / 順位）"
+        )
+        _a("\n| 指標 | Spearman | Kendall τ | 偏r | 偏Spearman | n(偏) |")
+        _a("|------|----------|-----------|-----|-----------|-------|")
+        for name, data in rank_cause.items():
+            p = partial_cause.get(name)
+            pr = f"{p['partial_r']:+.3f}" if p else "-"
+            ps = f"{p['partial_spearman']:+.3f}" if p else "-"
+            pn = p["n"] if p else "-"
+            _a(
+                f"| {name} | {data['spearman']:+.3f} | {data['kendall_tau']:+.3f} | "
+                f"{pr} | {ps} | {pn} |"
+            )
+
+    # ROC / AUC（全数値指標）
+    roc_cols = (model.get("roc") or {}).get("columns", {})
+    if roc_cols:
+        _a("\n### ROC / AUC（HIT判別力、全数値指標の上位15）")
+        _a(
+            "\n> 各指標を1回ソートして全閾値の感度・偽陽性率を計算。"
+            "向き「低」は値が小さいほどHIT（値 <= 閾値 でHIT判定）。※は結果指標（予測因子ではない）。"
+        )
+        _a("\n| 指標 | AUC | 向き | Youden閾値 | 感度 | 偽陽性率 | 適合率 | n |")
+        _a("|------|-----|------|-----------|------|---------|--------|---|")
+        for key, c in list(roc_cols.items())[:15]:
+            y = c["youden"]
+            direction = "高" if c["direction"] == "higher" else "低"
+            _a(
+                f"| {key}{' ※' if c.get('effect') else ''} | {c['auc']:.3f} | {direction} | {y['threshold']:g} | "
+                f"{y['tpr'] * 100:.0f}% | {y['fpr'] * 100:.0f}% | {y['precision'] * 100:.0f}% | {c['n']} |"
+            )
+
     # --- 4. パターン分析 ---
     patterns = model.get("patterns", {})
     _a("\n## 4. 台本構造パターン分析")
@@ -166,6 +336,13 @@ def generate_report(model, records):
             f"平均{p['without_avg']:,}回 (中央値{p['without_median']:,})"
         )
         _a(f"- 倍率: {p['ratio']}倍 / log差: {p['log_diff']}")
+        sig = p.get("significance")
+        if sig and sig.get("p_value") is not None:
+            method = "全列挙" if sig["method"] == "exact" else "モンテカルロ"
+            _a(
+                f"- HIT率の偏り（並べ替え検定・{method}）: p={sig['p_value']:.4f}, "
+                f"q={sig['q_value']:.4f}{' **有意**' if sig['significant'] else ''}"
+            )
 
     fraud = patterns.get("hook_fraud_cases", [])
     if fraud:
@@ -177,6 +354,28 @@ def generate_report(model, records):
             )
             _a(f"- {f['artist']}: {f['views']:,}回 (Day1→Day2: {d2})")
 
+    # 連言ルールマイニング
+    mining = model.get("rule_mining") or {}
+    if mining.get("rules"):
+        _a("\n### 連言ルール（HIT率のリフト上位）")
+        _a(
+            f"\n> 特徴量を分位点で{mining['items']}個の条件に二値化し、最大3個のANDを網羅的に探索"
+            f"（{mining['explored']:,}通り、支持度{mining['min_support']}本以上）。"
+            f"全体のHIT率 {mining['base_hit_rate'] * 100:.0f}%。"
+            f"q値は上位のルールだけでなく探索した{mining['explored']:,}通り全体で BH 補正した値。"
+            "golden_theory への採否は人間が判断する。"
+        )
+        _a("\n| ID | 条件 | HIT充足 | MISS充足 | リフト等 | 弁別力 | q値 |")
+        _a("|----|------|--------|---------|---------|--------|-----|")
+        for rule in mining["rules"]:
+            h, m = rule["hit_fulfillment"], rule["miss_fulfillment"]
+            q = rule["significance"].get("q_value")
+            _a(
+                f"| {rule['id']} | {rule['condition']} | {h['count']}/{h['total']} | "
+                f"{m['count']}/{m['total']} | {rule['notes']} | {rule['discriminative_power']} | "
+                f"{f'{q:.4f}' if q is not None else '-'} |"
+            )
+
     # --- 5. グループ比較 ---
     _a("\n## 5. 伸びた vs 伸びてない 比較")
     for label, stats in model.get("group_comparisons", {}).items():
@@ -189,8 +388,84 @@ def generate_report(model, records):
             else:
                 _a(f"| {k} | {v:,} |")
 
+    # Day1-7 流入元構成の推移
+    trajectory = model.get("traffic_trajectory") or {}
+    if trajectory.get("features"):
+        days = trajectory["days"]
+        algo = "+".join(trajectory["algorithm_sources"])
+        _a(f"\n### Day1-{days} 流入元構成の推移")
+        _a(
+            f"\n> Day{days}まで流入元データが揃った{trajectory['eligible_count']}本で比較。"
+            f"アルゴリズム移行日 = {algo} の構成比が SUBSCRIBER を初めて上回った日"
+            f"（{days}日以内に上回らなければ Day{days + 1} として扱う）。"
+            f"\n> 移行した割合: HIT {_rate(trajectory['takeover_rate']['HIT'])} / "
+            f"MISS {_rate(trajectory['takeover_rate']['MISS'])}"
+        )
+        _a("\n| 指標 | 本数 | r(HIT) | HIT平均 | MISS平均 | p値 | q値 |")
+        _a("|------|------|--------|--------|---------|-----|-----|")
+        for name, f in trajectory["features"].items():
+            sig = f["significance"]
+            mark = " **有意**" if sig["significant"] else ""
+            _a(
+                f"| {name} | {f['count']} | {_num(f['r_hit'], '+.3f')} | {_num(f['hit_mean'])} | {_num(f['miss_mean'])} "
+                f"| {_num(sig['p_value'], '.4f')} | {_num(sig['q_value'], '.4f')}{mark} |"
+            )
+        curves = trajectory["mean_share_curves"]
+        if curves.get("HIT") and curves.get("MISS"):
+            _a(f"\n| 流入元 | 群 | " + " | ".join(f"Day{d}" for d in range(1, days + 1)) + " |")
+            _a("|--------|----|" + "------|" * days)
+            for source in trajectory["sources"]:
+                for group in ("HIT", "MISS"):
+                    cells = " | ".join(
+                        f"{x:.1f}%" if x is not None else "-" for x in curves[group][source]
+                    )
+                    _a(f"| {source} | {group} | {cells} |")
+
+    # 関連動画流入グラフ
+    graph = model.get("related_graph") or {}
+    if graph.get("edges"):
+        names = {r["video_id"]: r["artist"] or r["video_id"] for r in records}
+        share = graph["in_channel_share"]
+        _a("\n### 関連動画流入グラフ")
+        _a(
+            f"\n> 流入元動画 → 自チャンネル動画 の重み付きグラフ（重み = 関連動画経由の再生数）。"
+            f"ノード{graph['nodes']} / 辺{graph['edges']}、外部の流入元 {graph['external_feeders']}本。"
+            f"\n> 自チャンネル内からの流入比率: {f'{share * 100:.1f}%' if share is not None else '-'}"
+        )
+        ranked = sorted(graph["videos"].items(), key=lambda x: x[1]["pagerank"], reverse=True)
+        _a("\n| # | アーティスト | 関連動画経由 | チャンネル内比率 | PageRank | 判定 |")
+        _a("|---|------------|------------|---------------|----------|------|")
+        hit_by_id = {r["video_id"]: r["is_hit"] for r in records}
+        for i, (vid, g) in enumerate(ranked, 1):
+            inside = f"{g['in_channel_share'] * 100:.0f}%" if g["in_channel_share"] is not None else "-"
+            hit = "HIT" if hit_by_id.get(vid) else "-"
+            _a(f"| {i} | {names.get(vid, vid)} | {g['related_views']:,} | {inside} | {g['pagerank']:.2f} | {hit} |")
+        if graph.get("top_feeders"):
+            _a("\n**主な流入元動画**")
+            for f in graph["top_feeders"]:
+                where = "チャンネル内: " + names.get(f["video_id"], f["video_id"]) if f["in_channel"] else f["video_id"]
+                _a(f"- {where}: {f['views_sent']:,}回 → {f['targets']}本")
+        if graph.get("communities"):
+            _a(f"\n**流入コミュニティ**（{graph['community_count']}群中 上位{len(graph['communities'])}）")
+            for c in graph["communities"]:
+                members = ", ".join(names.get(v, v) for v in c["videos"])
+                _a(f"- {members}（外部流入元 {c['feeders']}本, 群内 {c['internal_views']:,}回）")
+
     # --- 6. ベンチマーク ---
     _a("\n## 6. ベンチマーク")
+    tiers = model.get("benchmark_tiers") or {}
+    bounds = tiers.get("bounds") or {}
+    if bounds:
+        labels = {"views": "再生数", "views_per_day": "日あたり再生数", "eventual_views": "予測再生数"}
+        _a(
+            f"\n> ティアは固定の再生数でなく、{tiers['sketch_size']}本の分布（分位点スケッチ）の上位からの帯で決める。"
+            "step13 の PDCA 評価も同じスケッチで判定する。"
+        )
+        names = list(tiers["quantiles"])
+        _a("\n| 指標 | " + " | ".join(f"{n} 下限" for n in names[:-1]) + " |")
+        _a("|------|" + "------|" * (len(names) - 1))
+        for metric, b in bounds.items():
+            _a(f"| {labels.get(metric, metric)} | " + " | ".join(f"{b[n]:,.0f}" for n in names[:-1]) + " |")
     for tier, data in model.get("benchmarks", {}).items():
         _a(f"\n### {tier} ({data['count']}本, 平均{data['avg_views']:,}回)")
         for v in data["videos"]:
@@ -280,8 +555,89 @@ def generate_report(model, records):
                 f"{gi_ca_s} | {hit} |"
             )
 
-    # --- 9. 核心的インサイト ---
-    _a("\n## 9. 核心的インサイト")
+    # 減衰カーブ予測（若い動画の HIT/MISS 誤分類の補正）
+    projection = model.get("projection") or {}
+    if projection.get("projected_count"):
+        pooled = projection.get("pooled_exponent") or {}
+        horizons = projection.get("horizons", [])
+        _a(f"\n### 減衰カーブによる将来再生数の予測（代替ラベル）")
+        _a(
+            f"\n> ピーク日以降の日別再生数を べき乗減衰 v(t)=A·t^(-b) で当てはめ、"
+            f"{'/'.join(str(h) for h in horizons)}日時点の累計を予測。"
+            f"ピーク後のデータが足りない動画はプール値 b={pooled.get('b', '-')} を使用。"
+            f"\n> 予測HIT = {projection['label_horizon']}日時点の予測（現在値を下限）が閾値以上。"
+            f"現ラベルとの一致率: {projection['label_agreement'] * 100:.0f}%"
+            f"（{projection['projected_count']}本中、個別当てはめ {projection['fit_count']}本）"
+        )
+        proj_records = sorted(
+            (r for r in records if r.get("projection_method")),
+            key=lambda r: r["eventual_views"], reverse=True,
+        )
+        header = " | ".join(f"{h}日予測 (95%幅)" for h in horizons)
+        _a(f"\n| # | アーティスト | 再生数 | 経過日数 | {header} | 手法 | 判定 | 予測判定 |")
+        _a("|---|------------|--------|---------|" + "------|" * len(horizons) + "------|------|---------|")
+        for i, r in enumerate(proj_records, 1):
+            cells = " | ".join(
+                f"{r[f'projected_views_{h}']:,} ({r[f'projected_views_{h}_low']:,}–{r[f'projected_views_{h}_high']:,})"
+                for h in horizons
+            )
+            hit = "HIT" if r["is_hit"] else "-"
+            p_hit = "HIT" if r["projected_hit"] else "-"
+            flag = " ⚠" if r["projected_hit"] != r["is_hit"] else ""
+            _a(
+                f"| {i} | {r['artist']} | {r['views']:,} | {r.get('age_days', '-')} | "
+                f"{cells} | {r['projection_method']} | {hit} | {p_hit}{flag} |"
+            )
+
+    # --- 9. 視聴者層プロファイル ---
+    audience = model.get("audience") or {}
+    if audience.get("profiled_count"):
+        names = {r["video_id"]: r["artist"] or r["video_id"] for r in records}
+        _a("\n## 9. 視聴者層プロファイル")
+        _a(
+            f"\n> 年齢層×性別の視聴者割合を合計1に正規化したプロファイル（{audience['profiled_count']}本）を "
+            f"k-means でクラスタリング。"
+        )
+        _a("\n| クラスタ | 本数 | HIT率 | 推定平均年齢 | " + " | ".join(
+            a.replace("age", "") for a in next(iter(audience["clusters"]))["age_shares"]
+        ) + " |")
+        _a("|---------|------|-------|------------|" + "------|" * len(next(iter(audience["clusters"]))["age_shares"]))
+        for c in audience["clusters"]:
+            shares = " | ".join(f"{x:.1f}%" for x in c["age_shares"].values())
+            _a(f"| {c['name']} | {c['size']} | {c['hit_rate'] * 100:.0f}% | {c['mean_age']} | {shares} |")
+
+        drift = audience.get("drift") or {}
+        if drift.get("mean_age_slope_per_year") is not None:
+            _a(f"\n### 公開日に沿った推移（{drift['first_published']} 〜 {drift['last_published']}）")
+            _a(
+                f"- 推定平均年齢: 前半 {drift['early_mean_age']}歳 → 後半 {drift['late_mean_age']}歳 "
+                f"（傾き {drift['mean_age_slope_per_year']:+.2f}歳/年）"
+            )
+            for age, slope in drift["age_share_slope_per_year"].items():
+                if slope is not None:
+                    _a(f"- {age.replace('age', '')}: {slope:+.2f}pt/年")
+
+        shifted = sorted(
+            (r for r in records if r.get("audience_shift") is not None),
+            key=lambda r: r["audience_shift"], reverse=True,
+        )[:5]
+        if shifted:
+            _a("\n### 直前の動画群から視聴者層が大きくずれた動画")
+            for r in shifted:
+                hit = "HIT" if r["is_hit"] else "MISS"
+                _a(
+                    f"- {names[r['video_id']]} ({r['published_at']}, {hit}): ずれ {r['audience_shift']:.4f} / "
+                    f"平均年齢 {r['audience_mean_age']}歳 / {r['audience_cluster']}"
+                )
+
+        if audience.get("similar_pairs"):
+            _a("\n### 視聴者層が最も似ている動画の組")
+            for p in audience["similar_pairs"]:
+                a, b = p["videos"]
+                _a(f"- {names.get(a, a)} ⇔ {names.get(b, b)}: コサイン類似度 {p['similarity']:.4f}")
+
+    # --- 10. 核心的インサイト ---
+    _a("\n## 10. 核心的インサイト")
     _a(
         "\n### 第一原理から導かれる因果関係\n"
         "```\n"
@@ -301,8 +657,8 @@ def generate_report(model, records):
         "- **分析**: 総再生数ではなくVPD（日あたり再生数）で動画パフォーマンスを評価"
     )
 
-    # --- 10. データ品質 ---
-    _a("\n## 10. データ品質")
+    # --- 11. データ品質 ---
+    _a("\n## 11. データ品質")
     human_n = sum(1 for r in records if r.get("score_source") == "human")
     ai_cal_n = sum(1 for r in records if r.get("score_source") == "ai_calibrated")
     quant_n = sum(1 for r in records if r.get("score_source") == "quantitative")
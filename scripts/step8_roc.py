@@ -0,0 +1,86 @@
+"""
+Step 8 サブモジュール: 数値指標ごとの ROC / 閾値スイープ
+
+レコード表の全数値列について HIT/MISS の ROC 曲線・AUC・Youden 最適閾値を求める
+（common.roc で列ごとに1回ソート）。AUC < 0.5 の列は「値が小さいほど HIT」とみなし、
+符号を反転してから曲線と最適閾値を求める（direction = "lower"、値 <= 閾値 で HIT 判定）。
+
+再生数そのもの・再生数から作った予測値などラベルと同じ情報を持つ列は除外する。
+"""
+
+from common.roc import roc_sweep, compact_curve
+from step8_patterns import EFFECT_METRIC_DEFS
+
+
+MIN_ROC_SAMPLES = 8   # これ未満の有効本数の列は扱わない
+# ラベル（再生数 >= 閾値）と同じ情報を持つ列
+LABEL_DERIVED = {"views", "log_views", "views_per_day", "log_vpd", "eventual_views", "likes_total", "comments_total"}
+LABEL_DERIVED_PREFIXES = ("projected_",)
+EFFECT_KEYS = {key for _, key in EFFECT_METRIC_DEFS} | {"day1_views", "day2_views", "day7_total"}
+
+
+def _numeric_columns(records):
+    cols = []
+    for r in records:
+        for key, val in r.items():
+            if key in cols or key in LABEL_DERIVED or key.startswith(LABEL_DERIVED_PREFIXES):
+                continue
+            if isinstance(val, (int, float)) and not isinstance(val, bool):
+                cols.append(key)
+    return cols
+
+
+def column_roc(records, key):
+    """1列の ROC。データ不足なら None"""
+    rows = [
+        (r[key], r["is_hit"]) for r in records
+        if isinstance(r.get(key), (int, float)) and not isinstance(r[key], bool)
+    ]
+    if len(rows) < MIN_ROC_SAMPLES:
+        return None
+    scores, labels = zip(*rows)
+    roc = roc_sweep(scores, labels)
+    if roc is None:
+        return None
+    direction = "higher"
+    if roc["auc"] < 0.5:
+        direction = "lower"
+        roc = roc_sweep([-s for s in scores], labels)
+    y = roc["youden"]
+    # 向きを元の値に戻す（lower の場合は「値 <= 閾値 なら HIT」）
+    sign = 1 if direction == "higher" else -1
+    threshold = sign * y["threshold"]
+    points = [(sign * p[0] if p[0] is not None else None,) + p[1:] for p in roc["points"]]
+    return {
+        "n": roc["n"],
+        "positives": roc["positives"],
+        "auc": round(roc["auc"], 3),
+        "direction": direction,
+        "youden": {
+            "threshold": threshold,
+            "tpr": round(y["tpr"], 3),
+            "fpr": round(y["fpr"], 3),
+            "precision": round(y["precision"], 3),
+            "j": round(y["j"], 3),
+        },
+        "curve": compact_curve(points, keep=(threshold,)),
+    }
+
+
+def compute_roc_sweeps(records):
+    """全数値列の ROC を AUC の降順で返す。
+
+    戻り値: {"label": "is_hit", "columns": {列名: column_roc() の結果}}
+    """
+    columns = {}
+    for key in _numeric_columns(records):
+        result = column_roc(records, key)
+        if result is not None:
+            # 結果指標（伸びた「結果」として増える値）は判別力が高くても予測因子ではない
+            result["effect"] = key in EFFECT_KEYS
+            columns[key] = result
+    return {
+        "label": "is_hit",
+        "min_samples": MIN_ROC_SAMPLES,
+        "columns": dict(sorted(columns.items(), key=lambda x: (-x[1]["auc"], x[0]))),
+    }
@@ -0,0 +1,255 @@
+"""
+Step 8 サブモジュール: 連言ルールの網羅的マイニング
+
+レコード表の各特徴量を真偽の「アイテム」に二値化し（数値は分位点での上下、
+真偽値はそのまま、カテゴリは値ごと）、動画集合のビットセットで表す。
+Eclat 方式の深さ優先探索でアイテムの AND（最大 MAX_DEPTH 個）を列挙し、
+  - 支持度（条件を満たす動画数）が MIN_SUPPORT 未満
+  - HIT 側の支持度（条件を満たす HIT 数）が MIN_HIT_SUPPORT 未満
+の枝は、拡張してもこれ以上増えないので打ち切る（どちらも反単調）。
+残ったルールを HIT 率のリフト（HIT率 / 全体のHIT率）で順位付けし、
+上位を golden_theory のチェックリストと同じ形式で返す。
+
+有意性は探索した全ルールを検定の族とする。上位だけを選んだ後にその中で FDR 補正すると
+選択の効果が消えないため、探索中の (支持度, HIT数) を数えておき、各ルールの正確な
+並べ替え検定の p 値（ラベルの全順列に対する HIT 数の分布 = 超幾何分布の上側確率）に
+探索した全ルール数で BH 補正をかける。
+"""
+
+import math
+
+from common.bitsets import to_bitset, popcount
+from step8_permutation import SIGNIFICANCE_ALPHA
+from step8_roc import LABEL_DERIVED, LABEL_DERIVED_PREFIXES, EFFECT_KEYS
+
+
+RULE_QUANTILES = (0.25, 0.5, 0.75)   # 数値特徴量の二値化に使う分位点
+MAX_DEPTH = 3                        # 連言に含めるアイテム数の上限
+MIN_SUPPORT_RATE = 0.1               # 支持度の下限（全動画に対する割合）
+MIN_SUPPORT = 3                      # 支持度の下限（本数）
+MIN_HIT_SUPPORT = 3                  # 条件を満たす HIT 数の下限
+MIN_CONFIDENCE = 0.6                 # 採用するルールの HIT 率の下限
+MAX_RULES = 10                       # 返すルール数
+# 個別のリフトが小さいアイテムは深い連言の材料にしない（探索量を抑える）
+MIN_ITEM_LIFT = 1.0
+MAX_EXTEND_ITEMS = 80
+# 識別子的・ラベル的で条件に使わない列
+SKIP_FIELDS = {"video_id", "artist", "published_at", "is_hit", "projected_hit", "score_source"}
+
+
+# ===========================================================================
+#  二値化
+# ===========================================================================
+
+def _quantile(sorted_vals, q):
+    return sorted_vals[min(len(sorted_vals) - 1, int(q * len(sorted_vals)))]
+
+
+def _usable(key):
+    return not (
+        key in SKIP_FIELDS or key in LABEL_DERIVED or key in EFFECT_KEYS
+        or key.startswith(LABEL_DERIVED_PREFIXES)
+    )
+
+
+def build_items(records):
+    """[(アイテム, ビットセット)] を返す。アイテムは {"field", "op", "value"}。
+    同じ動画集合になるアイテムは最初の1つだけ残す。
+    """
+    fields = []
+    for r in records:
+        for key in r:
+            if key not in fields and _usable(key):
+                fields.append(key)
+
+    items, seen = [], set()
+
+    def _add(item, bits):
+        if bits and bits not in seen:
+            seen.add(bits)
+            items.append((item, bits))
+
+    for key in fields:
+        vals = [r.get(key) for r in records if r.get(key) is not None]
+        if not vals:
+            continue
+        if all(isinstance(v, bool) for v in vals):
+            _add({"field": key, "op": "==", "value": True}, to_bitset(r.get(key) is True for r in records))
+            _add({"field": key, "op": "==", "value": False}, to_bitset(r.get(key) is False for r in records))
+        elif all(isinstance(v, (int, float)) for v in vals):
+            ordered = sorted(vals)
+            for cut in sorted({_quantile(ordered, q) for q in RULE_QUANTILES}):
+                _add({"field": key, "op": ">=", "value": cut},
+                     to_bitset(r.get(key) is not None and r[key] >= cut for r in records))
+                _add({"field": key, "op": "<", "value": cut},
+                     to_bitset(r.get(key) is not None and r[key] < cut for r in records))
+        elif all(isinstance(v, str) for v in vals):
+            for value in sorted(set(vals)):
+                _add({"field": key, "op": "==", "value": value}, to_bitset(r.get(key) == value for r in records))
+    return items
+
+
+def rule_matches(rule, record):
+    """ルール（アイテムのリスト）を1レコードに適用する。値がない項目は不成立"""
+    for item in rule:
+        val = record.get(item["field"])
+        if val is None:
+            return False
+        if item["op"] == ">=" and not val >= item["value"]:
+            return False
+        if item["op"] == "<" and not val < item["value"]:
+            return False
+        if item["op"] == "==" and val != item["value"]:
+            return False
+    return True
+
+
+def describe_rule(rule):
+    parts = []
+    for item in rule:
+        value = item["value"]
+        if isinstance(value, bool):
+            parts.append(item["field"] if value else f"not {item['field']}")
+        elif isinstance(value, float):
+            parts.append(f"{item['field']} {item['op']} {value:g}")
+        else:
+            parts.append(f"{item['field']} {item['op']} {value}")
+    return " かつ ".join(parts)
+
+
+# ===========================================================================
+#  探索
+# ===========================================================================
+
+def classify_discriminative_power(diff, significant):
+    """HIT充足率 − MISS充足率 と並べ替え検定の結果から弁別力を判定する"""
+    if diff > 0.5 and significant:
+        return "high"
+    if diff > 0.2 and significant:
+        return "medium"
+    if diff > 0:
+        return "low"
+    return "none"
+
+
+def _hit_tail(n, n_hit, support, hits):
+    """ラベルの並べ替えで、支持度 support の条件に HIT が hits 本以上入る確率（正確）"""
+    total = math.comb(n, support)
+    return sum(
+        math.comb(n_hit, k) * math.comb(n - n_hit, support - k)
+        for k in range(hits, min(n_hit, support) + 1)
+    ) / total
+
+
+def _search_fdr(tally, n, n_hit):
+    """探索した全ルールを族とする BH 法。tally は {(支持度, HIT数): ルール数}。
+    戻り値: {(支持度, HIT数): (p値, q値)}
+    """
+    pvals = {pair: _hit_tail(n, n_hit, *pair) for pair in tally}
+    m = sum(tally.values())
+    ordered = sorted(pvals, key=lambda pair: pvals[pair])
+    ranks, rank = [], 0
+    for pair in ordered:
+        rank += tally[pair]   # 同じ p 値のルールはまとめて順位を進める
+        ranks.append(rank)
+    out, prev = {}, 1.0
+    for pair, rank in reversed(list(zip(ordered, ranks))):
+        prev = min(prev, pvals[pair] * m / rank)
+        out[pair] = (pvals[pair], prev)
+    return out
+
+
+def mine_rules(records, max_depth=MAX_DEPTH):
+    """連言ルールを列挙し、リフト順の上位を返す。
+
+    戻り値: {"items", "explored", "min_support", "base_hit_rate", "rules": [チェックリスト形式]}
+    """
+    n = len(records)
+    label = to_bitset(r["is_hit"] for r in records)
+    n_hit = popcount(label)
+    result = {"items": 0, "explored": 0, "min_support": 0, "base_hit_rate": None, "rules": []}
+    if n < 3 or not n_hit or n_hit == n:
+        return result
+
+    base = n_hit / n
+    min_support = max(MIN_SUPPORT, int(MIN_SUPPORT_RATE * n + 0.5))
+    items = [
+        (item, bits) for item, bits in build_items(records)
+        if popcount(bits) >= min_support and popcount(bits & label) >= MIN_HIT_SUPPORT
+    ]
+    # 深い連言の材料は個別リフトの大きいアイテムに絞る
+    lift_of = [popcount(bits & label) / popcount(bits) / base for _, bits in items]
+    order = sorted(range(len(items)), key=lambda i: -lift_of[i])
+    position = {i: k for k, i in enumerate(order)}
+    extend = [i for i in order if lift_of[i] >= MIN_ITEM_LIFT][:MAX_EXTEND_ITEMS]
+
+    found = []   # (リフト, 支持度, インデックスのタプル, tidset)
+    explored = 0
+    tally = {}   # (支持度, HIT数) → 探索したルール数（探索全体での多重比較補正に使う）
+    stack = [((i,), items[i][1]) for i in order]
+    while stack:
+        idx, tids = stack.pop()
+        explored += 1
+        support = popcount(tids)
+        hits = popcount(tids & label)
+        tally[(support, hits)] = tally.get((support, hits), 0) + 1
+        conf = hits / support
+        if conf >= MIN_CONFIDENCE and conf > base:
+            found.append((conf / base, support, idx, tids))
+        if len(idx) >= max_depth:
+            continue
+        fields = {items[i][0]["field"] for i in idx}
+        last = position[idx[-1]]
+        for j in extend:
+            if position[j] <= last or items[j][0]["field"] in fields:
+                continue
+            nxt = tids & items[j][1]
+            if popcount(nxt) >= min_support and popcount(nxt & label) >= MIN_HIT_SUPPORT:
+                stack.append((idx + (j,), nxt))
+
+    # リフト → 支持度 → 短い順。上位のルールと動画集合が同じ・より長いだけのルールは除く
+    found.sort(key=lambda x: (-x[0], -x[1], len(x[2]), x[2]))
+    kept, kept_tids = [], set()
+    for lift, support, idx, tids in found:
+        if tids in kept_tids:
+            continue
+        kept_tids.add(tids)
+        kept.append((lift, support, idx, tids))
+        if len(kept) >= MAX_RULES:
+            break
+
+    search_fdr = _search_fdr(tally, n, n_hit)
+    rules = []
+    for rank, (lift, support, idx, tids) in enumerate(kept, 1):
+        p, q = search_fdr[(support, popcount(tids & label))]
+        sig = {
+            "p_value": round(p, 6),
+            "method": "exact_search_fdr",
+            "tests": explored,
+            "q_value": round(q, 4),
+            "significant": q < SIGNIFICANCE_ALPHA,
+        }
+        rule = [items[i][0] for i in idx]
+        hit_rate = popcount(tids & label) / n_hit
+        miss_rate = popcount(tids & ~label) / (n - n_hit)
+        rules.append({
+            "id": f"R{rank}",
+            "condition": describe_rule(rule),
+            "rule": rule,
+            "hit_fulfillment": {"count": popcount(tids & label), "total": n_hit, "rate": round(hit_rate, 3)},
+            "miss_fulfillment": {"count": popcount(tids & ~label), "total": n - n_hit, "rate": round(miss_rate, 3)},
+            "discriminative_power": classify_discriminative_power(hit_rate - miss_rate, sig["significant"]),
+            "status": "candidate",
+            "data_category": "mined",
+            "significance": sig,
+            "notes": f"リフト {lift:.2f} / 支持度 {support}本 / HIT率 {popcount(tids & label) / support:.0%}",
+        })
+
+    result.update({
+        "items": len(items),
+        "explored": explored,
+        "min_support": min_support,
+        "base_hit_rate": round(base, 3),
+        "rules": rules,
+    })
+    return result
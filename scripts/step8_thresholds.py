@@ -0,0 +1,179 @@
+"""
+Step 8 サブモジュール: 3段階フィルターの閾値最適化
+
+F1(CTR) / F2(Day1→Day2) / F3(平均視聴時間・エンゲージメント率) の4つの閾値を
+同時にグリッド探索する。各閾値候補の「通過」をビットセット(int)で持ち、
+  脱落 = (データあり & ~通過) を F1・F2 の組、F3 の組でそれぞれ前計算し、
+  全組み合わせの 予測HIT / 正解 を OR・AND と popcount だけで集計する。
+
+  - 候補: 観測値の分位点（最大 MAX_CANDIDATES 個）+ 現行値 + 無効（その条件を使わない）
+  - 選択: 正解率が最大の組（同率なら現行値に近い候補順）
+  - 汎化: 1本抜き交差検証（LOO）。抜いた1本を除いた正解率で組を選び直し、その1本を判定する
+  - 安定度: LOO の各回で選ばれた閾値が全データでの最適値と一致した割合
+  - パレート最適: HIT検出率（感度）と MISS除外率（特異度）のどちらも劣らない組
+"""
+
+from itertools import product
+
+from common.bitsets import to_bitset, popcount, full_mask
+from step8_filters import FILTER_THRESHOLDS
+
+
+MAX_CANDIDATES = 12   # 1軸あたりの分位点候補数（現行値・無効は別）
+MAX_PARETO = 10       # model.json に保存するパレート最適な組の数
+
+# (閾値キー, レコードのフィールド, 「より大きい」で判定するか)
+THRESHOLD_AXES = [
+    ("f1_ctr", "browsing_ctr", False),
+    ("f2_change", "day1_day2_change", True),
+    ("f3_duration", "avg_view_duration", False),
+    ("f3_engagement", "engagement_rate", False),
+]
+
+
+# ===========================================================================
+#  候補とビットセット
+# ===========================================================================
+
+def _candidates(values, current):
+    """閾値候補: 現行値 → 分位点（昇順）→ 無効(None)。データがない軸は現行値のみ"""
+    uniq = sorted(set(values))
+    if not uniq:
+        return [current]
+    if len(uniq) > MAX_CANDIDATES:
+        step = (len(uniq) - 1) / (MAX_CANDIDATES - 1)
+        uniq = sorted({uniq[round(i * step)] for i in range(MAX_CANDIDATES)})
+    return [current] + [x for x in uniq if x != current] + [None]
+
+
+def _axis_bits(records, field, strict, candidates, n):
+    """(データありのビット, [候補ごとの通過ビット]) を返す"""
+    has = to_bitset(r.get(field) is not None for r in records)
+    passes = []
+    for t in candidates:
+        if t is None:
+            passes.append(full_mask(n))
+        elif strict:
+            passes.append(to_bitset(r.get(field) is not None and r[field] > t for r in records))
+        else:
+            passes.append(to_bitset(r.get(field) is not None and r[field] >= t for r in records))
+    return has, passes
+
+
+# ===========================================================================
+#  グリッド評価
+# ===========================================================================
+
+def _evaluate_grid(records):
+    """全組み合わせの (閾値, 予測HITビット, 正解ビット) を現行値優先の順で返す"""
+    n = len(records)
+    axes = {}
+    for key, field, strict in THRESHOLD_AXES:
+        cands = _candidates([r[field] for r in records if r.get(field) is not None], FILTER_THRESHOLDS[key])
+        axes[key] = (cands,) + _axis_bits(records, field, strict, cands, n)
+
+    c1, has1, pass1 = axes["f1_ctr"]
+    c2, has2, pass2 = axes["f2_change"]
+    cd, has_d, pass_d = axes["f3_duration"]
+    ce, has_e, pass_e = axes["f3_engagement"]
+    has3 = has_d & has_e
+    population = has1 | has2 | has3   # いずれかのフィルターを評価できる動画
+    label = to_bitset(r["is_hit"] for r in records) & population
+
+    fail12 = [
+        ((t1, t2), (has1 & ~p1) | (has2 & ~p2))
+        for (t1, p1), (t2, p2) in product(zip(c1, pass1), zip(c2, pass2))
+    ]
+    fail3 = [
+        ((td, te), has3 & ~(pd & pe))
+        for (td, pd), (te, pe) in product(zip(cd, pass_d), zip(ce, pass_e))
+    ]
+    grid = []
+    for (t12, f12), (t3, f3) in product(fail12, fail3):
+        pred = population & ~(f12 | f3)
+        correct = population & ~(pred ^ label)
+        grid.append((t12 + t3, pred, correct))
+    return grid, population, label
+
+
+def _stats(pred, correct, population, label):
+    pos = popcount(label)
+    neg = popcount(population) - pos
+    tp = popcount(pred & label)
+    tn = popcount(correct) - tp
+    return {
+        "accuracy": round(popcount(correct) / popcount(population), 3) if population else None,
+        "tpr": round(tp / pos, 3) if pos else None,
+        "tnr": round(tn / neg, 3) if neg else None,
+        "predicted_hits": popcount(pred),
+    }
+
+
+def _as_dict(thresholds):
+    return {key: t for (key, _, _), t in zip(THRESHOLD_AXES, thresholds)}
+
+
+def _pareto(grid, population, label):
+    """感度・特異度がともに劣らない組（点ごとに最初の組）を感度の降順で返す"""
+    points = {}
+    for thresholds, pred, correct in grid:
+        s = _stats(pred, correct, population, label)
+        points.setdefault((s["tpr"], s["tnr"]), (thresholds, s))
+    front = [
+        (pt, v) for pt, v in points.items()
+        if not any(
+            o[0] >= pt[0] and o[1] >= pt[1] and o != pt for o in points
+        )
+    ]
+    front.sort(key=lambda x: (-x[0][0], -x[0][1]))
+    return [dict(s, thresholds=_as_dict(t)) for _, (t, s) in front[:MAX_PARETO]]
+
+
+def _leave_one_out(grid, population):
+    """各動画を抜いた正解率で組を選び直して、その動画を判定する。
+    戻り値: (正解数, 評価本数, 各回で選ばれた閾値のリスト)
+    """
+    counts = [popcount(c) for _, _, c in grid]
+    hits, chosen = 0, []
+    i, bits = 0, population
+    while bits:
+        if bits & 1:
+            best, best_score = None, -1
+            for g, (thresholds, _, correct) in enumerate(grid):
+                score = counts[g] - ((correct >> i) & 1)
+                if score > best_score:
+                    best, best_score = g, score
+            hits += (grid[best][2] >> i) & 1
+            chosen.append(grid[best][0])
+        bits >>= 1
+        i += 1
+    return hits, len(chosen), chosen
+
+
+def optimize_filter_thresholds(records):
+    """4つの閾値を同時に最適化し、現行値との比較・LOO精度・パレート最適な組・安定度を返す"""
+    grid, population, label = _evaluate_grid(records)
+    evaluated = popcount(population)
+    if evaluated < 3:
+        return {"evaluated_count": evaluated, "error": "フィルターを評価できる動画が3本未満"}
+
+    best = max(range(len(grid)), key=lambda g: (popcount(grid[g][2]), -g))
+    best_thresholds = grid[best][0]
+    loo_hits, loo_n, chosen = _leave_one_out(grid, population)
+
+    stability = {
+        key: round(sum(1 for c in chosen if c[j] == best_thresholds[j]) / loo_n, 3)
+        for j, (key, _, _) in enumerate(THRESHOLD_AXES)
+    }
+    stability["all"] = round(sum(1 for c in chosen if c == best_thresholds) / loo_n, 3)
+
+    current = grid[0]   # 各軸の先頭候補は現行値
+    return {
+        "evaluated_count": evaluated,
+        "grid_size": len(grid),
+        "current": dict(_stats(current[1], current[2], population, label), thresholds=_as_dict(current[0])),
+        "best": dict(_stats(grid[best][1], grid[best][2], population, label), thresholds=_as_dict(best_thresholds)),
+        "loo_accuracy": round(loo_hits / loo_n, 3),
+        "stability": stability,
+        "pareto": _pareto(grid, population, label),
+    }
@@ -0,0 +1,196 @@
+"""
+Step 8 サブモジュール: Day1-7 流入元構成の推移分析
+
+流入元テンソル（common.traffic_tensor）から全動画の流入元別構成比カーブを
+流入元ごとに1回のスライスで取り出し、動画ごとに次の指標を求める。
+
+  - アルゴリズム移行日: おすすめ系（ブラウジング+関連動画）の構成比が
+    登録者の構成比を初めて上回った日（7日以内に上回らなければ None）
+  - 関連動画シェアの傾き: Day1-7 の関連動画構成比(%) を日に回帰した傾き（pt/日）
+  - Day1 / Day7 の各流入元の構成比
+
+これらを HIT/MISS と突き合わせ、点双列相関と「中央値以上」条件の並べ替え検定
+（両側、FDR補正）でコーパス全体の関係を見る。
+"""
+
+from common.metrics import avg, median, pearson
+from common.bitsets import to_bitset
+from common.traffic_tensor import TENSOR_DAYS, share_series
+from step8_permutation import permutation_pvalues, attach_fdr
+
+
+TRACKED_SOURCES = ("BROWSE", "RELATED", "SEARCH", "SUBSCRIBER")
+# 「アルゴリズムが引き継いだ」とみなす流入元。ブラウジングが単独で記録されない
+# データ（data/videos の traffic_breakdown に BROWSE が無い）でも判定できるよう関連動画を含める
+ALGORITHM_SOURCES = ("BROWSE", "RELATED")
+MIN_SLOPE_DAYS = 3   # 傾きの計算に必要な有効日数
+
+TRAJECTORY_FEATURES = [
+    ("アルゴリズム移行日", "algo_takeover_day"),
+    ("関連動画シェアの傾き(pt/日)", "related_share_slope"),
+    ("Day1 関連動画シェア(%)", "related_share_day1"),
+    ("Day7 関連動画シェア(%)", "related_share_day7"),
+    ("Day1 登録者シェア(%)", "subscriber_share_day1"),
+    ("Day7 登録者シェア(%)", "subscriber_share_day7"),
+    ("Day1 検索シェア(%)", "search_share_day1"),
+    ("Day7 検索シェア(%)", "search_share_day7"),
+]
+
+
+# ===========================================================================
+#  動画ごとの指標
+# ===========================================================================
+
+def _slope(values):
+    """(日, 値) の最小二乗傾き。有効日数が足りなければ None"""
+    pts = [(t, v) for t, v in enumerate(values, 1) if v is not None]
+    if len(pts) < MIN_SLOPE_DAYS:
+        return None
+    mt = sum(t for t, _ in pts) / len(pts)
+    mv = sum(v for _, v in pts) / len(pts)
+    sxx = sum((t - mt) ** 2 for t, _ in pts)
+    return sum((t - mt) * (v - mv) for t, v in pts) / sxx
+
+
+def _takeover_day(algo, subscriber):
+    """おすすめ系の構成比が登録者を初めて上回った日"""
+    for day, (a, s) in enumerate(zip(algo, subscriber), 1):
+        if a is not None and s is not None and a > s:
+            return day
+    return None
+
+
+def _pct(share):
+    return round(share * 100, 1) if share is not None else None
+
+
+def compute_trajectories(traffic):
+    """全動画の構成比カーブと派生指標を一括で計算する。
+
+    戻り値: {動画ID: {"shares": {流入元: [Day1..7 の構成比(%)]}, 指標名: 値, ...}}
+    """
+    shares = {s: share_series(traffic, s) for s in TRACKED_SOURCES}
+    out = {}
+    for vid in traffic["videos"]:
+        curves = {s: [_pct(x) for x in shares[s][vid]] for s in TRACKED_SOURCES}
+        if not any(x is not None for x in curves["SUBSCRIBER"]):
+            out[vid] = None
+            continue
+        algo = [
+            sum(shares[s][vid][d] for s in ALGORITHM_SOURCES)
+            if shares["SUBSCRIBER"][vid][d] is not None else None
+            for d in range(traffic["days"])
+        ]
+        slope = _slope(curves["RELATED"])
+        last = traffic["days"] - 1
+        out[vid] = {
+            "shares": curves,
+            "algo_takeover_day": _takeover_day(algo, shares["SUBSCRIBER"][vid]),
+            "related_share_slope": round(slope, 2) if slope is not None else None,
+            "related_share_day1": curves["RELATED"][0],
+            "related_share_day7": curves["RELATED"][last],
+            "subscriber_share_day1": curves["SUBSCRIBER"][0],
+            "subscriber_share_day7": curves["SUBSCRIBER"][last],
+            "search_share_day1": curves["SEARCH"][0],
+            "search_share_day7": curves["SEARCH"][last],
+        }
+    return out
+
+
+# ===========================================================================
+#  HIT/MISS との関係
+# ===========================================================================
+
+def _mean_curves(items):
+    """動画群の流入元別平均構成比カーブ"""
+    curves = {}
+    for s in TRACKED_SOURCES:
+        curves[s] = []
+        for d in range(TENSOR_DAYS):
+            vals = [t["shares"][s][d] for t in items if t["shares"][s][d] is not None]
+            curves[s].append(round(avg(vals), 1) if vals else None)
+    return curves
+
+
+def analyze_traffic_trajectories(records, traffic):
+    """流入元推移の指標を records に付与し（in-place）、HIT との関係をまとめて返す"""
+    trajectories = compute_trajectories(traffic)
+    for r in records:
+        t = trajectories.get(r["video_id"])
+        for _, key in TRAJECTORY_FEATURES:
+            r[key] = t[key] if t else None
+
+    # Day7 まで揃った動画だけで比較する（日数の違いで構成比が歪まないように）
+    eligible = [
+        r for r in records
+        if trajectories.get(r["video_id"])
+        and r["related_share_day7"] is not None
+        and r["related_share_slope"] is not None
+    ]
+    hits = [trajectories[r["video_id"]] for r in eligible if r["is_hit"]]
+    misses = [trajectories[r["video_id"]] for r in eligible if not r["is_hit"]]
+    result = {
+        "days": TENSOR_DAYS,
+        # データに一度も現れない流入元（例: BROWSE 未記録）は表に出さない
+        "sources": [
+            s for s in TRACKED_SOURCES
+            if any(x for t in trajectories.values() if t for x in t["shares"][s])
+        ],
+        "algorithm_sources": list(ALGORITHM_SOURCES),
+        "eligible_count": len(eligible),
+        "mean_share_curves": {
+            "HIT": _mean_curves(hits) if hits else None,
+            "MISS": _mean_curves(misses) if misses else None,
+        },
+        "takeover_rate": {
+            "HIT": round(sum(1 for t in hits if t["algo_takeover_day"]) / len(hits), 3) if hits else None,
+            "MISS": round(sum(1 for t in misses if t["algo_takeover_day"]) / len(misses), 3) if misses else None,
+        },
+        "features": {},
+    }
+    if len(eligible) < 3:
+        return result
+
+    # 7日以内に移行しなかった動画は「Day8 以降」として扱う
+    def _feature_value(r, key):
+        if key == "algo_takeover_day":
+            return r[key] or TENSOR_DAYS + 1
+        return r[key]
+
+    # Day1 の内訳だけ欠けている動画などもあるので、値がある動画だけで指標ごとに比較する
+    significance = []
+    for name, key in TRAJECTORY_FEATURES:
+        pairs = [(_feature_value(r, key), r["is_hit"]) for r in eligible]
+        pairs = [(v, h) for v, h in pairs if v is not None]
+        vals = [v for v, _ in pairs]
+        label = [1 if h else 0 for _, h in pairs]
+        if len(pairs) < 3:
+            result["features"][name] = {
+                "key": key, "count": len(pairs), "r_hit": None,
+                "hit_mean": None, "miss_mean": None, "median": None,
+            }
+            significance.append({"p_value": None, "method": None})
+            continue
+        med = median(vals)
+        r_pb = pearson(vals, label)
+        result["features"][name] = {
+            "key": key,
+            "count": len(pairs),
+            "r_hit": round(r_pb, 3) if r_pb is not None else None,
+            "hit_mean": round(avg([v for v, y in zip(vals, label) if y]), 2) if any(label) else None,
+            "miss_mean": round(avg([v for v, y in zip(vals, label) if not y]), 2) if not all(label) else None,
+            "median": med,
+        }
+        significance.extend(permutation_pvalues(
+            to_bitset(h for _, h in pairs), len(pairs), [to_bitset(v >= med for v in vals)],
+            alternative="two-sided",
+        ))
+
+    attach_fdr(significance)
+    for stats, sig in zip(result["features"].values(), significance):
+        stats["significance"] = sig
+    result["features"] = dict(sorted(
+        result["features"].items(),
+        key=lambda x: abs(x[1]["r_hit"] or 0), reverse=True,
+    ))
+    return result